@@ -1,7 +1,9 @@
 import os
 import re
 import logging
+import threading
 import psycopg2
+from cachetools import TTLCache
 from functools import wraps
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
@@ -196,6 +198,10 @@ layout_analyzer = LayoutAnalyzer()
 # Initialize TikTok collection extractor
 tiktok_collection_extractor = TikTokCollectionExtractor()
 
+# Rendered /api/service-status page, reused for a few seconds between refreshes
+_status_dashboard_cache = TTLCache(maxsize=1, ttl=5)
+_status_dashboard_lock = threading.Lock()
+
 # Get API keys from environment
 APP_API_KEY = os.getenv('APP_API_KEY')
 INTERNAL_API_KEY = os.getenv('INTERNAL_API_KEY')
@@ -269,12 +275,12 @@ def get_metadata_v2():
                             "Missing 'url' field in request body"}), 400
 
         url = data['url']
-        logging.info(f"Processing URL: {url}")
+        logging.info("Processing URL: %s", url)
 
         # Extract metadata using the extractor
         metadata = extractor.extract_metadata(url)
 
-        logging.info(f"Extracted metadata: {metadata}")
+        logging.debug("Extracted metadata: %s", metadata)
         return jsonify(metadata), 200
 
     except ValueError as e:
@@ -429,28 +435,29 @@ def batch_get_metadata():
         successful_count = 0
         failed_count = 0
 
-        for url in urls:
-            try:
-                if not isinstance(url, str) or not url.strip():
-                    results.append({
-                        "url": url,
-                        "success": False,
-                        "error": "Invalid URL format"
-                    })
-                    failed_count += 1
-                    continue
+        # Extract all valid URLs concurrently, then assemble results in input order
+        valid_urls = [url.strip() for url in urls if isinstance(url, str) and url.strip()]
+        extracted = iter(extractor.extract_many(valid_urls))
 
-                # Process each URL individually
-                metadata = extractor.extract_metadata(url.strip())
+        for url in urls:
+            if not isinstance(url, str) or not url.strip():
+                results.append({
+                    "url": url,
+                    "success": False,
+                    "error": "Invalid URL format"
+                })
+                failed_count += 1
+                continue
 
+            metadata = next(extracted)
+            if isinstance(metadata, Exception):
+                logging.warning(f"Failed to process URL {url}: {str(metadata)}")
+                results.append({"url": url, "success": False, "error": str(metadata)})
+                failed_count += 1
+            else:
                 results.append({"url": url, "success": True, "data": metadata})
                 successful_count += 1
 
-            except Exception as e:
-                logging.warning(f"Failed to process URL {url}: {str(e)}")
-                results.append({"url": url, "success": False, "error": str(e)})
-                failed_count += 1
-
         return jsonify({
             "results": results,
             "summary": {
@@ -1782,6 +1789,11 @@ def service_status():
     """
     OpenRouterモデルの使用状況を表示するダッシュボード (HTML)
     """
+    with _status_dashboard_lock:
+        cached_html = _status_dashboard_cache.get('html')
+    if cached_html:
+        return cached_html, 200, {'Content-Type': 'text/html; charset=utf-8'}
+
     try:
         from openrouter_client import openrouter_client
         stats = openrouter_client.get_model_status()
@@ -1917,6 +1929,8 @@ def service_status():
         </html>
         """
         
+        with _status_dashboard_lock:
+            _status_dashboard_cache['html'] = html_content
         return html_content, 200, {'Content-Type': 'text/html; charset=utf-8'}
         
     except Exception as e:
@@ -1929,6 +1943,9 @@ def check_models_endpoint():
     try:
         from openrouter_client import openrouter_client
         results = openrouter_client.check_all_models() # 内部でcleanupも実行
+        # 確認結果をすぐ反映させるため、キャッシュ済みのダッシュボードを破棄
+        with _status_dashboard_lock:
+            _status_dashboard_cache.clear()
         return jsonify({"status": "completed", "results": results})
     except Exception as e:
         logging.error(f"Error checking models: {e}")
@@ -3,8 +3,13 @@ import logging
 from flask import Flask
 from flask_cors import CORS
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging (DEBUG only outside production)
+log_level = logging.WARNING if os.getenv('FLASK_ENV') == 'production' else logging.DEBUG
+logging.basicConfig(
+    level=log_level,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
 
 # Create the Flask app
 app = Flask(__name__)
@@ -17,6 +22,10 @@ CORS(app,
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
      supports_credentials=True)
 
+# Batch scraping hits the same few hosts; skip the resolver on every new connection to them
+import dns_cache
+dns_cache.install()
+
 # Initialize and start ranking scheduler
 try:
     from ranking_scheduler import RankingScheduler
@@ -26,6 +35,7 @@ try:
     # 本番環境では毎日午前2時に実行、開発環境では手動実行のみ
     if os.getenv('FLASK_ENV') == 'production':
         ranking_scheduler.setup_daily_job(hour=2, minute=0)
+        ranking_scheduler.setup_log_partition_job()
         ranking_scheduler.start_scheduler()
         logging.info("Ranking scheduler set up for production (daily at 2:00 AM)")
     else:
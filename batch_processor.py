@@ -1,6 +1,7 @@
 import os
 import logging
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime
 from typing import Dict, List
 from ranking_calculator import RankingCalculator
@@ -13,15 +14,10 @@ class BatchProcessor:
         self.database_url = os.getenv("DATABASE_URL")
         self.ranking_calculator = RankingCalculator()
         self.metadata_updater = MetadataUpdater()
+        self._staging_ready = False
         
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable not set")
-        
-        # ログ設定
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
     
     def get_db_connection(self):
         """データベース接続を取得"""
@@ -64,6 +60,34 @@ class BatchProcessor:
             logging.error(f"Error in daily ranking batch: {e}")
             return False
     
+    def ensure_staging_table(self, cur):
+        """ステージングテーブルを用意（プロセス内で一度だけ）"""
+        if self._staging_ready:
+            return
+        
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS rankings_staging (
+                id SERIAL PRIMARY KEY,
+                unique_video_id VARCHAR(50) NOT NULL,
+                platform VARCHAR(20) NOT NULL,
+                rank_position INTEGER NOT NULL,
+                period_type VARCHAR(10) NOT NULL,
+                count INTEGER NOT NULL,
+                title TEXT,
+                thumbnail_url TEXT,
+                author_name TEXT,
+                url TEXT,
+                embed_code TEXT,
+                created_at TIMESTAMP DEFAULT NOW(),
+                updated_at TIMESTAMP DEFAULT NOW(),
+                
+                UNIQUE(unique_video_id, period_type)
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_rankings_staging_period_rank ON rankings_staging(period_type, rank_position)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_rankings_staging_video_id ON rankings_staging(unique_video_id)")
+        self._staging_ready = True
+    
     def update_rankings_table_atomic(self, ranking_data: Dict[str, List], metadata: Dict[str, dict]) -> bool:
         """ランキングテーブルをアトミックに更新（ゼロダウンタイム）"""
         try:
@@ -72,111 +96,61 @@ class BatchProcessor:
                     # トランザクション開始
                     conn.autocommit = False
                     
-                    # 新しいランキングデータをテンポラリテーブルに作成
-                    cur.execute("DROP TABLE IF EXISTS rankings_temp")
-                    
-                    cur.execute("""
-                        CREATE TABLE rankings_temp (
-                            id SERIAL PRIMARY KEY,
-                            unique_video_id VARCHAR(50) NOT NULL,
-                            platform VARCHAR(20) NOT NULL,
-                            rank_position INTEGER NOT NULL,
-                            period_type VARCHAR(10) NOT NULL,
-                            count INTEGER NOT NULL,
-                            title TEXT,
-                            thumbnail_url TEXT,
-                            author_name TEXT,
-                            url TEXT,
-                            embed_code TEXT,
-                            created_at TIMESTAMP DEFAULT NOW(),
-                            updated_at TIMESTAMP DEFAULT NOW(),
-                            
-                            UNIQUE(unique_video_id, period_type)
+                    # 常設のステージングテーブルを空にして再利用（DDLを毎回発行しない）
+                    self.ensure_staging_table(cur)
+                    cur.execute("TRUNCATE rankings_staging RESTART IDENTITY")
+                    
+                    # 同じ動画が複数期間に出現するため、メタデータを先にタプルへ射影しておく
+                    projected = {
+                        vid: (
+                            m.get('platform', 'unknown'),
+                            m.get('title'),
+                            m.get('thumbnailUrl'),
+                            m.get('authorName'),
+                            m.get('url'),
+                            m.get('embedCode')
                         )
-                    """)
-                    
-                    # インデックス作成（IF NOT EXISTSで重複エラー回避）
-                    cur.execute("CREATE INDEX IF NOT EXISTS idx_rankings_temp_period_rank ON rankings_temp(period_type, rank_position)")
-                    cur.execute("CREATE INDEX IF NOT EXISTS idx_rankings_temp_video_id ON rankings_temp(unique_video_id)")
-                    
-                    # 新しいランキングデータを挿入（バッチ処理で最適化）
-                    total_inserted = 0
-                    batch_data = []
-                    batch_size = 25  # さらに小分けしてタイムアウト回避
+                        for vid, m in metadata.items()
+                    }
+                    missing = ('unknown', None, None, None, None, None)
                     
+                    # 新しいランキングデータを一括挿入
+                    rows = []
                     for period_type, rankings in ranking_data.items():
                         for rank_position, (video_id, count) in enumerate(rankings, 1):
-                            video_metadata = metadata.get(video_id, {})
-                            
-                            batch_data.append((
-                                video_id,
-                                video_metadata.get('platform', 'unknown'),
-                                rank_position,
-                                period_type,
-                                count,
-                                video_metadata.get('title'),
-                                video_metadata.get('thumbnailUrl'),
-                                video_metadata.get('authorName'),
-                                video_metadata.get('url'),
-                                video_metadata.get('embedCode')
+                            platform, title, thumbnail_url, author_name, url, embed_code = projected.get(video_id, missing)
+                            rows.append((
+                                video_id, platform, rank_position, period_type, count,
+                                title, thumbnail_url, author_name, url, embed_code
                             ))
-                            
-                            # バッチサイズに達したら一括挿入
-                            if len(batch_data) >= batch_size:
-                                try:
-                                    cur.executemany("""
-                                        INSERT INTO rankings_temp (
-                                            unique_video_id,
-                                            platform,
-                                            rank_position,
-                                            period_type,
-                                            count,
-                                            title,
-                                            thumbnail_url,
-                                            author_name,
-                                            url,
-                                            embed_code
-                                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                    """, batch_data)
-                                    total_inserted += len(batch_data)
-                                    logging.info(f"Inserted batch of {len(batch_data)} items, total: {total_inserted}")
-                                    batch_data = []
-                                    
-                                    # 短時間の処理間隔を設けてタイムアウト回避
-                                    import time
-                                    time.sleep(0.1)
-                                except Exception as batch_error:
-                                    logging.error(f"Batch insert error: {batch_error}")
-                                    raise
-                    
-                    # 残りのデータを挿入
-                    if batch_data:
-                        cur.executemany("""
-                            INSERT INTO rankings_temp (
-                                unique_video_id,
-                                platform,
-                                rank_position,
-                                period_type,
-                                count,
-                                title,
-                                thumbnail_url,
-                                author_name,
-                                url,
-                                embed_code
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, batch_data)
-                        total_inserted += len(batch_data)
-                        logging.info(f"Inserted final batch of {len(batch_data)} items")
-                    
-                    logging.info(f"Inserted {total_inserted} ranking entries into temp table")
                     
-                    # 簡単な置き換え方式に変更（タイムアウト回避）
-                    cur.execute("DROP TABLE IF EXISTS rankings")
-                    cur.execute("ALTER TABLE rankings_temp RENAME TO rankings")
-                    
-                    # インデックスを再作成
-                    cur.execute("CREATE INDEX IF NOT EXISTS idx_rankings_period_rank ON rankings(period_type, rank_position)")
-                    cur.execute("CREATE INDEX IF NOT EXISTS idx_rankings_video_id ON rankings(unique_video_id)")
+                    execute_values(cur, """
+                        INSERT INTO rankings_staging (
+                            unique_video_id,
+                            platform,
+                            rank_position,
+                            period_type,
+                            count,
+                            title,
+                            thumbnail_url,
+                            author_name,
+                            url,
+                            embed_code
+                        ) VALUES %s
+                    """, rows, page_size=500)
+                    
+                    logging.info(f"Inserted {len(rows)} ranking entries into staging table")
+                    
+                    # ステージングと本番テーブルを名前の付け替えで入れ替え
+                    # （旧rankingsは次回のステージングとして再利用される）
+                    cur.execute("SELECT to_regclass('rankings')")
+                    if cur.fetchone()[0]:
+                        cur.execute("ALTER TABLE rankings RENAME TO rankings_swap")
+                        cur.execute("ALTER TABLE rankings_staging RENAME TO rankings")
+                        cur.execute("ALTER TABLE rankings_swap RENAME TO rankings_staging")
+                    else:
+                        cur.execute("ALTER TABLE rankings_staging RENAME TO rankings")
+                        self._staging_ready = False
                     
                     # コミット
                     conn.commit()
@@ -186,6 +160,7 @@ class BatchProcessor:
                     
         except Exception as e:
             logging.error(f"Error updating rankings table atomically: {e}")
+            self._staging_ready = False
             try:
                 if 'conn' in locals() and conn:
                     conn.rollback()
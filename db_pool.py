@@ -0,0 +1,147 @@
+"""
+PostgreSQL接続プール
+
+接続文字列（DSN）ごとにThreadedConnectionPoolを遅延生成し、プロセス内で共有する。
+リクエストごとのTCP/TLS/認証ハンドシェイクを省くためのもの。
+ログ等をバックグラウンドでまとめてINSERTするBackgroundBatchWriterもここに置く。
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from psycopg2 import extensions
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX_CONN", "10"))
+
+_pools: Dict[str, ThreadedConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn: str) -> ThreadedConnectionPool:
+    """DSNに対応するプールを取得（初回のみ作成）"""
+    pool = _pools.get(dsn)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(dsn)
+            if pool is None:
+                pool = ThreadedConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, dsn)
+                _pools[dsn] = pool
+    return pool
+
+
+@contextmanager
+def pooled_connection(dsn: str):
+    """
+    プールから接続を借りて返却するコンテキストマネージャ
+
+    例外時はロールバックする。commitは呼び出し側で行うこと。
+    未完了のトランザクションが残った接続はロールバックしてから返却する。
+    """
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if conn.closed:
+            pool.putconn(conn, close=True)
+        else:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                pool.putconn(conn)
+            except Exception as e:
+                logging.warning(f"Discarding broken pooled connection: {e}")
+                pool.putconn(conn, close=True)
+
+
+class BackgroundBatchWriter:
+    """
+    INSERTをバックグラウンドスレッドでまとめて書き込むライター
+
+    put()はキューに積むだけで即座に戻る。ワーカースレッドが最大max_batch件、
+    またはflush_interval秒ごとにexecute_valuesで一括INSERTする。
+    ログなど、書き込みの失敗がリクエストに影響してはならない用途向け。
+    """
+
+    def __init__(self, dsn: str, insert_sql: str, max_batch: int = 100,
+                 flush_interval: float = 1.0, max_queue: int = 10000):
+        self.dsn = dsn
+        self.insert_sql = insert_sql  # "INSERT INTO t (a, b) VALUES %s" 形式
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def put(self, row: tuple) -> bool:
+        """行をキューに追加（キューが満杯なら捨ててFalse）"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            logging.warning("Background writer queue full, dropping row")
+            return False
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _drain(self, first=None) -> list:
+        rows = [] if first is None else [first]
+        while len(rows) < self.max_batch:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: list):
+        if not rows:
+            return
+        try:
+            with pooled_connection(self.dsn) as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, self.insert_sql, rows, page_size=self.max_batch)
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Background batch write failed ({len(rows)} rows): {e}")
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # 少し待って同時期の書き込みをまとめる
+            time.sleep(min(self.flush_interval, 0.05))
+            with self._flush_lock:
+                self._write(self._drain(first))
+
+    def flush(self):
+        """キューに残っている行をすべて書き込む（終了時用）"""
+        with self._flush_lock:
+            while True:
+                rows = self._drain()
+                if not rows:
+                    break
+                self._write(rows)
@@ -0,0 +1,65 @@
+"""
+プロセス内DNSキャッシュ
+
+socket.getaddrinfoをTTL付きでキャッシュするラッパー。
+スクレイピング先はほぼyoutube.com / tiktok.com / instagram.comに限られるため、
+新規接続のたびにリゾルバへ問い合わせる必要はない。
+キャッシュするのはスクレイピング先のホストだけで、DBや他のAPIの名前解決はそのまま通す。
+成功した名前解決のみキャッシュし、失敗は毎回そのまま再試行させる。
+プロセス全体に効くため、コンストラクタではなくアプリ起動時に明示的にinstall()する。
+"""
+
+import socket
+import logging
+import threading
+
+from cachetools import TTLCache
+
+DNS_CACHE_TTL_SECONDS = 300
+# キャッシュ対象のホスト（このドメイン自身とそのサブドメイン）
+SCRAPING_DOMAINS = (
+    'youtube.com', 'youtu.be', 'ytimg.com', 'googleapis.com',
+    'tiktok.com', 'tiktokcdn.com',
+    'instagram.com', 'cdninstagram.com',
+)
+
+_original_getaddrinfo = socket.getaddrinfo
+_cache = TTLCache(maxsize=1024, ttl=DNS_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+_installed = False
+
+
+def _is_scraping_host(host) -> bool:
+    if isinstance(host, bytes):
+        host = host.decode('ascii', errors='ignore')
+    if not isinstance(host, str):
+        return False
+    host = host.lower().rstrip('.')
+    return any(host == d or host.endswith('.' + d) for d in SCRAPING_DOMAINS)
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    if not _is_scraping_host(host):
+        return _original_getaddrinfo(host, port, family, type, proto, flags)
+
+    key = (host, port, family, type, proto, flags)
+    with _lock:
+        result = _cache.get(key)
+    if result is not None:
+        return result
+
+    result = _original_getaddrinfo(host, port, family, type, proto, flags)
+    with _lock:
+        _cache[key] = result
+    return result
+
+
+def install():
+    """socket.getaddrinfoをキャッシュ付きのものに差し替える（何度呼んでも1回だけ）"""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        socket.getaddrinfo = _cached_getaddrinfo
+        _installed = True
+    logging.info(f"DNS cache installed for scraping hosts (ttl={DNS_CACHE_TTL_SECONDS}s)")
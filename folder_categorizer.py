@@ -1,8 +1,112 @@
+import os
 import logging
-import json
-import re
+import orjson
+import time
+import threading
+import hashlib
+from psycopg2.extras import execute_values
+from cachetools import LRUCache
 from typing import List, Dict, Any, Optional
-from openrouter_client import openrouter_client, TEXT_MODELS
+from openrouter_client import openrouter_client, TEXT_MODELS, LONG_MODEL_TIMEOUTS, RateLimitError
+from rate_limiter import get_limiter
+from db_pool import pooled_connection
+
+
+def _slice_json(text: str, open_ch: str, close_ch: str) -> str:
+    """
+    最初の open_ch から最後の close_ch までを切り出す（コードブロック等の前後の文字を除去）。
+    見つからなければ元の文字列を返し、パースエラーは呼び出し側で扱う。
+    """
+    start = text.find(open_ch)
+    end = text.rfind(close_ch)
+    if start != -1 and end > start:
+        return text[start:end + 1]
+    return text
+
+
+class _AdaptiveBatchSizer:
+    """
+    suggest_folders_batch のバッチサイズを直近の結果から調整する（プロセス内で共有）
+
+    - 1動画あたりのトークン数のEWMAから、1リクエストのトークン予算に収まるサイズを算出
+    - 応答JSONの有効率（判定が返ってきた動画の割合）のEWMAが閾値を下回ったら25%縮小
+    """
+
+    MIN_SIZE = 5
+    MAX_SIZE = 40
+    TOKEN_BUDGET_PER_REQUEST = 6000
+    MIN_SUCCESS_RATE = 0.9
+    EWMA_WEIGHT = 0.2
+
+    def __init__(self, initial_size: int = 20):
+        self._size = initial_size
+        self._success_rate = 1.0
+        self._avg_tokens_per_video: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def current_size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def record(self, batch_len: int, valid_count: int, tokens_used: int = 0):
+        """1バッチの結果を反映してサイズを更新"""
+        if batch_len <= 0:
+            return
+        w = self.EWMA_WEIGHT
+        with self._lock:
+            self._success_rate = (1 - w) * self._success_rate + w * (valid_count / batch_len)
+            if tokens_used:
+                per_video = tokens_used / batch_len
+                if self._avg_tokens_per_video is None:
+                    self._avg_tokens_per_video = per_video
+                else:
+                    self._avg_tokens_per_video = (1 - w) * self._avg_tokens_per_video + w * per_video
+
+            size = self._size
+            if self._avg_tokens_per_video:
+                size = int(self.TOKEN_BUDGET_PER_REQUEST / self._avg_tokens_per_video)
+            if self._success_rate < self.MIN_SUCCESS_RATE:
+                size = int(min(size, self._size) * 0.75)
+            self._size = min(self.MAX_SIZE, max(self.MIN_SIZE, size))
+
+
+_batch_sizer = _AdaptiveBatchSizer()
+
+
+def _read_until_json_closed(chunks) -> str:
+    """
+    ストリームのチャンクを読み進め、最初のJSONオブジェクトの閉じ括弧までの文字列を返す。
+    文字列リテラル内の括弧は数えない。閉じた時点で読み込みを止める。
+    """
+    buffer = []
+    depth = 0
+    started = False
+    in_string = False
+    escaped = False
+
+    for chunk in chunks:
+        for i, ch in enumerate(chunk):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+                started = True
+            elif ch == '}' and started:
+                depth -= 1
+                if depth == 0:
+                    buffer.append(chunk[:i + 1])
+                    return "".join(buffer)
+        buffer.append(chunk)
+
+    return "".join(buffer)
+
 
 class FolderCategorizer:
     """
@@ -12,6 +116,140 @@ class FolderCategorizer:
 
     def __init__(self):
         self.ai_client = openrouter_client
+        self.database_url = os.getenv("DATABASE_URL")
+        self.cache_expiry_days = 7
+        self._cache_table_ready = False
+        # suggest_folders_batch で同時に投げるAPIリクエスト数の上限
+        self.max_parallel_batches = 5
+        # フォルダ構成ごとのキーワード照合インデックス
+        self._keyword_index_cache = LRUCache(maxsize=64)
+        self._keyword_index_lock = threading.Lock()
+
+    def _suggestion_cache_key(self, video_title: str, folders_json: str) -> str:
+        """タイトルとフォルダ構成からキャッシュキーを生成"""
+        return hashlib.sha256(f"{video_title}|{folders_json}".encode()).hexdigest()
+
+    def _folders_json(self, current_folders: List[Dict[str, Any]]) -> str:
+        """キャッシュキー用にフォルダリストを正規化したJSON"""
+        return orjson.dumps(current_folders, option=orjson.OPT_SORT_KEYS).decode()
+
+    def _ensure_cache_table(self, cur):
+        """
+        キャッシュテーブルを作成（インスタンスごとに一度だけ）
+
+        フラグはCREATE TABLEと同じトランザクションの成否に依存するため、
+        呼び出し側は失敗時（ロールバック時）にFalseへ戻すこと。
+        """
+        if self._cache_table_ready:
+            return
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS folder_suggestion_cache (
+                cache_key TEXT PRIMARY KEY,
+                folder_id TEXT,
+                reason TEXT,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        self._cache_table_ready = True
+
+    def _get_cached_suggestions(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """DBからキャッシュ済みの提案を取得（有効期限内のもの）"""
+        if not self.database_url or not cache_keys:
+            return {}
+
+        try:
+            with pooled_connection(self.database_url) as conn:
+                with conn.cursor() as cur:
+                    self._ensure_cache_table(cur)
+
+                    cur.execute("""
+                        SELECT cache_key, folder_id, reason
+                        FROM folder_suggestion_cache
+                        WHERE cache_key = ANY(%s)
+                          AND created_at > NOW() - make_interval(days => %s)
+                    """, (list(cache_keys), self.cache_expiry_days))
+
+                    rows = cur.fetchall()
+                # テーブル作成（初回のみ）を確定させる
+                conn.commit()
+
+            return {row[0]: {"folder_id": row[1], "reason": row[2]} for row in rows}
+
+        except Exception as e:
+            logging.error(f"Error reading folder suggestion cache: {e}")
+            # ロールバックでCREATE TABLEも取り消されている可能性があるため、次回作り直す
+            self._cache_table_ready = False
+            return {}
+
+    def _save_suggestions(self, entries: List[tuple]) -> bool:
+        """提案結果をDBにキャッシュ（UPSERT）。entries: [(cache_key, folder_id, reason), ...]"""
+        if not self.database_url or not entries:
+            return False
+
+        try:
+            with pooled_connection(self.database_url) as conn:
+                with conn.cursor() as cur:
+                    self._ensure_cache_table(cur)
+
+                    execute_values(cur, """
+                        INSERT INTO folder_suggestion_cache (cache_key, folder_id, reason)
+                        VALUES %s
+                        ON CONFLICT (cache_key)
+                        DO UPDATE SET
+                            folder_id = EXCLUDED.folder_id,
+                            reason = EXCLUDED.reason,
+                            created_at = NOW()
+                    """, entries)
+
+                conn.commit()
+            return True
+
+        except Exception as e:
+            logging.error(f"Error saving folder suggestion cache: {e}")
+            self._cache_table_ready = False
+            return False
+
+    def _keyword_index(self, current_folders: List[Dict[str, Any]]) -> tuple:
+        """
+        キーワード照合用に (正規化済みフォルダ名, フォルダ) のタプルを作る。
+        同じフォルダ構成では使い回せるよう、(id, name) の組をキーにキャッシュする。
+        """
+        key = tuple((f.get("id"), f.get("name")) for f in current_folders)
+        with self._keyword_index_lock:
+            index = self._keyword_index_cache.get(key)
+        if index is not None:
+            return index
+
+        entries = []
+        for f in current_folders:
+            name = (f.get("name") or "").strip().casefold()
+            # 1文字の名前は誤一致が多いので対象外。未分類はAI側のフォールバック用
+            if len(name) < 2 or f.get("name") == "未分類":
+                continue
+            entries.append((name, f))
+        index = tuple(entries)
+
+        with self._keyword_index_lock:
+            self._keyword_index_cache[key] = index
+        return index
+
+    def _keyword_match(self, video_title: str, keyword_index: tuple) -> Optional[Dict[str, Any]]:
+        """
+        フォルダ名がタイトルにそのまま含まれていればAIを使わずに決定する。
+        一致が1件だけの場合のみ採用し、複数一致（曖昧）ならNoneを返してAIに任せる。
+        """
+        title = (video_title or "").casefold()
+        if not title:
+            return None
+
+        match = None
+        for name, folder in keyword_index:
+            if name in title:
+                if match is not None:
+                    return None
+                match = folder
+
+        return match
 
     def suggest_folder(self, 
                        video_title: str, 
@@ -40,8 +278,27 @@ class FolderCategorizer:
                 "reason": "フォルダが存在しません。"
             }
 
+        # フォルダ名がタイトルに含まれていればAIを呼ばずに返す
+        keyword_folder = self._keyword_match(video_title, self._keyword_index(current_folders))
+        if keyword_folder:
+            return {
+                "success": True,
+                "suggested_folder_id": keyword_folder.get("id"),
+                "reason": f"タイトルにフォルダ名「{keyword_folder.get('name')}」が含まれているため。"
+            }
+
+        # 同じタイトル・同じフォルダ構成の判定結果があればAIを呼ばずに返す
+        cache_key = self._suggestion_cache_key(video_title, self._folders_json(current_folders))
+        cached = self._get_cached_suggestions([cache_key]).get(cache_key)
+        if cached:
+            return {
+                "success": True,
+                "suggested_folder_id": cached["folder_id"],
+                "reason": cached["reason"]
+            }
+
         # プロンプトの構築
-        folders_text = json.dumps(current_folders, ensure_ascii=False, indent=2)
+        folders_text = orjson.dumps(current_folders, option=orjson.OPT_INDENT_2).decode()
         
         prompt = f"""
 あなたは料理動画の整理アシスタントです。
@@ -77,39 +334,48 @@ class FolderCategorizer:
 
         try:
             # TEXT_MODELSの優先順位で実行（自動フォールバック付き）
-            result = self.ai_client.chat_completion(
+            # ストリーミングで受信し、JSONが閉じた時点で接続を切って残りの生成を待たない
+            limiter = get_limiter("openrouter")
+            limiter.acquire(estimated_tokens=len(prompt) // 4)
+            started = time.monotonic()
+            stream = self.ai_client.chat_completion_stream(
                 messages=messages,
                 models=TEXT_MODELS,
                 temperature=0.3, # 決定論的な結果を好むため低めに設定
                 max_tokens=500
             )
-
-            if not result.get("success"):
-                logging.error(f"AI folder suggestion failed: {result.get('error')}")
-                # AI処理失敗時はGemini APIへ直接フォールバックを試みる（openrouter_clientにはないロジックだが念のため）
-                # ただしopenrouter_client側ですでにGemini APIへのフォールバックが含まれている設計であれば不要
-                # 今回はopenrouter_clientの実装に依存する
+            try:
+                response_content = _read_until_json_closed(stream).strip()
+                limiter.record_success((time.monotonic() - started) * 1000)
+            except RuntimeError as e:
+                if isinstance(e, RateLimitError):
+                    limiter.record_rate_limited()
+                logging.error(f"AI folder suggestion failed: {e}")
                 return {
                     "success": False,
                     "suggested_folder_id": None,
-                    "reason": f"AI処理エラー: {result.get('error')}"
+                    "reason": f"AI処理エラー: {e}"
                 }
-
-            response_content = result.get("content", "").strip()
+            finally:
+                stream.close()
             
             # JSONパース
             try:
-                # コードブロック除去
-                json_text = re.sub(r'^```json\s*|\s*```$', '', response_content, flags=re.MULTILINE).strip()
-                parsed_json = json.loads(json_text)
+                # コードブロック等を除いてJSONオブジェクト部分のみ取り出す
+                json_text = _slice_json(response_content, '{', '}')
+                parsed_json = orjson.loads(json_text)
+                
+                suggested_folder_id = parsed_json.get("suggested_folder_id")
+                reason = parsed_json.get("reason", "AIによる判定")
+                self._save_suggestions([(cache_key, suggested_folder_id, reason)])
                 
                 return {
                     "success": True,
-                    "suggested_folder_id": parsed_json.get("suggested_folder_id"),
-                    "reason": parsed_json.get("reason", "AIによる判定")
+                    "suggested_folder_id": suggested_folder_id,
+                    "reason": reason
                 }
 
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logging.error(f"JSON parse error in folder suggestion: {e}, Content: {response_content}")
                 return {
                     "success": False,
@@ -130,7 +396,7 @@ class FolderCategorizer:
                               current_folders: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         複数の動画に対して最適なフォルダを一括提案する。
-        AIへのリクエストは適切なバッチサイズ（5件）に分割して実行される。
+        AIへのリクエストは直近の結果に応じたバッチサイズ（5〜40件）に分割して実行される。
 
         Args:
             videos: 動画リスト [{"id": "vid1", "title": "...", "description": "..."}, ...]
@@ -166,9 +432,53 @@ class FolderCategorizer:
                 uncategorized_id = f.get("id")
                 break
 
-        folders_text = json.dumps(current_folders, ensure_ascii=False, indent=2)
-        batch_size = 20
+        # 全バッチで共通のフォルダ一覧は id:name のカンマ区切りで1度だけ組み立てる（JSONよりトークンが少ない）
+        folders_csv = ",".join(f"{f.get('id')}:{f.get('name')}" for f in current_folders)
+        batch_size = _batch_sizer.current_size()
         all_results = []
+
+        def apply_uncategorized(vid, s_id, reason):
+            """提案なし（null）の場合は未分類フォルダへフォールバック"""
+            if s_id is None and uncategorized_id:
+                return {
+                    "video_id": vid,
+                    "suggested_folder_id": uncategorized_id,
+                    "reason": "適切なフォルダが見つからなかったため、未分類フォルダを選択しました。"
+                }
+            return {"video_id": vid, "suggested_folder_id": s_id, "reason": reason}
+
+        # フォルダ名がタイトルに含まれる動画はAIに送らない
+        keyword_index = self._keyword_index(current_folders)
+        remaining_videos = []
+        for v in videos:
+            keyword_folder = self._keyword_match(v.get("title"), keyword_index)
+            if keyword_folder:
+                all_results.append({
+                    "video_id": v.get("id"),
+                    "suggested_folder_id": keyword_folder.get("id"),
+                    "reason": f"タイトルにフォルダ名「{keyword_folder.get('name')}」が含まれているため。"
+                })
+            else:
+                remaining_videos.append(v)
+
+        if not remaining_videos:
+            return {"success": True, "results": all_results}
+
+        # キャッシュ済みの動画はAIに送らない
+        folders_json = self._folders_json(current_folders)
+        cache_keys = {v.get("id"): self._suggestion_cache_key(v.get("title") or "", folders_json) for v in remaining_videos}
+        cached = self._get_cached_suggestions(list(set(cache_keys.values())))
+
+        uncached_videos = []
+        for v in remaining_videos:
+            hit = cached.get(cache_keys[v.get("id")])
+            if hit:
+                all_results.append(apply_uncategorized(v.get("id"), hit["folder_id"], hit["reason"]))
+            else:
+                uncached_videos.append(v)
+
+        if not uncached_videos:
+            return {"success": True, "results": all_results}
         
         from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -189,8 +499,8 @@ class FolderCategorizer:
 あなたは料理動画の整理アシスタントです。
 以下の「動画リスト」の各動画について、「既存フォルダリスト」の中から最も適したフォルダを選んでください。
 
-【既存フォルダリスト】
-{folders_text}
+【既存フォルダリスト】（フォーマット: id:name カンマ区切り）
+{folders_csv}
 
 【動画リスト】
 {videos_text}
@@ -217,15 +527,23 @@ class FolderCategorizer:
                     {"role": "user", "content": prompt}
                 ]
                 
-                # 並列実行時はOpenRouterのレートリミットに注意が必要だが、
-                # Gemini Flash Liteなどは比較的高速かつリミットが高いため5並列程度なら許容範囲内と想定
+                # 並列実行時にOpenRouterの429を連鎖させないよう、送信前にリミッターで枠を確保
+                limiter = get_limiter("openrouter")
+                limiter.acquire(estimated_tokens=len(prompt) // 4)
+                started = time.monotonic()
                 result = self.ai_client.chat_completion(
                     messages=messages,
                     models=TEXT_MODELS,
                     temperature=0.3,
-                    max_tokens=4000
+                    max_tokens=4000,
+                    model_timeouts=LONG_MODEL_TIMEOUTS
                 )
                 
+                if result.get("success"):
+                    limiter.record_success((time.monotonic() - started) * 1000)
+                elif result.get("rate_limited"):
+                    limiter.record_rate_limited()
+                
                 if not result.get("success"):
                     logging.error(f"Batch suggestion failed: {result.get('error')}")
                     for v in batch_videos:
@@ -239,11 +557,17 @@ class FolderCategorizer:
                 response_content = result.get("content", "").strip()
                 
                 # JSONパース
-                json_text = re.sub(r'^```json\s*|\s*```$', '', response_content, flags=re.MULTILINE).strip()
-                batch_results = json.loads(json_text)
+                json_text = _slice_json(response_content, '[', ']')
+                batch_results = orjson.loads(json_text)
                 
                 if isinstance(batch_results, list):
-                    result_map = {res.get("video_id"): res for res in batch_results}
+                    result_map = {res.get("video_id"): res for res in batch_results if isinstance(res, dict)}
+                    cache_entries = []
+                    _batch_sizer.record(
+                        len(batch_videos),
+                        sum(1 for v in batch_videos if v.get("id") in result_map),
+                        result.get("tokens_used", 0)
+                    )
                     
                     for v in batch_videos:
                         vid = v.get("id")
@@ -251,17 +575,10 @@ class FolderCategorizer:
                             res = result_map[vid]
                             s_id = res.get("suggested_folder_id")
                             reason = res.get("reason", "AIによる判定")
+                            cache_entries.append((cache_keys[vid], s_id, reason))
                             
                             # 未分類フォールバック
-                            if s_id is None and uncategorized_id:
-                                s_id = uncategorized_id
-                                reason = "適切なフォルダが見つからなかったため、未分類フォルダを選択しました。"
-                                
-                            batch_results_list.append({
-                                "video_id": vid,
-                                "suggested_folder_id": s_id,
-                                "reason": reason
-                            })
+                            batch_results_list.append(apply_uncategorized(vid, s_id, reason))
                         else:
                             # 欠落時の未分類フォールバック
                             s_id = uncategorized_id if uncategorized_id else None
@@ -274,7 +591,11 @@ class FolderCategorizer:
                                 "suggested_folder_id": s_id,
                                 "reason": reason
                             })
+                    
+                    # 同じキーが複数回含まれるとON CONFLICTが失敗するため重複を除く
+                    self._save_suggestions(list({e[0]: e for e in cache_entries}.values()))
                 else:
+                    _batch_sizer.record(len(batch_videos), 0, result.get("tokens_used", 0))
                     logging.error(f"AI returned invalid JSON format: {response_content}")
                     for v in batch_videos:
                         batch_results_list.append({
@@ -284,6 +605,8 @@ class FolderCategorizer:
                         })
                         
             except Exception as e:
+                if isinstance(e, orjson.JSONDecodeError):
+                    _batch_sizer.record(len(batch_videos), 0)
                 logging.error(f"Error in batch processing: {e}")
                 for v in batch_videos:
                     batch_results_list.append({
@@ -294,19 +617,23 @@ class FolderCategorizer:
             
             return batch_results_list
 
-        # ThreadPoolExecutorによる並列実行
-        # max_workers=5: 5バッチ（最大25動画）まで同時並行で処理
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for i in range(0, len(videos), batch_size):
-                batch_videos = videos[i:i + batch_size]
-                futures.append(executor.submit(process_batch, batch_videos))
-            
-            for future in as_completed(futures):
-                try:
-                    all_results.extend(future.result())
-                except Exception as e:
-                    logging.error(f"Batch execution failed: {e}")
+        batches = [uncached_videos[i:i + batch_size] for i in range(0, len(uncached_videos), batch_size)]
+
+        # 1バッチだけならスレッドを立てずにそのまま実行
+        if len(batches) == 1:
+            all_results.extend(process_batch(batches[0]))
+        else:
+            # ThreadPoolExecutorによる並列実行
+            # 同時実行数はバッチ数と上限（5）の小さい方。I/O待ちが主体なのでスレッドで十分
+            max_workers = min(len(batches), self.max_parallel_batches)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(process_batch, b) for b in batches]
+                
+                for future in as_completed(futures):
+                    try:
+                        all_results.extend(future.result())
+                    except Exception as e:
+                        logging.error(f"Batch execution failed: {e}")
         
         return {
             "success": True,
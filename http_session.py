@@ -0,0 +1,32 @@
+"""
+スクレイピング・外部API呼び出し用のrequests.Session生成
+
+同一ホストへの並列リクエストで接続を使い回し、一時的な失敗（5xx）はGET/HEADのみ短く再試行する。
+429は再試行しない: urllib3はRetry-Afterの秒数を上限なしで待つうえ、並列に走らせた取得手段の数だけ
+再試行が掛け算で増えるため、呼び出し側で次の手段へ切り替える。
+"""
+
+from typing import Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def make_session(headers: Optional[Mapping[str, str]] = None,
+                 pool_connections: int = 16, pool_maxsize: int = 32) -> requests.Session:
+    """共通の再試行設定と接続プールを持つSessionを作る"""
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    retry = Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -1,15 +1,133 @@
 
 import os
+import re
 import psycopg2
 import logging
+from datetime import date
 from urllib.parse import urlparse
+from db_pool import pooled_connection
 
 # 設定
 LOG_DB_URL = os.getenv("LOG_DATABASE_URL")
+# 先行して作成しておく月次パーティションの数
+PARTITION_MONTHS_AHEAD = 2
+# ログの保持期間（これより古い月のパーティションはDROPする）
+LOG_RETENTION_MONTHS = 12
+
+_PARTITION_NAME_RE = re.compile(r'^ai_usage_logs_(\d{4})_(\d{2})$')
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _month_start(year: int, month: int) -> date:
+    """月の初日（monthが12を超えた分は翌年に繰り越す）"""
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def _partition_name(start: date) -> str:
+    return f"ai_usage_logs_{start.year:04d}_{start.month:02d}"
+
+
+def ensure_partitions(cur, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """
+    当月から months_ahead ヶ月先までの月次パーティションを作成する（冪等）。
+
+    作成漏れの間にデフォルトパーティションへ入った行があると、その範囲のパーティションを
+    PARTITION OF で作ろうとした時点でデフォルトの制約違反になる。そのため新しいパーティションは
+    単独のテーブルとして作り、該当範囲の行をデフォルトから移してからATTACHする。
+    """
+    # 範囲外（パーティション作成漏れ）の行を受けるデフォルトパーティション
+    # ログは失っても致命的ではないためWALを書かないUNLOGGEDパーティションにする
+    cur.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS ai_usage_logs_default
+        PARTITION OF ai_usage_logs DEFAULT;
+    """)
+
+    today = date.today()
+    for offset in range(months_ahead + 1):
+        start = _month_start(today.year, today.month + offset)
+        end = _month_start(start.year, start.month + 1)
+        partition = _partition_name(start)
+
+        cur.execute("SELECT to_regclass(%s)", (partition,))
+        if cur.fetchone()[0] is not None:
+            continue
+
+        cur.execute(f"CREATE UNLOGGED TABLE {partition} (LIKE ai_usage_logs INCLUDING DEFAULTS)")
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM ai_usage_logs_default
+                WHERE timestamp >= %s AND timestamp < %s
+                RETURNING *
+            )
+            INSERT INTO {partition} SELECT * FROM moved
+        """, (start, end))
+        if cur.rowcount:
+            logger.info(f"Moved {cur.rowcount} rows from ai_usage_logs_default into {partition}")
+        cur.execute(f"""
+            ALTER TABLE ai_usage_logs ATTACH PARTITION {partition}
+            FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
+        """)
+        logger.info(f"Created partition {partition}")
+
+
+def drop_expired_partitions(cur, retention_months: int = LOG_RETENTION_MONTHS) -> int:
+    """
+    保持期間を過ぎた月次パーティションをDROPする（DELETEより軽く、VACUUMも不要）。
+    デフォルトパーティションに残った古い行だけはDELETEで消す。DROPしたパーティション数を返す。
+    """
+    today = date.today()
+    cutoff = _month_start(today.year, today.month - retention_months)
+
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'ai_usage_logs'::regclass
+    """)
+    dropped = 0
+    for (name,) in cur.fetchall():
+        match = _PARTITION_NAME_RE.match(name)
+        if not match:
+            continue
+        start = date(int(match.group(1)), int(match.group(2)), 1)
+        if _month_start(start.year, start.month + 1) <= cutoff:
+            cur.execute(f"DROP TABLE {name}")
+            logger.info(f"Dropped expired partition {name}")
+            dropped += 1
+
+    cur.execute("DELETE FROM ai_usage_logs_default WHERE timestamp < %s", (cutoff,))
+    if cur.rowcount:
+        logger.info(f"Deleted {cur.rowcount} expired rows from ai_usage_logs_default")
+    return dropped
+
+
+def is_partitioned(cur) -> bool:
+    """ai_usage_logsがパーティションテーブルか（旧来の通常テーブルのままならFalse）"""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = 'ai_usage_logs'::regclass")
+    return cur.fetchone()[0] == 'p'
+
+
+def maintain_partitions(dsn: str = None):
+    """先行パーティションの作成と期限切れパーティションの削除（スケジューラから月次で呼ぶ）"""
+    dsn = dsn or LOG_DB_URL
+    if not dsn:
+        return
+
+    try:
+        with pooled_connection(dsn) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('ai_usage_logs')")
+                if cur.fetchone()[0] is None or not is_partitioned(cur):
+                    return
+                ensure_partitions(cur)
+                drop_expired_partitions(cur)
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to maintain ai_usage_logs partitions: {e}")
+
+
 def init_db():
     if not LOG_DB_URL:
         logger.error("LOG_DATABASE_URL environment variable is not set.")
@@ -23,32 +141,52 @@ def init_db():
         cur = conn.cursor()
 
         # Create table SQL
+        # timestampによる月次レンジパーティション。主キーにはパーティションキーを含める必要がある。
+        # 親テーブル自体はUNLOGGEDにできないため、各パーティションをUNLOGGEDで作成する。
         create_table_query = """
         CREATE TABLE IF NOT EXISTS ai_usage_logs (
-            id SERIAL PRIMARY KEY,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            id SERIAL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
             model_name VARCHAR(255) NOT NULL,
             status VARCHAR(50) NOT NULL,  -- 'success' or 'error'
             tokens_used INTEGER DEFAULT 0,
             completion_tokens INTEGER DEFAULT 0,
             prompt_tokens INTEGER DEFAULT 0,
             error_message TEXT,
-            latency_ms INTEGER
-        );
+            latency_ms INTEGER,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
         """
 
-        # Create index on timestamp for faster queries
+        # Create index on timestamp for faster queries (各パーティションに自動で作成される)
         create_index_query = """
         CREATE INDEX IF NOT EXISTS idx_ai_logs_timestamp ON ai_usage_logs(timestamp DESC);
         """
 
+        # モデルごとの最新行を引く集計（get_model_status）用
+        create_model_index_query = """
+        CREATE INDEX IF NOT EXISTS idx_logs_model_ts ON ai_usage_logs(model_name, timestamp DESC);
+        """
+
         logger.info("Creating table 'ai_usage_logs'...")
         cur.execute(create_table_query)
         
         logger.info("Creating index on timestamp...")
         cur.execute(create_index_query)
+        logger.info("Creating index on (model_name, timestamp)...")
+        cur.execute(create_model_index_query)
 
+        # テーブルとインデックスは先に確定させ、パーティション作成の失敗で巻き戻らないようにする
         conn.commit()
+
+        # 既存の非パーティションテーブルがある場合はそのまま使う（移行は手動）
+        if is_partitioned(cur):
+            logger.info("Creating monthly partitions...")
+            ensure_partitions(cur)
+            conn.commit()
+        else:
+            logger.warning("'ai_usage_logs' already exists as a regular table; skipping partitioning.")
+
         cur.close()
         conn.close()
 
@@ -59,4 +197,5 @@ def init_db():
         print(f"Failed to initialize database: {e}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     init_db()
@@ -18,13 +18,14 @@ def inspect_html():
         page.wait_for_timeout(5000)
         
         # Look for JSON data in script tags
-        scripts = page.query_selector_all('script')
-        for i, script in enumerate(scripts):
-            content = script.inner_text()
-            if "__UNIVERSAL_DATA_FOR_REHYDRATION__" in content or "SIGI_STATE" in content:
-                print(f"Found potential JSON data in script tag {i}")
-                with open(f"tiktok_script_{i}.json", "w", encoding="utf-8") as f:
-                    f.write(content)
+        # Filter inside the page so only matching scripts cross the CDP bridge (one round-trip)
+        hits = page.evaluate("""() => Array.from(document.scripts)
+            .map((s, i) => ({i, t: s.textContent || ""}))
+            .filter(x => /__UNIVERSAL_DATA_FOR_REHYDRATION__|SIGI_STATE/.test(x.t))""")
+        for hit in hits:
+            print(f"Found potential JSON data in script tag {hit['i']}")
+            with open(f"tiktok_script_{hit['i']}.json", "w", encoding="utf-8") as f:
+                f.write(hit['t'])
         
         # Save HTML for analysis
         with open("tiktok_debug.html", "w", encoding="utf-8") as f:
@@ -1,14 +1,54 @@
 import os
 import logging
 import re
-import json
-import psycopg2
-from datetime import datetime, timedelta
+import orjson
+import time
+import threading
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 from urllib.parse import urlparse
 import requests
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+from cachetools import TTLCache
 import google.generativeai as genai
+from rate_limiter import get_limiter
+from db_pool import pooled_connection, BackgroundBatchWriter
+from http_session import make_session
+
+_WS_RE = re.compile(r'\s+')
+_TAG_GAP_RE = re.compile(r'>\s+<')
+
+# レイアウト解析の固定指示（HTMLとドメインはリクエストごとにユーザー入力として渡す）
+_LAYOUT_SYSTEM_INSTRUCTION = """あなたはWebページのレイアウト解析の専門家です。
+与えられたHTML（レシピページ）を解析し、「調理モード」表示のためのCSSセレクタを抽出してください。
+
+## タスク
+1. レシピ閲覧に不要な要素（広告、サイドバー、ナビゲーション、SNSボタン、コメント欄、おすすめ記事など）を非表示にするためのCSSセレクタを特定
+2. レシピのメインコンテンツ（料理名、材料、手順）を含む要素のCSSセレクタを特定
+
+## 出力形式
+必ず以下のJSON形式で出力してください。それ以外のテキストは不要です。
+
+```json
+{
+  "site_domain": "example.com",
+  "hide_selectors": [
+    ".ad-container",
+    "#sidebar",
+    ".social-buttons",
+    "..."
+  ],
+  "main_content_selector": ".recipe-main"
+}
+```
+
+## 注意事項
+- hide_selectorsは配列で、CSSセレクタを文字列で列挙
+- 確実に存在する要素のセレクタのみを含める
+- 一般的すぎるセレクタ（div, span等）は避ける
+- main_content_selectorはレシピ本体を含む最も適切な1つのセレクタ
+"""
 
 
 class LayoutAnalyzer:
@@ -18,10 +58,24 @@ class LayoutAnalyzer:
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         self.database_url = os.getenv("DATABASE_URL")
         self._gemini_initialized = False
+        self._gemini_model = None
         self.cache_expiry_days = 30
 
-        self.session = requests.Session()
-        self.session.headers.update({
+        # よく使われるドメインのルールはプロセス内にも保持してDB往復を省く
+        # 未登録ドメイン（None）は解析後すぐ保存されるため短めのTTLで持つ
+        self._mem_cache = TTLCache(maxsize=512, ttl=600)
+        self._negative_cache = TTLCache(maxsize=512, ttl=60)
+        self._mem_cache_lock = threading.RLock()
+
+        # 利用履歴はリクエストの応答を待たせないよう、バックグラウンドでまとめてINSERTする
+        # インスタンスはスレッド間で共有されるため、初回呼び出し時ではなくここで作る
+        self._log_writer = BackgroundBatchWriter(
+            self.database_url,
+            "INSERT INTO layout_analysis_logs (user_id, recipe_url, site_domain, created_at) VALUES %s"
+        ) if self.database_url else None
+
+        # 同一ホストへの並列リクエストで接続を使い回し、一時的な失敗はGET/HEADのみ短く再試行
+        self.session = make_session({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8'
@@ -36,6 +90,11 @@ class LayoutAnalyzer:
                     "Please set GEMINI_API_KEY environment variable."
                 )
             genai.configure(api_key=self.gemini_api_key)
+            # 固定の指示文はsystem_instructionとして持たせたモデルを使い回す
+            self._gemini_model = genai.GenerativeModel(
+                'gemini-2.0-flash-lite',
+                system_instruction=_LAYOUT_SYSTEM_INSTRUCTION
+            )
             self._gemini_initialized = True
 
     def _extract_domain(self, url: str) -> str:
@@ -59,25 +118,27 @@ class LayoutAnalyzer:
 
     def _lightweight_html(self, html: str) -> str:
         """HTMLを軽量化（script, style, コメント等を削除）してAIに渡す"""
-        soup = BeautifulSoup(html, 'html.parser')
+        if not html or not html.strip():
+            return ''
 
-        for tag in soup.find_all(['script', 'style', 'noscript', 'iframe', 'svg', 'path']):
-            tag.decompose()
+        # lxml（C実装）でパース。コメントはパース時に除去する
+        parser = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True)
+        root = lxml.html.document_fromstring(html.encode('utf-8'), parser=parser)
 
-        for comment in soup.find_all(string=lambda text: isinstance(text, type(soup.new_string(''))) and text.parent.name is None):
-            pass
+        etree.strip_elements(root, 'script', 'style', 'noscript', 'iframe', 'svg', 'path', with_tail=False)
 
-        for tag in soup.find_all(True):
-            attrs_to_keep = ['class', 'id', 'role', 'aria-label', 'data-testid']
-            attrs = dict(tag.attrs)
-            for attr in attrs:
+        attrs_to_keep = {'class', 'id', 'role', 'aria-label', 'data-testid'}
+        for tag in root.iter():
+            if not isinstance(tag.tag, str):
+                continue
+            for attr in list(tag.attrib):
                 if attr not in attrs_to_keep:
-                    del tag.attrs[attr]
+                    del tag.attrib[attr]
 
-        html_text = str(soup)
+        html_text = lxml.html.tostring(root, encoding='unicode')
 
-        html_text = re.sub(r'\s+', ' ', html_text)
-        html_text = re.sub(r'>\s+<', '><', html_text)
+        html_text = _WS_RE.sub(' ', html_text)
+        html_text = _TAG_GAP_RE.sub('><', html_text)
 
         max_length = 50000
         if len(html_text) > max_length:
@@ -92,25 +153,29 @@ class LayoutAnalyzer:
             logging.warning("DATABASE_URL not set, skipping cache check")
             return None
 
-        try:
-            conn = psycopg2.connect(self.database_url)
-            cur = conn.cursor()
+        with self._mem_cache_lock:
+            rules = self._mem_cache.get(site_domain)
+            if rules is not None:
+                return dict(rules)
+            if site_domain in self._negative_cache:
+                return None
 
+        try:
             expiry_date = datetime.now() - timedelta(days=self.cache_expiry_days)
 
-            cur.execute("""
-                SELECT site_domain, hide_selectors, main_content_selector, created_at, updated_at
-                FROM layout_rules
-                WHERE site_domain = %s AND updated_at > %s
-            """, (site_domain, expiry_date))
+            with pooled_connection(self.database_url) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT site_domain, hide_selectors, main_content_selector, created_at, updated_at
+                        FROM layout_rules
+                        WHERE site_domain = %s AND updated_at > %s
+                    """, (site_domain, expiry_date))
 
-            row = cur.fetchone()
-            cur.close()
-            conn.close()
+                    row = cur.fetchone()
 
             if row:
                 logging.info(f"Cache hit for domain: {site_domain}")
-                return {
+                rules = {
                     'site_domain': row[0],
                     'hide_selectors': row[1] if row[1] else [],
                     'main_content_selector': row[2],
@@ -118,14 +183,34 @@ class LayoutAnalyzer:
                     'updated_at': row[4].isoformat() if row[4] else None,
                     'cached': True
                 }
+                with self._mem_cache_lock:
+                    self._mem_cache[site_domain] = rules
+                return dict(rules)
 
             logging.info(f"Cache miss for domain: {site_domain}")
+            with self._mem_cache_lock:
+                self._negative_cache[site_domain] = True
             return None
 
         except Exception as e:
             logging.error(f"Error checking cache: {e}")
             return None
 
+    def _normalize_selectors(self, selectors: Any) -> List[str]:
+        """セレクタを正規化（空白の正規化・空要素と重複の除去、順序は維持）"""
+        if not isinstance(selectors, list):
+            return []
+        seen = set()
+        normalized = []
+        for selector in selectors:
+            if not isinstance(selector, str):
+                continue
+            selector = _WS_RE.sub(' ', selector).strip()
+            if selector and selector not in seen:
+                seen.add(selector)
+                normalized.append(selector)
+        return normalized
+
     def _save_rules_to_db(self, site_domain: str, hide_selectors: List[str], main_content_selector: str) -> bool:
         """ルールをDBに保存（UPSERT）"""
         if not self.database_url:
@@ -133,22 +218,23 @@ class LayoutAnalyzer:
             return False
 
         try:
-            conn = psycopg2.connect(self.database_url)
-            cur = conn.cursor()
-
-            cur.execute("""
-                INSERT INTO layout_rules (site_domain, hide_selectors, main_content_selector, created_at, updated_at)
-                VALUES (%s, %s, %s, NOW(), NOW())
-                ON CONFLICT (site_domain)
-                DO UPDATE SET
-                    hide_selectors = EXCLUDED.hide_selectors,
-                    main_content_selector = EXCLUDED.main_content_selector,
-                    updated_at = NOW()
-            """, (site_domain, hide_selectors, main_content_selector))
-
-            conn.commit()
-            cur.close()
-            conn.close()
+            with pooled_connection(self.database_url) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        INSERT INTO layout_rules (site_domain, hide_selectors, main_content_selector, created_at, updated_at)
+                        VALUES (%s, %s, %s, NOW(), NOW())
+                        ON CONFLICT (site_domain)
+                        DO UPDATE SET
+                            hide_selectors = EXCLUDED.hide_selectors,
+                            main_content_selector = EXCLUDED.main_content_selector,
+                            updated_at = NOW()
+                    """, (site_domain, hide_selectors, main_content_selector))
+
+                conn.commit()
+
+            with self._mem_cache_lock:
+                self._mem_cache.pop(site_domain, None)
+                self._negative_cache.pop(site_domain, None)
 
             logging.info(f"Saved rules for domain: {site_domain}")
             return True
@@ -159,78 +245,43 @@ class LayoutAnalyzer:
 
     def _log_analysis(self, user_id: str, recipe_url: str, site_domain: str) -> bool:
         """利用履歴をDBに記録"""
-        if not self.database_url:
+        if self._log_writer is None:
             return False
 
-        try:
-            conn = psycopg2.connect(self.database_url)
-            cur = conn.cursor()
-
-            cur.execute("""
-                INSERT INTO layout_analysis_logs (user_id, recipe_url, site_domain, created_at)
-                VALUES (%s, %s, %s, NOW())
-            """, (user_id, recipe_url, site_domain))
-
-            conn.commit()
-            cur.close()
-            conn.close()
-
-            logging.info(f"Logged analysis for user: {user_id}, domain: {site_domain}")
-            return True
-
-        except Exception as e:
-            logging.error(f"Error logging analysis: {e}")
-            return False
+        # 時刻はアプリホストのタイムゾーンに依存しないようUTCで渡す
+        queued = self._log_writer.put((user_id, recipe_url, site_domain, datetime.now(timezone.utc)))
+        if queued:
+            logging.info(f"Queued analysis log for user: {user_id}, domain: {site_domain}")
+        return queued
 
     def _analyze_with_gemini(self, html: str, site_domain: str) -> Dict[str, Any]:
         """Gemini 2.0 Flash LiteでHTMLを解析してCSSセレクタを抽出"""
         self._ensure_gemini_initialized()
 
-        prompt = f"""あなたはWebページのレイアウト解析の専門家です。
-以下のHTML（{site_domain}のレシピページ）を解析し、「調理モード」表示のためのCSSセレクタを抽出してください。
-
-## タスク
-1. レシピ閲覧に不要な要素（広告、サイドバー、ナビゲーション、SNSボタン、コメント欄、おすすめ記事など）を非表示にするためのCSSセレクタを特定
-2. レシピのメインコンテンツ（料理名、材料、手順）を含む要素のCSSセレクタを特定
-
-## 出力形式
-必ず以下のJSON形式で出力してください。それ以外のテキストは不要です。
-
-```json
-{{
-  "site_domain": "{site_domain}",
-  "hide_selectors": [
-    ".ad-container",
-    "#sidebar",
-    ".social-buttons",
-    "..."
-  ],
-  "main_content_selector": ".recipe-main"
-}}
-```
-
-## 注意事項
-- hide_selectorsは配列で、CSSセレクタを文字列で列挙
-- 確実に存在する要素のセレクタのみを含める
-- 一般的すぎるセレクタ（div, span等）は避ける
-- main_content_selectorはレシピ本体を含む最も適切な1つのセレクタ
+        prompt = f"""以下のHTML（{site_domain}のレシピページ）を解析してください。
+site_domainには "{site_domain}" を設定してください。
 
 ## 解析対象HTML
 {html}
 """
 
+        limiter = get_limiter("gemini")
         try:
-            model = genai.GenerativeModel('gemini-2.0-flash-lite')
+            model = self._gemini_model
+            limiter.acquire(estimated_tokens=len(prompt) // 4)
+            started = time.monotonic()
             response = model.generate_content(prompt)
+            limiter.record_success((time.monotonic() - started) * 1000)
 
             response_text = response.text.strip()
 
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
-            if json_match:
-                result = json.loads(json_match.group())
+            json_start = response_text.find('{')
+            json_end = response_text.rfind('}')
+            if json_start != -1 and json_end > json_start:
+                result = orjson.loads(response_text[json_start:json_end + 1])
 
-                if 'hide_selectors' not in result:
-                    result['hide_selectors'] = []
+                # 重複・空のセレクタを除いて保存サイズとレスポンスを小さくする
+                result['hide_selectors'] = self._normalize_selectors(result.get('hide_selectors'))
                 if 'main_content_selector' not in result:
                     result['main_content_selector'] = 'body'
                 if 'site_domain' not in result:
@@ -245,7 +296,7 @@ class LayoutAnalyzer:
                 'main_content_selector': 'body'
             }
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logging.error(f"JSON parse error from Gemini: {e}")
             return {
                 'site_domain': site_domain,
@@ -253,6 +304,8 @@ class LayoutAnalyzer:
                 'main_content_selector': 'body'
             }
         except Exception as e:
+            if '429' in str(e) or 'ResourceExhausted' in type(e).__name__:
+                limiter.record_rate_limited()
             logging.error(f"Gemini API error: {e}")
             raise ValueError(f"AI解析中にエラーが発生しました: {str(e)}")
 
@@ -1,10 +1,232 @@
 import os
 import re
 import logging
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, parse_qs
-import json
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from cachetools import TTLCache
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib.parse import urlparse, parse_qs, parse_qsl, urlencode, urlunparse
+import html
+import orjson
+from types import MappingProxyType
+from http_session import make_session
+
+# BeautifulSoup backend: lxml (C extension) is several times faster than html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+# Only the tags we read are materialized; everything else is skipped while parsing
+_LITE_PAGE_STRAINER = SoupStrainer(['link', 'meta', 'script'])
+
+# URL -> ID extraction patterns, compiled once at import
+# (single alternation: watch?v=/embed/shorts/... or youtu.be/<id>)
+_YT_ID_RE = re.compile(r'(?:v=|/)([0-9A-Za-z_-]{11})|youtu\.be/([0-9A-Za-z_-]{11})')
+_TT_RE = re.compile(r'\/video\/(\d+)')
+_IG_RE = re.compile(r'\/(p|reel)\/([A-Za-z0-9-_]+)')
+_TT_USER_RE = re.compile(r'tiktok\.com/@([^/]+)')
+_IG_USER_RE = re.compile(r'instagram\.com/([^/]+)/')
+# og:title of a post: 'author on Instagram: "caption"' (caption ends at the next ': "' or the end)
+_IG_TITLE_RE = re.compile(r'(?P<author>.*?) on Instagram(?=:)(?:.*?: "(?P<caption>.*?)(?=: "|\Z))?', re.DOTALL)
+_PLAYLIST_ID_RE = re.compile(r'list=([^&]+)')
+
+# Scraping patterns
+_TT_SCRIPT_URL_RE = re.compile(r'https://[^"]*tiktok\.com/[^"]*video/\d+[^"]*')
+_TT_DESC_AUTHOR_RE = re.compile(r'@([^\s,\.\!\?]+)')
+# One pass finds every title candidate field; they are then tried in _TT_TITLE_FIELDS order
+_TT_TITLE_FIELD_RE = re.compile(r'"(title|desc|description)":\s*"([^"]+)"')
+_TT_TITLE_FIELDS = ('title', 'desc', 'description')
+_TT_JSON_OBJ_RE = re.compile(r'\{[^{}]*"title"[^{}]*\}')
+_QUOTE_RES = [re.compile(p) for p in (
+    r'"([^"]+)"',  # Double quotes
+    r'"([^"]+)"',  # Japanese quotes
+    r"'([^']+)'",  # Single quotes
+)]
+_TT_STATS_RE = re.compile(
+    r'^\d+\.?\d*[KMB]?\s+(likes|comments|views|shares)[,\s]*(\d+\.?\d*[KMB]?\s+(likes|comments|views|shares)[,\s]*)*\.?\s*',
+    re.IGNORECASE
+)
+# Meta tags are read with a single regex pass over the raw bytes instead of DOM lookups.
+# Quoted attribute values are consumed whole so a '>' inside content="..." does not end the tag
+_META_TAG_RE = re.compile(rb'<meta\s(?:[^>"\']|"[^"]*"|\'[^\']*\')*>', re.IGNORECASE)
+# Attribute values may be double-quoted, single-quoted or bare (content=foo)
+_ATTR_RE = re.compile(rb'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+# JSON-LD blocks carved straight out of the raw bytes (Instagram structured data)
+_LD_JSON_RE = re.compile(rb'<script[^>]+application/ld\+json[^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+# Inline script bodies, for the TikTok script-data fallback
+_SCRIPT_BODY_RE = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+# JSON string body with escapes (\" \u0026 ...) so names containing quotes are not cut short
+_CHANNEL_NAME_RE = re.compile(rb'"channelName":"((?:[^"\\]|\\.)+)"')
+_WATCH_HREF_RE = re.compile(r'/watch\?v=')
+_HREF_VIDEO_ID_RE = re.compile(r'v=([^&]+)')
+_SCRIPT_VIDEO_ID_RE = re.compile(r'"videoId":"([^"]+)"')
+
+# 短縮URLの解決結果（1日）とSupabaseのメタデータ（1時間）をプロセス内で共有
+_SHORT_URL_CACHE = TTLCache(maxsize=10_000, ttl=86400)
+_SUPABASE_METADATA_CACHE = TTLCache(maxsize=10_000, ttl=3600)
+# 抽出結果そのもの（正規化URLをキーに、既定1時間）
+_METADATA_CACHE = TTLCache(maxsize=10_000, ttl=int(os.getenv("METADATA_CACHE_TTL_SECONDS", "3600")))
+# タイトルもサムネイルも取れなかった結果（フォールバック失敗）は短時間だけ持ち、すぐ取り直す
+_DEGRADED_METADATA_CACHE = TTLCache(maxsize=10_000, ttl=60)
+# 抽出中のURL -> Future（同時に来た同一URLは1回だけ抽出する）
+_IN_FLIGHT = {}
+# TikTok/Instagram approaches are raced: each starts this much later than the previous one,
+# and a successful lower-priority approach waits this long for a higher-priority one to finish
+_APPROACH_STAGGER_SECONDS = 0.1
+_APPROACH_PRIORITY_GRACE_SECONDS = 1.0
+
+# Scraping approaches in priority order: (target kind, request headers). Built once at import
+# as read-only mappings shared by every request; the concrete URL for each kind is filled in per call.
+_TIKTOK_APPROACHES = (
+    # Approach 1: TikTok oEmbed API (最優先 - 正確なタイトル取得)
+    ('oembed', MappingProxyType({
+        'User-Agent': 'Expo/1017721 CFNetwork/3826.600.41 Darwin/24.6.0',  # 成功実績のあるUser-Agent
+        'Accept': 'application/json,text/plain,*/*',
+        'Accept-Language': 'en-US,en;q=0.9,ja;q=0.8',
+    })),
+    # Approach 2: Alternative oEmbed with different User-Agent
+    ('oembed', MappingProxyType({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'application/json,text/plain,*/*',
+        'Referer': 'https://www.tiktok.com/',
+    })),
+    # Approach 3: Mobile user agent (フォールバック)
+    ('page', MappingProxyType({
+        'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Referer': 'https://www.tiktok.com/',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    })),
+    # Approach 4: Facebook external crawler
+    ('page', MappingProxyType({
+        'User-Agent': 'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+    })),
+)
+_INSTAGRAM_APPROACHES = (
+    # Approach 1: Try embed URL (often has more accessible metadata)
+    ('embed', MappingProxyType({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Referer': 'https://www.instagram.com/',
+    })),
+    # Approach 2: Original URL with different headers
+    ('no_hl', MappingProxyType({
+        'User-Agent': 'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+    })),
+    # Approach 3: Mobile user agent
+    ('page', MappingProxyType({
+        'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'max-age=0',
+    })),
+)
+
+# プレイリスト内動画の詳細（動画IDごとに1時間）。再取得時は新しいIDだけ問い合わせる
+_VIDEO_DETAILS_CACHE = TTLCache(maxsize=20_000, ttl=3600)
+
+_TIKTOK_OEMBED_HEADERS = MappingProxyType({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json'
+})
+
+# 期限切れ後の再検証用（ETag/Last-Modified と前回のメタデータ、7日）
+_REVALIDATION_CACHE = TTLCache(maxsize=10_000, ttl=7 * 86400)
+_CACHE_LOCK = threading.Lock()
+
+# (substring, platform) pairs checked in order against the lowercased URL
+_PLATFORM_MARKERS = (
+    ("youtube.com", "youtube"),
+    ("youtu.be", "youtube"),
+    ("tiktok.com", "tiktok"),
+    ("instagram.com", "instagram"),
+)
+
+# Query parameters that never change which video a URL points to
+_TRACKING_PARAMS = frozenset((
+    'si', 'feature', 'hl', 'pp', 'ab_channel', 't', 'is_from_webapp', 'sender_device',
+    'igsh', 'igshid', 'fbclid', 'gclid', 'utm_source', 'utm_medium', 'utm_campaign',
+    'utm_term', 'utm_content',
+))
+
+
+def _canonicalize_url(url: str) -> str:
+    """Normalize a URL for use as a cache key (lowercase host, no tracking params or fragment)"""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith('utm_')
+    )
+    path = parsed.path.rstrip('/')
+    
+    # youtu.be/<id> and youtube.com/watch?v=<id> point to the same video
+    if host == 'youtu.be' and path:
+        query = sorted(query + [('v', path.lstrip('/'))])
+        host, path = 'www.youtube.com', '/watch'
+    elif host in ('youtube.com', 'm.youtube.com'):
+        host = 'www.youtube.com'
+    
+    return urlunparse(('https', host, path, '', urlencode(query), ''))
+
+
+def _scan_meta(content: bytes) -> dict:
+    """
+    Collect <meta> tags keyed by lowercase property/name -> content (first occurrence wins).
+    Values are decoded as UTF-8 and HTML-unescaped, matching what BeautifulSoup would return.
+    """
+    metas = {}
+    for tag in _META_TAG_RE.finditer(content):
+        attrs = {}
+        for attr in _ATTR_RE.finditer(tag.group()):
+            value = attr.group(2)
+            if value is None:
+                value = attr.group(3) if attr.group(3) is not None else attr.group(4)
+            attrs[attr.group(1).lower()] = value
+        key = attrs.get(b'property') or attrs.get(b'name')
+        value = attrs.get(b'content')
+        if key and value is not None:
+            metas.setdefault(
+                key.decode('utf-8', errors='ignore').lower(),
+                html.unescape(value.decode('utf-8', errors='ignore'))
+            )
+    return metas
+
+
+# URL -> ID extraction is pure; hot URLs (re-submitted shares, batch duplicates) hit the LRU
+@lru_cache(maxsize=4096)
+def _youtube_id(url: str) -> str:
+    if match := _YT_ID_RE.search(url):
+        return match.group(1) or match.group(2)
+    return ""
+
+
+@lru_cache(maxsize=4096)
+def _tiktok_id(url: str) -> str:
+    match = _TT_RE.search(url.partition('?')[0])
+    return match.group(1) if match else ""
+
+
+@lru_cache(maxsize=4096)
+def _instagram_id(url: str) -> str:
+    match = _IG_RE.search(url.partition('?')[0])
+    return match.group(2) if match else ""
+
 
 class MetadataExtractor:
     """Extract metadata from various social media platforms"""
@@ -14,12 +236,15 @@ class MetadataExtractor:
         self.scrapingbee_api_key = os.getenv("SCRAPINGBEE_API_KEY")
         self.supabase_url = os.getenv("SUPABASE_URL")
         self.supabase_anon_key = os.getenv("SUPABASE_ANON_KEY")
+        self._supabase_headers = MappingProxyType({"Authorization": f"Bearer {self.supabase_anon_key}"})
         
         # Set up session for HTTP requests
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # Keep more keep-alive connections per host so threaded requests reuse TCP+TLS,
+        # and retry transient failures on idempotent requests with a short backoff
+        self.session = make_session({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept-Encoding': 'gzip, deflate',
+        }, pool_connections=32, pool_maxsize=128)
     
     def extract_metadata(self, url: str) -> dict:
         """
@@ -34,6 +259,78 @@ class MetadataExtractor:
         if not url:
             raise ValueError("URL cannot be empty")
         
+        # Duplicate URLs (modulo tracking params) are served from cache; a duplicate arriving
+        # while the first request is still extracting waits for that result instead
+        cache_key = _canonicalize_url(url)
+        with _CACHE_LOCK:
+            cached = _METADATA_CACHE.get(cache_key)
+            if cached is None:
+                cached = _DEGRADED_METADATA_CACHE.get(cache_key)
+            stale = _REVALIDATION_CACHE.get(cache_key) if cached is None else None
+            in_flight = _IN_FLIGHT.get(cache_key) if cached is None else None
+            is_owner = cached is None and in_flight is None
+            if is_owner:
+                in_flight = _IN_FLIGHT[cache_key] = Future()
+        if cached is not None:
+            return dict(cached)
+        if not is_owner:
+            return dict(in_flight.result())  # re-raises the first request's error
+        
+        try:
+            # Expired entry with validators: a conditional HEAD answering 304 means nothing changed
+            if stale is not None and self._is_not_modified(stale):
+                logging.debug("Metadata not modified, reusing cached entry for %s", url)
+                metadata = stale['metadata']
+            else:
+                metadata = self._extract_metadata_uncached(url)
+                validators = metadata.pop('_validators', None)
+                stale = dict(validators, metadata=metadata) if validators else None
+            
+            with _CACHE_LOCK:
+                if metadata.get('title') or metadata.get('thumbnailUrl'):
+                    _METADATA_CACHE[cache_key] = metadata
+                    if stale is not None:
+                        _REVALIDATION_CACHE[cache_key] = stale
+                else:
+                    _DEGRADED_METADATA_CACHE[cache_key] = metadata
+            in_flight.set_result(metadata)
+            return dict(metadata)
+        except BaseException as e:
+            in_flight.set_exception(e)
+            raise
+        finally:
+            with _CACHE_LOCK:
+                _IN_FLIGHT.pop(cache_key, None)
+    
+    def _is_not_modified(self, entry: dict) -> bool:
+        """Revalidate a stored source response with If-None-Match / If-Modified-Since"""
+        headers = dict(entry['headers'])
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.session.head(entry['url'], headers=headers, timeout=5, allow_redirects=True)
+            return response.status_code == 304
+        except requests.RequestException as e:
+            logging.debug("Revalidation request failed: %s", e)
+            return False
+    
+    def _attach_validators(self, metadata: dict, response, headers: dict = None) -> dict:
+        """Record the source response's ETag/Last-Modified so the entry can be revalidated later"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            metadata['_validators'] = {
+                'url': response.url,
+                'headers': dict(headers or {}),
+                'etag': etag,
+                'last_modified': last_modified,
+            }
+        return metadata
+    
+    def _extract_metadata_uncached(self, url: str) -> dict:
+        """Dispatch to the platform-specific extractor"""
         # Check if it's a YouTube playlist
         if self._is_youtube_playlist(url):
             return self._extract_youtube_playlist_metadata(url)
@@ -50,18 +347,41 @@ class MetadataExtractor:
         else:
             raise ValueError(f"Unsupported platform for URL: {url}")
     
+    def extract_many(self, urls: list, max_workers: int = 8) -> list:
+        """
+        Extract metadata for several URLs concurrently
+        
+        Args:
+            urls (list): URLs to extract metadata from
+            max_workers (int): Maximum number of concurrent extractions
+            
+        Returns:
+            list: One entry per URL in input order - the metadata dict, or the
+                  Exception raised for that URL
+        """
+        def extract_one(url):
+            try:
+                return self.extract_metadata(url)
+            except Exception as e:
+                return e
+        
+        if len(urls) <= 1:
+            return [extract_one(url) for url in urls]
+        
+        # YouTube videos are fetched up to 50 per Data API call and served from cache below
+        if self.youtube_api_key:
+            self._prefetch_youtube_api_metadata(urls)
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            return list(executor.map(extract_one, urls))
+    
     def _detect_platform(self, url: str) -> str:
         """Detect which platform the URL belongs to"""
         url_lower = url.lower()
-        
-        if "youtube.com" in url_lower or "youtu.be" in url_lower:
-            return "youtube"
-        elif "tiktok.com" in url_lower:
-            return "tiktok"
-        elif "instagram.com" in url_lower:
-            return "instagram"
-        else:
-            return "unknown"
+        for needle, platform in _PLATFORM_MARKERS:
+            if needle in url_lower:
+                return platform
+        return "unknown"
     
     def _extract_youtube_metadata(self, url: str) -> dict:
         """Extract metadata from YouTube URLs"""
@@ -84,17 +404,7 @@ class MetadataExtractor:
     
     def _extract_youtube_id(self, url: str) -> str:
         """Extract YouTube video ID from URL"""
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'youtu\.be\/([0-9A-Za-z_-]{11}).*'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        return ""
+        return _youtube_id(url)
     
     def _generate_youtube_embed_code(self, video_id: str) -> str:
         """Generate YouTube embed code"""
@@ -112,13 +422,76 @@ class MetadataExtractor:
         response = self.session.get(api_url, params=params, timeout=10)
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         
         if not data.get('items'):
             raise ValueError("Video not found or is private")
         
-        snippet = data['items'][0]['snippet']
+        return self._youtube_snippet_metadata(video_id, data['items'][0]['snippet'])
+    
+    def _get_youtube_api_metadata_batch(self, video_ids: list) -> dict:
+        """Get metadata for up to 50 videos with one Data API call; returns {video_id: metadata}"""
+        api_url = "https://www.googleapis.com/youtube/v3/videos"
+        params = {
+            'part': 'snippet',
+            'id': ','.join(video_ids[:50]),
+            'key': self.youtube_api_key
+        }
+        
+        response = self.session.get(api_url, params=params, timeout=10)
+        response.raise_for_status()
         
+        data = orjson.loads(response.content)
+        
+        # Private / deleted videos are simply absent from the response
+        return {
+            item['id']: self._youtube_snippet_metadata(item['id'], item['snippet'])
+            for item in data.get('items', [])
+        }
+    
+    def _prefetch_youtube_api_metadata(self, urls: list):
+        """Fill the metadata cache for uncached YouTube video URLs using batched API calls"""
+        pending = {}  # video_id -> cache keys of the URLs pointing at it
+        for url in urls:
+            if not url or self._detect_platform(url) != "youtube" or self._is_youtube_playlist(url):
+                continue
+            cache_key = _canonicalize_url(url)
+            with _CACHE_LOCK:
+                if cache_key in _METADATA_CACHE:
+                    continue
+            video_id = self._extract_youtube_id(url)
+            if video_id:
+                pending.setdefault(video_id, []).append(cache_key)
+        
+        # A single video gains nothing from batching; the normal path handles it
+        if len(pending) < 2:
+            return
+        
+        video_ids = list(pending)
+        chunks = [video_ids[i:i + 50] for i in range(0, len(video_ids), 50)]
+        
+        def fetch(chunk):
+            try:
+                return self._get_youtube_api_metadata_batch(chunk)
+            except Exception as e:
+                # Missing entries fall back to the per-URL path (API, then scraping)
+                logging.warning(f"YouTube API batch request failed for {len(chunk)} videos: {e}")
+                return {}
+        
+        if len(chunks) == 1:
+            results = [fetch(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(4, len(chunks))) as executor:
+                results = list(executor.map(fetch, chunks))
+        
+        with _CACHE_LOCK:
+            for found in results:
+                for video_id, metadata in found.items():
+                    for cache_key in pending.get(video_id, ()):
+                        _METADATA_CACHE[cache_key] = metadata
+    
+    def _youtube_snippet_metadata(self, video_id: str, snippet: dict) -> dict:
+        """Build the metadata dict from a Data API snippet"""
         return {
             "platform": "youtube",
             "unique_video_id": video_id,
@@ -130,48 +503,62 @@ class MetadataExtractor:
     
     def _scrape_youtube_metadata(self, url: str, video_id: str) -> dict:
         """Scrape YouTube metadata from web page"""
-        response = self.session.get(url, timeout=10)
-        response.raise_for_status()
+        # Watch pages are ~1MB; everything we read is in <head> plus the first channelName
+        head_seen = False
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        def have_everything(buf: bytearray, start: int) -> bool:
+            nonlocal head_seen
+            head_seen = head_seen or buf.find(b'</head>', start) != -1
+            return head_seen and _CHANNEL_NAME_RE.search(buf, start) is not None
+        
+        response, content = self._get_until(url, have_everything, timeout=10)
+        
+        # Single regex pass over the raw bytes for meta tags; no DOM is built
+        metas = _scan_meta(content)
         
         # Extract title
-        title = None
-        title_tag = soup.find('meta', property='og:title')
-        if title_tag and hasattr(title_tag, 'get'):
-            title = title_tag.get('content')
+        title = metas.get('og:title')
         
         # Extract thumbnail
-        thumbnail_url = None
-        thumbnail_tag = soup.find('meta', property='og:image')
-        if thumbnail_tag and hasattr(thumbnail_tag, 'get'):
-            thumbnail_url = thumbnail_tag.get('content')
+        thumbnail_url = metas.get('og:image')
         
-        # Extract author name from page title or meta tags
+        # Extract author name from the embedded player data
         author_name = None
-        # Try to find channel name in various places
-        for script in soup.find_all('script'):
-            if hasattr(script, 'string') and script.string and '"channelName"' in script.string:
-                try:
-                    # This is a simplified extraction - in production you'd want more robust parsing
-                    import json
-                    text = script.string
-                    start = text.find('"channelName":"') + 15
-                    end = text.find('"', start)
-                    if start > 14 and end > start:
-                        author_name = text[start:end]
-                        break
-                except:
-                    pass
+        channel_match = _CHANNEL_NAME_RE.search(content)
+        if channel_match:
+            try:
+                author_name = orjson.loads(b'"' + channel_match.group(1) + b'"')
+            except ValueError:
+                author_name = channel_match.group(1).decode('utf-8', errors='ignore')
         
-        return {
+        return self._attach_validators({
             "platform": "youtube",
             "unique_video_id": video_id,
             "title": title,
             "thumbnailUrl": thumbnail_url,
             "authorName": author_name,
             "embedCode": self._generate_youtube_embed_code(video_id)
-        }
+        }, response)
+    
+    def _get_until(self, url: str, done, headers: dict = None, timeout: int = 10,
+                   chunk_size: int = 65536):
+        """
+        Stream a GET and stop reading as soon as done(buf, start) is true
+        
+        start is where the newest chunk begins (minus a small overlap for matches that
+        straddle chunks), so checks only need to scan new data. Returns (response, body
+        read so far as a bytearray); the connection is dropped if the body was cut short.
+        """
+        buf = bytearray()
+        with self.session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                start = max(0, len(buf) - 256)
+                buf += chunk
+                if done(buf, start):
+                    break
+        # The bytearray is returned as-is (regexes, decode and orjson accept it); no extra copy
+        return response, buf
     
     def _extract_tiktok_metadata(self, url: str) -> dict:
         """Extract metadata from TikTok URLs"""
@@ -199,66 +586,30 @@ class MetadataExtractor:
         """Resolve TikTok short URLs and TikTok Lite URLs to full URLs"""
         # Handle TikTok Lite URLs (lite.tiktok.com)
         if "lite.tiktok.com" in url:
-            logging.info(f"Resolving TikTok Lite URL: {url}")
-            try:
-                # Follow redirects to get the actual TikTok URL
-                response = self.session.get(url, allow_redirects=True, timeout=10)
-                final_url = response.url
-                logging.info(f"TikTok Lite URL resolved to: {final_url}")
-                
-                # If it's still a lite URL, try to extract the actual video URL from the page
-                if "lite.tiktok.com" in final_url or not self._extract_tiktok_id(final_url):
-                    logging.info("Attempting to extract actual TikTok URL from TikTok Lite page")
-                    
-                    from bs4 import BeautifulSoup
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Look for canonical URL
-                    canonical_link = soup.find('link', rel='canonical')
-                    if canonical_link and canonical_link.get('href'):
-                        canonical_url = canonical_link.get('href')
-                        if "tiktok.com" in canonical_url and "/video/" in canonical_url:
-                            logging.info(f"Found canonical URL: {canonical_url}")
-                            return canonical_url
-                    
-                    # Look for og:url meta tag
-                    og_url = soup.find('meta', property='og:url')
-                    if og_url and og_url.get('content'):
-                        og_url_content = og_url.get('content')
-                        if "tiktok.com" in og_url_content and "/video/" in og_url_content:
-                            logging.info(f"Found og:url: {og_url_content}")
-                            return og_url_content
-                    
-                    # Look for Twitter card URL
-                    twitter_url = soup.find('meta', attrs={'name': 'twitter:url'})
-                    if twitter_url and twitter_url.get('content'):
-                        twitter_url_content = twitter_url.get('content')
-                        if "tiktok.com" in twitter_url_content and "/video/" in twitter_url_content:
-                            logging.info(f"Found Twitter URL: {twitter_url_content}")
-                            return twitter_url_content
-                    
-                    # Look for video URLs in script tags
-                    import re
-                    script_tags = soup.find_all('script')
-                    for script in script_tags:
-                        if script.string:
-                            # Look for TikTok video URLs in JavaScript
-                            tiktok_urls = re.findall(r'https://[^"]*tiktok\.com/[^"]*video/\d+[^"]*', script.string)
-                            for tiktok_url in tiktok_urls:
-                                if "lite.tiktok.com" not in tiktok_url:
-                                    logging.info(f"Found TikTok URL in script: {tiktok_url}")
-                                    return tiktok_url.split('?')[0]  # Remove query parameters
-                
-                return final_url
-                
-            except Exception as e:
-                logging.error(f"Error resolving TikTok Lite URL: {e}")
-                return url
+            with _CACHE_LOCK:
+                cached = _SHORT_URL_CACHE.get(url)
+            if cached:
+                return cached
+            resolved = self._resolve_tiktok_lite_url(url)
+            # Failures return the input unchanged and are not cached
+            if resolved != url:
+                with _CACHE_LOCK:
+                    _SHORT_URL_CACHE[url] = resolved
+            return resolved
         
         # Handle other short URLs
         if "vt.tiktok.com" in url or "vm.tiktok.com" in url:
+            with _CACHE_LOCK:
+                cached = _SHORT_URL_CACHE.get(url)
+            if cached:
+                return cached
             try:
                 response = self.session.head(url, allow_redirects=True, timeout=10)
+                if not (200 <= response.status_code < 400):
+                    logging.warning("Short TikTok URL returned HTTP %s: %s", response.status_code, url)
+                    return url
+                with _CACHE_LOCK:
+                    _SHORT_URL_CACHE[url] = response.url
                 return response.url
             except Exception as e:
                 logging.error(f"Error resolving short TikTok URL: {e}")
@@ -266,44 +617,154 @@ class MetadataExtractor:
         
         return url
     
+    def _resolve_tiktok_lite_url(self, url: str) -> str:
+        """Resolve a TikTok Lite URL by following redirects and, if needed, reading the page"""
+        logging.info(f"Resolving TikTok Lite URL: {url}")
+        try:
+            # Follow redirects to get the actual TikTok URL
+            response = self.session.get(url, allow_redirects=True, timeout=10)
+            final_url = response.url
+            logging.info(f"TikTok Lite URL resolved to: {final_url}")
+            
+            # If it's still a lite URL, try to extract the actual video URL from the page
+            # Every candidate below must be a tiktok.com /video/ URL; if the raw bytes contain
+            # neither marker there is nothing to find, so skip building the tree at all
+            content = response.content
+            if ("lite.tiktok.com" in final_url or not self._extract_tiktok_id(final_url)) \
+                    and b'tiktok.com' in content and b'video/' in content:
+                logging.info("Attempting to extract actual TikTok URL from TikTok Lite page")
+                
+                soup = BeautifulSoup(response.text, HTML_PARSER, parse_only=_LITE_PAGE_STRAINER)
+                
+                # Look for canonical URL
+                canonical_link = soup.find('link', rel='canonical')
+                if canonical_link and canonical_link.get('href'):
+                    canonical_url = canonical_link.get('href')
+                    if "tiktok.com" in canonical_url and "/video/" in canonical_url:
+                        logging.info(f"Found canonical URL: {canonical_url}")
+                        return canonical_url
+                
+                # Look for og:url meta tag
+                og_url = soup.find('meta', property='og:url')
+                if og_url and og_url.get('content'):
+                    og_url_content = og_url.get('content')
+                    if "tiktok.com" in og_url_content and "/video/" in og_url_content:
+                        logging.info(f"Found og:url: {og_url_content}")
+                        return og_url_content
+                
+                # Look for Twitter card URL
+                twitter_url = soup.find('meta', attrs={'name': 'twitter:url'})
+                if twitter_url and twitter_url.get('content'):
+                    twitter_url_content = twitter_url.get('content')
+                    if "tiktok.com" in twitter_url_content and "/video/" in twitter_url_content:
+                        logging.info(f"Found Twitter URL: {twitter_url_content}")
+                        return twitter_url_content
+                
+                # Look for video URLs in script tags
+                script_tags = soup.find_all('script')
+                for script in script_tags:
+                    if script.string:
+                        # Look for TikTok video URLs in JavaScript
+                        tiktok_urls = _TT_SCRIPT_URL_RE.findall(script.string)
+                        for tiktok_url in tiktok_urls:
+                            if "lite.tiktok.com" not in tiktok_url:
+                                logging.info(f"Found TikTok URL in script: {tiktok_url}")
+                                return tiktok_url.partition('?')[0]  # Remove query parameters
+            
+            return final_url
+            
+        except Exception as e:
+            logging.error(f"Error resolving TikTok Lite URL: {e}")
+            return url
+    
     def _extract_tiktok_id(self, url: str) -> str:
         """Extract TikTok video ID from URL"""
-        clean_url = url.split('?')[0]
-        match = re.search(r'\/video\/(\d+)', clean_url)
-        return match.group(1) if match else ""
+        return _tiktok_id(url)
     
     def _get_tiktok_embed_code(self, url: str) -> str:
         """Get TikTok embed code from oEmbed API"""
         try:
-            clean_url = url.split('?')[0]
+            clean_url = url.partition('?')[0]
             oembed_url = f"https://www.tiktok.com/oembed?url={clean_url}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json'
-            }
-            response = self.session.get(oembed_url, headers=headers, timeout=10)
+            response = self.session.get(oembed_url, headers=_TIKTOK_OEMBED_HEADERS, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             return data.get('html', '')
         except Exception as e:
             logging.warning(f"Failed to get TikTok embed code: {e}")
             return ''
     
+    def _find_tiktok_title_in_scripts(self, content: bytes):
+        """Find a usable title in TikTok's inline script data; returns None if there is none"""
+        # Decode as UTF-8 (TikTok serves UTF-8; invalid bytes are dropped)
+        html_text = content.decode('utf-8', errors='ignore')
+        for script in _SCRIPT_BODY_RE.finditer(html_text):
+            script_text = script.group(1)
+            if not script_text or len(script_text) <= 100:
+                continue
+            # Look for TikTok specific data patterns
+            if '"title"' not in script_text and '"desc"' not in script_text and '"video"' not in script_text:
+                continue
+            
+            # Approach 1: Look for title in JSON data (first occurrence of each field)
+            candidates = {}
+            for match in _TT_TITLE_FIELD_RE.finditer(script_text):
+                candidates.setdefault(match.group(1), match.group(2))
+                if len(candidates) == len(_TT_TITLE_FIELDS):
+                    break
+            for field in _TT_TITLE_FIELDS:
+                if field in candidates:
+                    title = self._usable_tiktok_script_title(candidates[field])
+                    if title:
+                        logging.debug("Found title in script data: %s", title)
+                        return title
+            
+            # Approach 2: Look for JSON objects with title
+            for json_match in _TT_JSON_OBJ_RE.finditer(script_text):
+                try:
+                    json_data = orjson.loads(json_match.group())
+                    if 'title' in json_data:
+                        title = self._usable_tiktok_script_title(json_data['title'])
+                        if title:
+                            return title
+                except (orjson.JSONDecodeError, TypeError, AttributeError):
+                    continue
+        
+        return None
+    
+    def _usable_tiktok_script_title(self, potential_title: str):
+        """Filter out generic or empty titles and clean the rest; returns None if unusable"""
+        potential_title = potential_title.strip()
+        if (potential_title and
+            len(potential_title) > 3 and
+            potential_title not in ('TikTok', '名無し', 'Untitled') and
+            not potential_title.startswith('TikTok ·')):
+            # Clean the title using our cleaning function
+            cleaned_title = self._clean_tiktok_title(potential_title)
+            if cleaned_title and cleaned_title != potential_title:
+                return cleaned_title
+            return potential_title
+        return None
+    
     def _get_tiktok_supabase_metadata(self, url: str, video_id: str) -> dict:
         """Get TikTok metadata using Supabase function"""
+        with _CACHE_LOCK:
+            cached = _SUPABASE_METADATA_CACHE.get(url)
+        if cached:
+            return dict(cached)
+        
         supabase_function_url = f"{self.supabase_url}/functions/v1/video-metadata"
-        headers = {"Authorization": f"Bearer {self.supabase_anon_key}"}
         body = {"url": url}
         
-        response = self.session.post(supabase_function_url, headers=headers, json=body, timeout=20)
+        response = self.session.post(supabase_function_url, headers=self._supabase_headers, json=body, timeout=20)
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         
         # Get embed code from oEmbed API
         embed_code = self._get_tiktok_embed_code(url)
         
-        return {
+        metadata = {
             "platform": "tiktok",
             "unique_video_id": video_id,
             "title": data.get("title"),
@@ -311,306 +772,27 @@ class MetadataExtractor:
             "authorName": data.get("authorName"),
             "embedCode": embed_code
         }
+        with _CACHE_LOCK:
+            _SUPABASE_METADATA_CACHE[url] = metadata
+        return dict(metadata)
     
     def _scrape_tiktok_metadata(self, url: str, video_id: str) -> dict:
         """Scrape TikTok metadata from web page"""
         # TikTok requires special handling - prioritize oEmbed API for accurate titles
-        clean_url = url.split('?')[0]  # Remove query parameters for oEmbed
-        
-        approaches = [
-            # Approach 1: TikTok oEmbed API (最優先 - 正確なタイトル取得)
-            {
-                'url': f"https://www.tiktok.com/oembed?url={clean_url}",
-                'headers': {
-                    'User-Agent': 'Expo/1017721 CFNetwork/3826.600.41 Darwin/24.6.0',  # 成功実績のあるUser-Agent
-                    'Accept': 'application/json,text/plain,*/*',
-                    'Accept-Language': 'en-US,en;q=0.9,ja;q=0.8',
-                }
-            },
-            # Approach 2: Alternative oEmbed with different User-Agent
-            {
-                'url': f"https://www.tiktok.com/oembed?url={clean_url}",
-                'headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'application/json,text/plain,*/*',
-                    'Referer': 'https://www.tiktok.com/',
-                }
-            },
-            # Approach 3: Mobile user agent (フォールバック)
-            {
-                'url': url,
-                'headers': {
-                    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Referer': 'https://www.tiktok.com/',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                }
-            },
-            # Approach 4: Facebook external crawler
-            {
-                'url': url,
-                'headers': {
-                    'User-Agent': 'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                }
-            }
-        ]
+        clean_url = url.partition('?')[0]  # Remove query parameters for oEmbed
         
-        # Try each approach until one works
-        for i, approach in enumerate(approaches):
-            try:
-                logging.debug(f"Trying TikTok approach {i+1}: {approach['url']}")
-                response = self.session.get(approach['url'], headers=approach['headers'], timeout=15)
-                response.raise_for_status()
-                
-                # Handle encoding issues
-                content = response.content
-                html_text = ""
-                
-                # Try different encoding methods
-                encodings_to_try = ['utf-8', 'iso-8859-1', 'cp1252', 'latin1']
-                for encoding in encodings_to_try:
-                    try:
-                        html_text = content.decode(encoding, errors='ignore')
-                        break
-                    except (UnicodeDecodeError, UnicodeError):
-                        continue
-                
-                if not html_text:
-                    html_text = content.decode('utf-8', errors='replace')
-                
-                # Special handling for oEmbed JSON response - prioritized for accuracy
-                if approach['url'].startswith('https://www.tiktok.com/oembed'):
-                    try:
-                        import json
-                        json_data = json.loads(html_text)
-                        logging.debug(f"TikTok oEmbed API response: {json_data}")
-                        
-                        if json_data.get('title'):
-                            title = json_data['title'].strip()
-                            thumbnail_url = json_data.get('thumbnail_url')
-                            author_name = json_data.get('author_name')
-                            embed_code = json_data.get('html', '')
-                            
-                            # Extract username from URL if not provided in oEmbed response
-                            if not author_name:
-                                username_match = re.search(r'tiktok\.com/@([^/]+)', url)
-                                if username_match:
-                                    author_name = f"@{username_match.group(1)}"
-                            
-                            logging.info(f"Successfully extracted TikTok metadata using oEmbed API")
-                            logging.debug(f"TikTok oEmbed extraction results: title='{title}', thumbnail='{thumbnail_url}', author='{author_name}'")
-                            
-                            return {
-                                "platform": "tiktok",
-                                "unique_video_id": video_id,
-                                "title": title,
-                                "thumbnailUrl": thumbnail_url,
-                                "authorName": author_name,
-                                "embedCode": embed_code
-                            }
-                        else:
-                            logging.debug(f"TikTok oEmbed response missing title field: {json_data}")
-                            continue
-                            
-                    except (json.JSONDecodeError, TypeError, AttributeError, KeyError) as e:
-                        logging.debug(f"Failed to parse oEmbed response: {e}, raw content: {html_text[:200]}...")
-                        continue
-                
-                soup = BeautifulSoup(html_text, 'html.parser')
-                
-                # Debug: Log HTML structure for analysis
-                title_tag = soup.find('title')
-                meta_count = len(soup.find_all('meta'))
-                script_count = len(soup.find_all('script'))
-                
-                logging.debug(f"TikTok Approach {i+1} - Title: {title_tag}, Meta: {meta_count}, Scripts: {script_count}")
-                
-                # Skip if no useful content found
-                if meta_count < 3 and script_count < 3 and not title_tag:
-                    logging.debug(f"TikTok Approach {i+1} returned minimal content, trying next...")
-                    continue
-                
-                # Log key meta tags for debugging
-                meta_tags = soup.find_all('meta')
-                for j, tag in enumerate(meta_tags[:5]):  # Log first 5 meta tags for basic debugging
-                    if tag.get('property') or tag.get('name'):
-                        logging.debug(f"TikTok Approach {i+1} Meta tag {j}: {tag}")
-                
-                # Extract metadata from meta tags
-                title = None
-                thumbnail_url = None
-                author_name = None
-                
-                # Method 1: Extract title from various sources with smart prioritization
-                og_title = soup.find('meta', property='og:title')
-                og_description = soup.find('meta', property='og:description')
-                twitter_description = soup.find('meta', property='twitter:description')
-                
-                # Extract content from meta tags
-                og_title_content = og_title.get('content').strip() if og_title and og_title.get('content') else None
-                og_desc_content = og_description.get('content').strip() if og_description and og_description.get('content') else None
-                twitter_desc_content = twitter_description.get('content').strip() if twitter_description and twitter_description.get('content') else None
-                
-                # Strategy: Prefer description over title if title is just account name
-                title_candidates = []
-                
-                # First, try to extract from og:description (most reliable for actual video title)
-                if og_desc_content:
-                    cleaned_from_desc = self._clean_tiktok_title(og_desc_content)
-                    if cleaned_from_desc:
-                        title_candidates.append(('og:description', cleaned_from_desc))
-                        logging.debug(f"TikTok Approach {i+1} - Found title in og:description: '{cleaned_from_desc}'")
-                
-                # Then try twitter:description
-                if twitter_desc_content and twitter_desc_content != og_desc_content:
-                    cleaned_from_twitter = self._clean_tiktok_title(twitter_desc_content)
-                    if cleaned_from_twitter:
-                        title_candidates.append(('twitter:description', cleaned_from_twitter))
-                        logging.debug(f"TikTok Approach {i+1} - Found title in twitter:description: '{cleaned_from_twitter}'")
-                
-                # Finally, try og:title if it's not just an account name
-                if og_title_content:
-                    if og_title_content.startswith('TikTok ·'):
-                        account_part = og_title_content.replace('TikTok ·', '').strip()
-                        # Only use og:title if it doesn't look like just an account name and we don't have better candidates
-                        if (not title_candidates and '名無し' not in account_part and 
-                            'Untitled' not in account_part and len(account_part) > 3):
-                            title_candidates.append(('og:title', account_part))
-                            logging.debug(f"TikTok Approach {i+1} - Using og:title as fallback: '{account_part}'")
-                    elif len(og_title_content) > 6 and og_title_content != 'TikTok':
-                        cleaned_from_title = self._clean_tiktok_title(og_title_content)
-                        if cleaned_from_title and not title_candidates:
-                            title_candidates.append(('og:title', cleaned_from_title))
-                
-                # Select the best title candidate
-                if title_candidates:
-                    selected_source, title = title_candidates[0]  # Prefer description-based titles
-                    logging.debug(f"TikTok Approach {i+1} - Selected title from {selected_source}: '{title}'")
-                
-                # Method 2: Extract thumbnail from various sources
-                thumbnail_sources = [
-                    soup.find('meta', property='og:image'),
-                    soup.find('meta', property='og:image:secure_url'),
-                    soup.find('meta', attrs={'name': 'twitter:image'}),
-                    soup.find('meta', attrs={'name': 'thumbnail'})
-                ]
-                
-                for source in thumbnail_sources:
-                    if source and hasattr(source, 'get') and source.get('content'):
-                        thumbnail_url = source.get('content').strip()
-                        break
-                
-                # Method 3: Extract author name from multiple sources
-                author_sources = [
-                    soup.find('meta', property='og:description'),
-                    soup.find('meta', attrs={'name': 'description'}),
-                    soup.find('meta', property='twitter:description')
-                ]
-                
-                for source in author_sources:
-                    if source and hasattr(source, 'get') and source.get('content'):
-                        description = source.get('content', '').strip()
-                        if description and '@' in description:
-                            author_match = re.search(r'@([^\s,\.\!\?]+)', description)
-                            if author_match:
-                                author_name = f"@{author_match.group(1)}"
-                                break
-                
-                # Method 4: Try to extract username from URL if not found
-                if not author_name and url:
-                    username_match = re.search(r'tiktok\.com/@([^/]+)', url)
-                    if username_match:
-                        author_name = f"@{username_match.group(1)}"
-                
-                # Method 5: Look for JSON-LD or script data
-                if not title or not thumbnail_url:
-                    scripts = soup.find_all('script')
-                    for script in scripts:
-                        if script.string and len(script.string) > 100:
-                            script_text = script.string
-                            # Look for TikTok specific data patterns
-                            if '"title"' in script_text or '"desc"' in script_text or '"video"' in script_text:
-                                try:
-                                    # Try multiple approaches to extract from script data
-                                    import json
-                                    
-                                    # Approach 1: Look for title in JSON data
-                                    title_patterns = [
-                                        r'"title":\s*"([^"]+)"',
-                                        r'"desc":\s*"([^"]+)"',
-                                        r'"description":\s*"([^"]+)"',
-                                    ]
-                                    
-                                    for pattern in title_patterns:
-                                        match = re.search(pattern, script_text)
-                                        if match and not title:
-                                            potential_title = match.group(1).strip()
-                                            # Filter out generic or empty titles
-                                            if (potential_title and 
-                                                len(potential_title) > 3 and 
-                                                potential_title not in ['TikTok', '名無し', 'Untitled', ''] and
-                                                not potential_title.startswith('TikTok ·')):
-                                                # Clean the title using our cleaning function
-                                                cleaned_title = self._clean_tiktok_title(potential_title)
-                                                if cleaned_title and cleaned_title != potential_title:
-                                                    title = cleaned_title
-                                                else:
-                                                    title = potential_title
-                                                logging.debug(f"Found title in script data: {title}")
-                                                break
-                                    
-                                    # Approach 2: Look for JSON objects with title
-                                    json_matches = re.finditer(r'\{[^{}]*"title"[^{}]*\}', script_text)
-                                    for json_match in json_matches:
-                                        try:
-                                            json_data = json.loads(json_match.group())
-                                            if not title and 'title' in json_data:
-                                                potential_title = json_data['title'].strip()
-                                                if (potential_title and 
-                                                    len(potential_title) > 3 and
-                                                    potential_title not in ['TikTok', '名無し', 'Untitled'] and
-                                                    not potential_title.startswith('TikTok ·')):
-                                                    # Clean the title using our cleaning function
-                                                    cleaned_title = self._clean_tiktok_title(potential_title)
-                                                    if cleaned_title and cleaned_title != potential_title:
-                                                        title = cleaned_title
-                                                    else:
-                                                        title = potential_title
-                                                    break
-                                        except (json.JSONDecodeError, TypeError, AttributeError):
-                                            continue
-                                            
-                                    if title:
-                                        break
-                                        
-                                except (json.JSONDecodeError, TypeError, AttributeError):
-                                    continue
-                
-                # Log extracted data for debugging
-                logging.debug(f"TikTok Approach {i+1} extraction results: title='{title}', thumbnail='{thumbnail_url}', author='{author_name}'")
-                
-                # If we found some meaningful metadata, return it
-                if title or thumbnail_url or (author_name and len(author_name) > 1):
-                    logging.debug(f"Successfully extracted TikTok metadata using approach {i+1}")
-                    # Try to get embed code
-                    embed_code = self._get_tiktok_embed_code(url)
-                    return {
-                        "platform": "tiktok",
-                        "unique_video_id": video_id,
-                        "title": title,
-                        "thumbnailUrl": thumbnail_url,
-                        "authorName": author_name,
-                        "embedCode": embed_code
-                    }
-                
-            except Exception as e:
-                logging.debug(f"TikTok Approach {i+1} failed: {e}")
-                continue
+        targets = {
+            'oembed': f"https://www.tiktok.com/oembed?url={clean_url}",
+            'page': url,
+        }
+        approaches = [{'url': targets[kind], 'headers': headers} for kind, headers in _TIKTOK_APPROACHES]
+        
+        result = self._race_approaches(
+            lambda i, approach, delay: self._try_tiktok_approach(i, approach, url, video_id, delay),
+            approaches
+        )
+        if result:
+            return result
         
         # If all approaches failed, return minimal data
         logging.warning("All TikTok extraction approaches failed")
@@ -618,7 +800,7 @@ class MetadataExtractor:
         # Extract username from URL as fallback
         author_name = None
         if url:
-            username_match = re.search(r'tiktok\.com/@([^/]+)', url)
+            username_match = _TT_USER_RE.search(url)
             if username_match:
                 author_name = f"@{username_match.group(1)}"
         
@@ -634,6 +816,205 @@ class MetadataExtractor:
             "embedCode": embed_code
         }
     
+    def _race_approaches(self, attempt, approaches: list):
+        """
+        Run scraping approaches concurrently and return the best successful result (or None)
+        
+        attempt(i, approach, delay) returns a metadata dict or None. Starts are staggered to
+        avoid a burst that looks like a bot. Earlier approaches are more accurate, so a later
+        success waits briefly for any higher-priority approach that is still running.
+        """
+        executor = ThreadPoolExecutor(max_workers=len(approaches))
+        futures = {
+            executor.submit(attempt, i, approach, _APPROACH_STAGGER_SECONDS * i): i
+            for i, approach in enumerate(approaches)
+        }
+        best = None
+        deadline = None
+        pending = set(futures)
+        try:
+            while pending:
+                timeout = max(0.0, deadline - time.monotonic()) if deadline else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result and (best is None or futures[future] < best[0]):
+                        best = (futures[future], result)
+                if best:
+                    if all(futures[f] > best[0] for f in pending):
+                        break
+                    if deadline is None:
+                        deadline = time.monotonic() + _APPROACH_PRIORITY_GRACE_SECONDS
+                    elif time.monotonic() >= deadline:
+                        break
+        finally:
+            # Don't wait for slower approaches once we have an answer
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return best[1] if best else None
+    
+    def _try_tiktok_approach(self, i: int, approach: dict, url: str, video_id: str, delay: float = 0.0):
+        """Run one TikTok scraping approach; returns the metadata dict, or None if it yielded nothing"""
+        if delay:
+            time.sleep(delay)
+        try:
+            logging.debug("Trying TikTok approach %s: %s", i+1, approach['url'])
+            response = self.session.get(approach['url'], headers=approach['headers'], timeout=15)
+            response.raise_for_status()
+            content = response.content
+        
+            # Special handling for oEmbed JSON response - prioritized for accuracy.
+            # JSON bodies are parsed straight from bytes and never reach the HTML path.
+            is_json = 'json' in response.headers.get('Content-Type', '')
+            if is_json or approach['url'].startswith('https://www.tiktok.com/oembed'):
+                try:
+                    json_data = orjson.loads(content)
+                    logging.debug("TikTok oEmbed API response: %s", json_data)
+                
+                    if json_data.get('title'):
+                        title = json_data['title'].strip()
+                        thumbnail_url = json_data.get('thumbnail_url')
+                        author_name = json_data.get('author_name')
+                        embed_code = json_data.get('html', '')
+                    
+                        # Extract username from URL if not provided in oEmbed response
+                        if not author_name:
+                            username_match = _TT_USER_RE.search(url)
+                            if username_match:
+                                author_name = f"@{username_match.group(1)}"
+                    
+                        logging.info(f"Successfully extracted TikTok metadata using oEmbed API")
+                        logging.debug("TikTok oEmbed extraction results: title='%s', thumbnail='%s', author='%s'", title, thumbnail_url, author_name)
+                    
+                        return self._attach_validators({
+                            "platform": "tiktok",
+                            "unique_video_id": video_id,
+                            "title": title,
+                            "thumbnailUrl": thumbnail_url,
+                            "authorName": author_name,
+                            "embedCode": embed_code
+                        }, response, approach['headers'])
+                    else:
+                        logging.debug("TikTok oEmbed response missing title field: %s", json_data)
+                        return None
+                    
+                except (orjson.JSONDecodeError, TypeError, AttributeError, KeyError) as e:
+                    logging.debug("Failed to parse oEmbed response: %s, raw content: %s...", e, content[:200])
+                    return None
+        
+            # Meta tags via a single regex pass; the DOM is only built if script data is needed
+            metas = _scan_meta(content)
+        
+            # Debug: Log HTML structure for analysis
+            title_tag = b'<title' in content
+            meta_count = len(_META_TAG_RE.findall(content))
+            script_count = content.count(b'<script')
+        
+            logging.debug("TikTok Approach %s - Title: %s, Meta: %s, Scripts: %s", i+1, title_tag, meta_count, script_count)
+        
+            # Skip if no useful content found
+            if meta_count < 3 and script_count < 3 and not title_tag:
+                logging.debug("TikTok Approach %s returned minimal content, trying next...", i+1)
+                return None
+        
+            # Log key meta tags for debugging
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                for j, (key, value) in enumerate(list(metas.items())[:5]):  # Log first 5 meta tags for basic debugging
+                    logging.debug("TikTok Approach %s Meta tag %s: %s=%s", i+1, j, key, value)
+        
+            # Extract metadata from meta tags
+            title = None
+            thumbnail_url = None
+            author_name = None
+        
+            # Method 1: Extract title from various sources with smart prioritization
+            og_title_content = metas.get('og:title', '').strip() or None
+            og_desc_content = metas.get('og:description', '').strip() or None
+            twitter_desc_content = metas.get('twitter:description', '').strip() or None
+        
+            # Strategy: Prefer description over title if title is just account name
+            title_candidates = []
+        
+            # First, try to extract from og:description (most reliable for actual video title)
+            if og_desc_content:
+                cleaned_from_desc = self._clean_tiktok_title(og_desc_content)
+                if cleaned_from_desc:
+                    title_candidates.append(('og:description', cleaned_from_desc))
+                    logging.debug("TikTok Approach %s - Found title in og:description: '%s'", i+1, cleaned_from_desc)
+        
+            # Then try twitter:description
+            if twitter_desc_content and twitter_desc_content != og_desc_content:
+                cleaned_from_twitter = self._clean_tiktok_title(twitter_desc_content)
+                if cleaned_from_twitter:
+                    title_candidates.append(('twitter:description', cleaned_from_twitter))
+                    logging.debug("TikTok Approach %s - Found title in twitter:description: '%s'", i+1, cleaned_from_twitter)
+        
+            # Finally, try og:title if it's not just an account name
+            if og_title_content:
+                if og_title_content.startswith('TikTok ·'):
+                    account_part = og_title_content.replace('TikTok ·', '').strip()
+                    # Only use og:title if it doesn't look like just an account name and we don't have better candidates
+                    if (not title_candidates and '名無し' not in account_part and 
+                        'Untitled' not in account_part and len(account_part) > 3):
+                        title_candidates.append(('og:title', account_part))
+                        logging.debug("TikTok Approach %s - Using og:title as fallback: '%s'", i+1, account_part)
+                elif len(og_title_content) > 6 and og_title_content != 'TikTok':
+                    cleaned_from_title = self._clean_tiktok_title(og_title_content)
+                    if cleaned_from_title and not title_candidates:
+                        title_candidates.append(('og:title', cleaned_from_title))
+        
+            # Select the best title candidate
+            if title_candidates:
+                selected_source, title = title_candidates[0]  # Prefer description-based titles
+                logging.debug("TikTok Approach %s - Selected title from %s: '%s'", i+1, selected_source, title)
+        
+            # Method 2: Extract thumbnail from various sources
+            for key in ('og:image', 'og:image:secure_url', 'twitter:image', 'thumbnail'):
+                if metas.get(key):
+                    thumbnail_url = metas[key].strip()
+                    break
+        
+            # Method 3: Extract author name from multiple sources
+            for key in ('og:description', 'description', 'twitter:description'):
+                if metas.get(key):
+                    description = metas[key].strip()
+                    if description and '@' in description:
+                        author_match = _TT_DESC_AUTHOR_RE.search(description)
+                        if author_match:
+                            author_name = f"@{author_match.group(1)}"
+                            break
+        
+            # Method 4: Try to extract username from URL if not found
+            if not author_name and url:
+                username_match = _TT_USER_RE.search(url)
+                if username_match:
+                    author_name = f"@{username_match.group(1)}"
+        
+            # Method 5: Look for JSON-LD or script data (only title is read from scripts)
+            if not title:
+                title = self._find_tiktok_title_in_scripts(content)
+        
+            # Log extracted data for debugging
+            logging.debug("TikTok Approach %s extraction results: title='%s', thumbnail='%s', author='%s'", i+1, title, thumbnail_url, author_name)
+        
+            # If we found some meaningful metadata, return it
+            if title or thumbnail_url or (author_name and len(author_name) > 1):
+                logging.debug("Successfully extracted TikTok metadata using approach %s", i+1)
+                # Try to get embed code
+                embed_code = self._get_tiktok_embed_code(url)
+                return self._attach_validators({
+                    "platform": "tiktok",
+                    "unique_video_id": video_id,
+                    "title": title,
+                    "thumbnailUrl": thumbnail_url,
+                    "authorName": author_name,
+                    "embedCode": embed_code
+                }, response, approach['headers'])
+        
+        except Exception as e:
+            logging.debug("TikTok Approach %s failed: %s", i+1, e)
+        return None
+    
     def _extract_instagram_metadata(self, url: str) -> dict:
         """Extract metadata from Instagram URLs"""
         logging.info(f"Extracting Instagram metadata from: {url}")
@@ -648,9 +1029,7 @@ class MetadataExtractor:
     
     def _extract_instagram_id(self, url: str) -> str:
         """Extract Instagram post ID (shortcode) from URL"""
-        clean_url = url.split('?')[0]
-        match = re.search(r'\/(p|reel)\/([A-Za-z0-9-_]+)', clean_url)
-        return match.group(2) if match else ""
+        return _instagram_id(url)
     
     def _get_instagram_embed_code(self, url: str, post_id: str) -> str:
         """Generate Instagram embed code (iframe format)"""
@@ -674,182 +1053,26 @@ class MetadataExtractor:
     def _scrape_instagram_metadata(self, url: str, post_id: str) -> dict:
         """Scrape Instagram metadata from web page"""
         # Try different Instagram URL formats and approaches
-        approaches = [
-            # Approach 1: Try embed URL (often has more accessible metadata)
-            {
-                'url': f"https://www.instagram.com/p/{post_id}/embed/",
-                'headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Referer': 'https://www.instagram.com/',
-                }
-            },
-            # Approach 2: Original URL with different headers
-            {
-                'url': url.replace('?hl=ja', ''),  # Remove language parameter
-                'headers': {
-                    'User-Agent': 'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                }
-            },
-            # Approach 3: Mobile user agent
-            {
-                'url': url,
-                'headers': {
-                    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Cache-Control': 'max-age=0',
-                }
-            }
-        ]
+        targets = {
+            'embed': f"https://www.instagram.com/p/{post_id}/embed/",
+            'no_hl': url.replace('?hl=ja', ''),  # Remove language parameter
+            'page': url,
+        }
+        approaches = [{'url': targets[kind], 'headers': headers} for kind, headers in _INSTAGRAM_APPROACHES]
         
-        # Try each approach until one works
-        for i, approach in enumerate(approaches):
-            try:
-                logging.debug(f"Trying Instagram approach {i+1}: {approach['url']}")
-                response = self.session.get(approach['url'], headers=approach['headers'], timeout=20)
-                response.raise_for_status()
-                
-                # Handle encoding issues by trying different encodings
-                content = response.content
-                html_text = ""
-                
-                # Try different encoding methods
-                encodings_to_try = ['utf-8', 'iso-8859-1', 'cp1252', 'latin1']
-                for encoding in encodings_to_try:
-                    try:
-                        html_text = content.decode(encoding, errors='ignore')
-                        break
-                    except (UnicodeDecodeError, UnicodeError):
-                        continue
-                
-                if not html_text:
-                    html_text = content.decode('utf-8', errors='replace')
-                
-                soup = BeautifulSoup(html_text, 'html.parser')
-                
-                # Debug: Log HTML structure for analysis
-                title_tag = soup.find('title')
-                meta_count = len(soup.find_all('meta'))
-                script_count = len(soup.find_all('script'))
-                
-                logging.debug(f"Approach {i+1} - Title: {title_tag}, Meta: {meta_count}, Scripts: {script_count}")
-                
-                # Skip if no useful content found
-                if meta_count == 0 and script_count == 0 and not title_tag:
-                    logging.debug(f"Approach {i+1} returned empty content, trying next...")
-                    continue
-                
-                # Log some meta tags for debugging
-                meta_tags = soup.find_all('meta')
-                for j, tag in enumerate(meta_tags[:5]):  # Log first 5 meta tags
-                    if tag.get('property') or tag.get('name'):
-                        logging.debug(f"Approach {i+1} Meta tag {j}: {tag}")
-                
-                # Extract metadata from meta tags and JSON-LD
-                title = None
-                thumbnail_url = None
-                author_name = None
-                
-                # Method 1: Try to find JSON-LD structured data
-                json_scripts = soup.find_all('script', type='application/ld+json')
-                for script in json_scripts:
-                    try:
-                        if script.string:
-                            json_data = json.loads(script.string)
-                            if isinstance(json_data, dict):
-                                # Extract from structured data
-                                if 'name' in json_data:
-                                    title = json_data.get('name')
-                                if 'image' in json_data:
-                                    image_data = json_data.get('image')
-                                    if isinstance(image_data, list) and image_data:
-                                        thumbnail_url = image_data[0]
-                                    elif isinstance(image_data, str):
-                                        thumbnail_url = image_data
-                                if 'author' in json_data:
-                                    author_data = json_data.get('author')
-                                    if isinstance(author_data, dict) and 'name' in author_data:
-                                        author_name = author_data['name']
-                    except (json.JSONDecodeError, TypeError, AttributeError):
-                        continue
-                
-                # Method 2: Extract from meta tags
-                if not title:
-                    title_tag = soup.find('meta', property='og:title') or soup.find('meta', attrs={'name': 'title'})
-                    if title_tag:
-                        title_content = title_tag.get('content')
-                        if title_content:
-                            title = title_content.strip()
-                            # Instagram titles often contain author info
-                            if ' • Instagram' in title:
-                                parts = title.split(' • Instagram')
-                                title = parts[0].strip()
-                            if ' on Instagram:' in title:
-                                author_name = title.split(' on Instagram:')[0].strip()
-                                if ': "' in title:
-                                    title = title.split(': "')[1].rstrip('"').strip()
-                
-                # Method 3: Try description meta tag
-                if not title:
-                    description_tag = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', property='og:description')
-                    if description_tag:
-                        description = description_tag.get('content')
-                        if description and description.strip():
-                            title = description.strip()
-                
-                # Method 4: Extract thumbnail from various meta tags
-                if not thumbnail_url:
-                    image_tags = [
-                        soup.find('meta', property='og:image'),
-                        soup.find('meta', attrs={'name': 'twitter:image'}),
-                        soup.find('meta', property='og:image:secure_url'),
-                        soup.find('meta', attrs={'name': 'thumbnail'})
-                    ]
-                    for tag in image_tags:
-                        if tag and tag.get('content'):
-                            thumbnail_url = tag.get('content').strip()
-                            break
-                
-                # Method 5: Extract author name from URL if not found elsewhere
-                if not author_name:
-                    username_match = re.search(r'instagram\.com/([^/]+)/', url)
-                    if username_match:
-                        author_name = username_match.group(1)
-                
-                # Log extracted data for debugging
-                logging.debug(f"Approach {i+1} extraction results: title='{title}', thumbnail='{thumbnail_url}', author='{author_name}'")
-                
-                # If we found some metadata, return it
-                if title or thumbnail_url or (author_name and author_name != username_match.group(1) if username_match else True):
-                    logging.debug(f"Successfully extracted metadata using approach {i+1}")
-                    # Get embed code
-                    embed_code = self._get_instagram_embed_code(url, post_id)
-                    
-                    return {
-                        "platform": "instagram",
-                        "unique_video_id": post_id,
-                        "title": title,
-                        "thumbnailUrl": thumbnail_url,
-                        "authorName": author_name,
-                        "embedCode": embed_code
-                    }
-                
-            except Exception as e:
-                logging.debug(f"Approach {i+1} failed: {e}")
-                continue
+        result = self._race_approaches(
+            lambda i, approach, delay: self._try_instagram_approach(i, approach, url, post_id, delay),
+            approaches
+        )
+        if result:
+            result["embedCode"] = self._get_instagram_embed_code(url, post_id)
+            return result
         
         # If all approaches failed, return minimal data
         logging.warning("All Instagram extraction approaches failed")
         author_name = None
         if url:
-            username_match = re.search(r'instagram\.com/([^/]+)/', url)
+            username_match = _IG_USER_RE.search(url)
             if username_match:
                 author_name = username_match.group(1)
         
@@ -865,6 +1088,120 @@ class MetadataExtractor:
             "embedCode": embed_code
         }
     
+    def _try_instagram_approach(self, i: int, approach: dict, url: str, post_id: str, delay: float = 0.0):
+        """Run one Instagram scraping approach; returns the metadata dict, or None if it yielded nothing"""
+        if delay:
+            time.sleep(delay)
+        try:
+            logging.debug(f"Trying Instagram approach {i+1}: {approach['url']}")
+            response = self.session.get(approach['url'], headers=approach['headers'], timeout=20)
+            response.raise_for_status()
+            
+            content = response.content
+            
+            # Meta tags via a single regex pass, same as the YouTube/TikTok scrapers
+            metas = _scan_meta(content)
+            
+            # Debug: Log HTML structure for analysis
+            title_tag = b'<title' in content
+            meta_count = len(_META_TAG_RE.findall(content))
+            script_count = content.count(b'<script')
+            
+            logging.debug(f"Approach {i+1} - Title: {title_tag}, Meta: {meta_count}, Scripts: {script_count}")
+            
+            # Skip if no useful content found
+            if meta_count == 0 and script_count == 0 and not title_tag:
+                logging.debug(f"Approach {i+1} returned empty content, trying next...")
+                return None
+            
+            # Log some meta tags for debugging
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                for j, (key, value) in enumerate(list(metas.items())[:5]):  # Log first 5 meta tags
+                    logging.debug(f"Approach {i+1} Meta tag {j}: {key}={value}")
+            
+            # Extract metadata from meta tags and JSON-LD
+            title = None
+            thumbnail_url = None
+            author_name = None
+            
+            # Method 1: Try to find JSON-LD structured data
+            json_blocks = _LD_JSON_RE.findall(content) if b'application/ld+json' in content else []
+            for block in json_blocks:
+                # Only blocks carrying a field we read are worth parsing
+                if b'"name"' not in block and b'"image"' not in block and b'"author"' not in block:
+                    continue
+                try:
+                    if block.strip():
+                        json_data = orjson.loads(block)
+                        if isinstance(json_data, dict):
+                            # Extract from structured data
+                            if 'name' in json_data:
+                                title = json_data.get('name')
+                            if 'image' in json_data:
+                                image_data = json_data.get('image')
+                                if isinstance(image_data, list) and image_data:
+                                    thumbnail_url = image_data[0]
+                                elif isinstance(image_data, str):
+                                    thumbnail_url = image_data
+                            if 'author' in json_data:
+                                author_data = json_data.get('author')
+                                if isinstance(author_data, dict) and 'name' in author_data:
+                                    author_name = author_data['name']
+                except (orjson.JSONDecodeError, TypeError, AttributeError):
+                    continue
+            
+            # Method 2: Extract from meta tags
+            if not title:
+                title_content = metas.get('og:title') or metas.get('title')
+                if title_content:
+                    title = title_content.strip().partition(' • Instagram')[0].strip()
+                    # Instagram titles often contain author info: 'author on Instagram: "caption"'
+                    match = _IG_TITLE_RE.match(title)
+                    if match:
+                        author_name = match.group('author').strip()
+                        if match.group('caption') is not None:
+                            title = match.group('caption').rstrip('"').strip()
+            
+            # Method 3: Try description meta tag
+            if not title:
+                description = metas.get('description') or metas.get('og:description')
+                if description and description.strip():
+                    title = description.strip()
+            
+            # Method 4: Extract thumbnail from various meta tags
+            if not thumbnail_url:
+                for key in ('og:image', 'twitter:image', 'og:image:secure_url', 'thumbnail'):
+                    if metas.get(key):
+                        thumbnail_url = metas[key].strip()
+                        break
+            
+            # Method 5: Extract author name from URL if not found elsewhere
+            username_match = _IG_USER_RE.search(url)
+            if not author_name and username_match:
+                author_name = username_match.group(1)
+            
+            # Log extracted data for debugging
+            logging.debug(f"Approach {i+1} extraction results: title='{title}', thumbnail='{thumbnail_url}', author='{author_name}'")
+            
+            # If we found some metadata, return it
+            if title or thumbnail_url or (author_name and author_name != username_match.group(1) if username_match else True):
+                logging.debug(f"Successfully extracted metadata using approach {i+1}")
+                # The embed code is fetched once for the winning approach
+                return self._attach_validators({
+                    "platform": "instagram",
+                    "unique_video_id": post_id,
+                    "title": title,
+                    "thumbnailUrl": thumbnail_url,
+                    "authorName": author_name,
+                    "embedCode": None
+                }, response, approach['headers'])
+            
+            return None
+            
+        except Exception as e:
+            logging.debug(f"Approach {i+1} failed: {e}")
+            return None
+    
     def _clean_tiktok_title(self, content: str) -> str:
         """Clean TikTok title by removing stats and extracting actual title"""
         if not content:
@@ -874,17 +1211,10 @@ class MetadataExtractor:
         # Pattern: "14.5K likes, 165 comments. "とびっきりの水着で来たのにw""
         
         # Look for quoted text (actual title)
-        import re
         
         # Method 1: Extract text in quotes
-        quote_patterns = [
-            r'"([^"]+)"',  # Double quotes
-            r'"([^"]+)"',  # Japanese quotes
-            r"'([^']+)'",  # Single quotes
-        ]
-        
-        for pattern in quote_patterns:
-            match = re.search(pattern, content)
+        for pattern in _QUOTE_RES:
+            match = pattern.search(content)
             if match:
                 title = match.group(1).strip()
                 if title and len(title) > 2:
@@ -892,8 +1222,7 @@ class MetadataExtractor:
         
         # Method 2: Remove stats pattern and use remaining text
         # Remove patterns like "14.5K likes, 165 comments."
-        stats_pattern = r'^\d+\.?\d*[KMB]?\s+(likes|comments|views|shares)[,\s]*(\d+\.?\d*[KMB]?\s+(likes|comments|views|shares)[,\s]*)*\.?\s*'
-        cleaned = re.sub(stats_pattern, '', content, flags=re.IGNORECASE)
+        cleaned = _TT_STATS_RE.sub('', content)
         
         # Remove leading/trailing punctuation and whitespace
         cleaned = cleaned.strip(' ."\'')
@@ -904,9 +1233,9 @@ class MetadataExtractor:
         
         # Method 3: If no quotes found, try to extract from end of string
         # Sometimes title is at the end after stats
-        parts = content.split('.')
-        if len(parts) > 1:
-            last_part = parts[-1].strip(' "\'')
+        _, dot, last_part = content.rpartition('.')
+        if dot:
+            last_part = last_part.strip(' "\'')
             if last_part and len(last_part) > 2:
                 return last_part
         
@@ -915,7 +1244,10 @@ class MetadataExtractor:
     
     def _is_youtube_playlist(self, url: str) -> bool:
         """Check if the URL is a YouTube playlist"""
-        return "list=" in url.lower() and ("youtube.com" in url.lower() or "youtu.be" in url.lower())
+        url_lower = url.lower()
+        if "list=" not in url_lower:
+            return False
+        return "youtube.com" in url_lower or "youtu.be" in url_lower
     
     def _extract_youtube_playlist_metadata(self, url: str) -> dict:
         """Extract metadata from YouTube playlist URLs"""
@@ -935,13 +1267,10 @@ class MetadataExtractor:
     
     def _extract_playlist_id(self, url: str) -> str:
         """Extract YouTube playlist ID from URL"""
-        if "list=" in url:
-            # Extract everything after 'list='
-            parts = url.split('list=')
-            if len(parts) > 1:
-                # Get the playlist ID (everything up to the next & or end of string)
-                playlist_id = parts[1].split('&')[0]
-                return playlist_id
+        # Everything after the first 'list=' up to the next & (or end of string)
+        _, found, rest = url.partition('list=')
+        if found:
+            return rest.partition('&')[0]
         return ""
     
     def _get_youtube_playlist_videos(self, playlist_id: str) -> dict:
@@ -952,6 +1281,13 @@ class MetadataExtractor:
         next_page_token = None
         max_videos = 500  # Increase limit to 500
         
+        # Page tokens make the page requests inherently serial, but each page's details
+        # (videos.list, up to 50 IDs) are fetched in the background while the next page loads
+        details_executor = ThreadPoolExecutor(max_workers=4)
+        details_futures = []
+        entries = []  # (video_id, snippet) in playlist order
+        seen_ids = set()  # playlists may repeat a video; each ID is requested once
+        
         # Loop to get up to max_videos
         while len(all_items) < max_videos:
             params = {
@@ -968,13 +1304,23 @@ class MetadataExtractor:
                 response = self.session.get(api_url, params=params, timeout=15)
                 response.raise_for_status()
                 
-                data = response.json()
+                data = orjson.loads(response.content)
                 
-                items = data.get('items', [])
+                items = data.get('items', [])[:max_videos - len(all_items)]
                 if not items:
                     break
                     
                 all_items.extend(items)
+                new_ids = []
+                for item in items:
+                    snippet = item.get('snippet', {})
+                    video_id = snippet.get('resourceId', {}).get('videoId')
+                    if video_id:
+                        entries.append((video_id, snippet))
+                        if video_id not in seen_ids:
+                            seen_ids.add(video_id)
+                            new_ids.append(video_id)
+                details_futures.append(details_executor.submit(self._get_videos_details_batch, new_ids))
                 
                 next_page_token = data.get('nextPageToken')
                 if not next_page_token:
@@ -983,47 +1329,31 @@ class MetadataExtractor:
             except Exception as e:
                 logging.error(f"Error fetching playlist page: {e}")
                 if not all_items:
+                    details_executor.shutdown(wait=False, cancel_futures=True)
                     raise  # Re-raise if we couldn't get any videos
                 break
         
         if not all_items:
+            details_executor.shutdown(wait=False, cancel_futures=True)
             raise ValueError("Playlist not found or is empty")
         
-        # Limit to exactly max_videos if we somehow got more
-        all_items = all_items[:max_videos]
-        
-        # Extract video IDs for batch API call
-        video_ids = []
-        for item in all_items:
-            snippet = item.get('snippet', {})
-            video_id = snippet.get('resourceId', {}).get('videoId')
-            if video_id:
-                video_ids.append(video_id)
-        
         # Get detailed video information including author names
-        # _get_videos_details_batch now handles chunking automatically
-        video_details = self._get_videos_details_batch(video_ids)
+        # (_get_videos_details_batch logs and skips failed chunks, so results never raise)
+        video_details = {}
+        for future in details_futures:
+            video_details.update(future.result())
+        details_executor.shutdown()
         
         # Extract video list with author information
-        video_list = []
-        for item in all_items:
-            snippet = item.get('snippet', {})
-            video_id = snippet.get('resourceId', {}).get('videoId')
-            if video_id:
-                # Get author name from detailed video info
-                video_detail = video_details.get(video_id, {})
-                
-                # If we couldn't get details (e.g. private video), fallback to snippet info
-                author_name = video_detail.get('authorName') or snippet.get('videoOwnerChannelTitle') or snippet.get('channelTitle')
-                
-                video_info = {
-                    'title': snippet.get('title'),
-                    'videoUrl': f"https://www.youtube.com/watch?v={video_id}",
-                    'thumbnailUrl': snippet.get('thumbnails', {}).get('high', {}).get('url'),
-                    'unique_video_id': video_id,
-                    'authorName': author_name
-                }
-                video_list.append(video_info)
+        # (if we couldn't get details, e.g. private video, fall back to snippet info)
+        video_list = [{
+            'title': snippet.get('title'),
+            'videoUrl': f"https://www.youtube.com/watch?v={video_id}",
+            'thumbnailUrl': snippet.get('thumbnails', {}).get('high', {}).get('url'),
+            'unique_video_id': video_id,
+            'authorName': (video_details.get(video_id, {}).get('authorName')
+                           or snippet.get('videoOwnerChannelTitle') or snippet.get('channelTitle'))
+        } for video_id, snippet in entries]
         
         # Get playlist info from the first item
         first_item = all_items[0]['snippet'] if all_items else {}
@@ -1044,49 +1374,68 @@ class MetadataExtractor:
         if not video_ids:
             return {}
         
-        api_url = "https://www.googleapis.com/youtube/v3/videos"
         video_details = {}
         
-        # Process in chunks of 50
-        chunk_size = 50
-        for i in range(0, len(video_ids), chunk_size):
-            chunk = video_ids[i:i + chunk_size]
-            
-            try:
-                params = {
-                    'part': 'snippet',
-                    'id': ','.join(chunk),
-                    'key': self.youtube_api_key
-                }
-                
-                response = self.session.get(api_url, params=params, timeout=15)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Merge results into the main dictionary
-                for item in data.get('items', []):
-                    video_id = item.get('id')
-                    snippet = item.get('snippet', {})
-                    if video_id:
-                        video_details[video_id] = {
-                            'authorName': snippet.get('channelTitle'),
-                            'title': snippet.get('title'),
-                            'thumbnailUrl': snippet.get('thumbnails', {}).get('high', {}).get('url')
-                        }
-            except Exception as e:
-                logging.error(f"Error fetching batch video details: {e}")
-                # Continue to next chunk even if one fails
-                continue
+        # Serve already-known videos from cache; only new IDs are requested
+        with _CACHE_LOCK:
+            for video_id in video_ids:
+                cached = _VIDEO_DETAILS_CACHE.get(video_id)
+                if cached is not None:
+                    video_details[video_id] = cached
+        missing_ids = [video_id for video_id in video_ids if video_id not in video_details]
+        
+        # Process in chunks of 50 (the API maximum), fetched concurrently
+        chunks = [missing_ids[i:i + 50] for i in range(0, len(missing_ids), 50)]
+        if len(chunks) == 1:
+            results = [self._fetch_video_details_chunk(chunks[0])]
+        elif chunks:
+            with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as executor:
+                results = list(executor.map(self._fetch_video_details_chunk, chunks))
+        else:
+            results = []
         
+        for fetched in results:
+            video_details.update(fetched)
         return video_details
     
+    def _fetch_video_details_chunk(self, chunk: list) -> dict:
+        """Fetch details for up to 50 videos with one videos.list call (errors yield {})"""
+        api_url = "https://www.googleapis.com/youtube/v3/videos"
+        try:
+            params = {
+                'part': 'snippet',
+                'id': ','.join(chunk),
+                'key': self.youtube_api_key
+            }
+            
+            response = self.session.get(api_url, params=params, timeout=15)
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            
+            fetched = {}
+            for item in data.get('items', []):
+                video_id = item.get('id')
+                snippet = item.get('snippet', {})
+                if video_id:
+                    fetched[video_id] = {
+                        'authorName': snippet.get('channelTitle'),
+                        'title': snippet.get('title'),
+                        'thumbnailUrl': snippet.get('thumbnails', {}).get('high', {}).get('url')
+                    }
+            with _CACHE_LOCK:
+                _VIDEO_DETAILS_CACHE.update(fetched)
+            return fetched
+        except Exception as e:
+            # A failed chunk doesn't affect the others
+            logging.error(f"Error fetching batch video details: {e}")
+            return {}
+    
     def extract_playlist_videos(self, playlist_url: str) -> list:
         """Extract video list from YouTube playlist using web scraping as fallback"""
         try:
             # Extract playlist ID from URL
-            import re
-            playlist_id_match = re.search(r'list=([^&]+)', playlist_url)
+            playlist_id_match = _PLAYLIST_ID_RE.search(playlist_url)
             if not playlist_id_match:
                 raise ValueError("Invalid playlist URL - could not extract playlist ID")
             
@@ -1106,7 +1455,7 @@ class MetadataExtractor:
                 response = self.session.get(api_url, params=params, timeout=15)
                 response.raise_for_status()
                 
-                data = response.json()
+                data = orjson.loads(response.content)
                 api_videos = []
                 next_page_token = data.get('nextPageToken')
                 
@@ -1130,7 +1479,7 @@ class MetadataExtractor:
                     response = self.session.get(api_url, params=params, timeout=15)
                     response.raise_for_status()
                     
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     next_page_token = data.get('nextPageToken')
                     
                     for item in data.get('items', []):
@@ -1158,26 +1507,27 @@ class MetadataExtractor:
             # Fallback: Web scraping approach
             logging.info("Using web scraping fallback for playlist extraction")
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = self.session.get(playlist_url, headers=headers, timeout=15)
+            # The session's default User-Agent is the one this request used to set explicitly
+            response = self.session.get(playlist_url, timeout=15)
             response.raise_for_status()
             
+            # Both scraping methods need watch links or videoId fields; skip the full parse without them
+            content = response.content
+            if b'/watch?v=' not in content and b'"videoId":"' not in content:
+                raise ValueError("No videos found in playlist")
+            
             # Parse HTML to extract video information
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.text, HTML_PARSER)
             
             videos = []
             
             # Look for video links in the playlist
-            video_links = soup.find_all('a', href=re.compile(r'/watch\?v='))
+            video_links = soup.find_all('a', href=_WATCH_HREF_RE)
             
             seen_video_ids = set()
             for link in video_links:
                 href = link.get('href', '')
-                video_id_match = re.search(r'v=([^&]+)', href)
+                video_id_match = _HREF_VIDEO_ID_RE.search(href)
                 
                 if video_id_match:
                     video_id = video_id_match.group(1)
@@ -1203,7 +1553,7 @@ class MetadataExtractor:
                 script_tags = soup.find_all('script')
                 for script in script_tags:
                     if script.string and 'videoId' in script.string:
-                        video_ids = re.findall(r'"videoId":"([^"]+)"', script.string)
+                        video_ids = _SCRIPT_VIDEO_ID_RE.findall(script.string)
                         for video_id in video_ids[:500]:  # Limit to 500
                             if video_id not in seen_video_ids:
                                 seen_video_ids.add(video_id)
@@ -1,13 +1,49 @@
+import io
 import os
 import logging
-import psycopg2
+import threading
 import requests
-from typing import Dict, List, Set
-from datetime import datetime, timedelta
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from psycopg2.extras import execute_values
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Set
+
+from db_pool import pooled_connection
+
+# プラットフォーム別のURLテンプレート（video_idを埋め込む）
+_URL_FMT = {
+    'youtube': 'https://www.youtube.com/watch?v={}',
+    'tiktok': 'https://www.tiktok.com/@user/video/{}',
+    'instagram': 'https://www.instagram.com/p/{}/'
+}
+
+# videosテーブルの最新行のプロセス内キャッシュ（unique_video_id -> メタデータdict）
+# ランキング再計算のたびに同じ動画を引き直さないためのもの。古い行はすぐ再取得されるので載せない
+_ROW_CACHE = TTLCache(maxsize=50_000, ttl=3600)
+_ROW_CACHE_LOCK = threading.Lock()
+
+# これを超える件数の更新はCOPYで一時テーブルに流し込んでからUPDATE ... FROMする
+COPY_THRESHOLD = 1000
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_field(value) -> str:
+    """COPYのテキスト形式用に1フィールドをエスケープ（NoneはNULL）"""
+    if value is None:
+        return '\\N'
+    return str(value).translate(_COPY_ESCAPES)
+
 
 class MetadataUpdater:
     """メタデータ更新を管理するクラス"""
     
+    BATCH_SIZE = 50
+    # バッチAPIは同じgunicorn（8スレッド）で処理されるため、並列数はその半分に抑える
+    BATCH_WORKERS = 4
+    FETCH_ITERSIZE = 2000
+    
     def __init__(self):
         self.database_url = os.getenv("DATABASE_URL")
         self.batch_api_url = "http://localhost:5000/api/batch-metadata"
@@ -15,44 +51,91 @@ class MetadataUpdater:
         
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable not set")
+        
+        # バッチAPI呼び出し用のセッション（並列ワーカー間でkeep-alive接続を共有）
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.BATCH_WORKERS, pool_maxsize=self.BATCH_WORKERS * 2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
     def get_db_connection(self):
-        """データベース接続を取得"""
-        return psycopg2.connect(self.database_url)
+        """データベース接続をプールから借りる（withブロックを抜けると返却される）"""
+        return pooled_connection(self.database_url)
     
     def get_metadata_from_videos_table(self, video_ids: List[str]) -> Dict[str, dict]:
         """videosテーブルから既存メタデータを取得（url, embed_code含む）"""
+        return self._select_latest_metadata(video_ids)[0]
+    
+    def _select_latest_metadata(self, video_ids: List[str]):
+        """
+        videosテーブルから各IDの最新メタデータ、古いと判定されたIDの集合、
+        videosに存在しないIDの集合を返す
+        
+        鮮度・存在の判定はSQL側で行う。
+        タイムゾーン問題を回避するため、取得日時（created_at）があれば常に新しいものとして扱う
+        （max_age_daysで切ると、created_atが更新されない行を毎回再取得してしまう）。
+        """
         if not video_ids:
-            return {}
+            return {}, set(), set()
+        
+        # キャッシュにある行はそのまま使い、DBには残りだけを問い合わせる
+        metadata_dict = {}
+        with _ROW_CACHE_LOCK:
+            for video_id in video_ids:
+                cached = _ROW_CACHE.get(video_id)
+                if cached is not None:
+                    metadata_dict[video_id] = dict(cached)
+        missing_ids = [video_id for video_id in video_ids if video_id not in metadata_dict]
+        if not missing_ids:
+            logging.info(f"Retrieved metadata for {len(metadata_dict)} videos from cache")
+            return metadata_dict, set(), set()
         
         try:
             with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    # 各unique_video_idで最新のレコード（created_atが最大）を取得
+                # サーバーサイドカーソルでitersize件ずつ受け取り、結果全体をクライアントに溜めない
+                # （名前付きカーソルはトランザクション内で動く。返却時にロールバックされる）
+                with conn.cursor(name="meta_fetch") as cur:
+                    cur.itersize = self.FETCH_ITERSIZE
+                    # 要求IDごとに最新のレコード（created_atが最大）を1行ずつ引く
                     # url, embed_codeも含めて取得
-                    placeholders = ','.join(['%s'] * len(video_ids))
-                    query = f"""
-                    SELECT DISTINCT ON (unique_video_id)
-                        unique_video_id,
-                        source as platform,
-                        video_title as title,
-                        thumbnail_url,
-                        video_author_name as author_name,
-                        created_at as metadata_fetched_at,
-                        url,
-                        embed_code
-                    FROM videos 
-                    WHERE unique_video_id IN ({placeholders})
-                    ORDER BY unique_video_id, created_at DESC
+                    # IDはリスト1つを配列として渡す（件数によらずSQL文が同一になる）
+                    # LEFT JOINなのでvideosに行がないIDもNULL行として返り、1回の問い合わせで
+                    # 最新・古い・存在しないの3通りを判別できる
+                    query = """
+                    WITH req(uid) AS (SELECT unnest(%s::text[]))
+                    SELECT
+                        req.uid,
+                        v.source as platform,
+                        v.video_title as title,
+                        v.thumbnail_url,
+                        v.video_author_name as author_name,
+                        v.created_at as metadata_fetched_at,
+                        v.url,
+                        v.embed_code,
+                        v.created_at IS NULL AS is_stale,
+                        v.unique_video_id IS NULL AS is_missing
+                    FROM req
+                    LEFT JOIN LATERAL (
+                        SELECT * FROM videos
+                        WHERE videos.unique_video_id = req.uid
+                        ORDER BY created_at DESC
+                        LIMIT 1
+                    ) v ON TRUE
                     """
                     
-                    cur.execute(query, video_ids)
-                    results = cur.fetchall()
+                    cur.execute(query, (missing_ids,))
                     
-                    metadata_dict = {}
-                    for row in results:
-                        video_id, platform, title, thumbnail_url, author_name, fetched_at, url, embed_code = row
-                        metadata_dict[video_id] = {
+                    fetched = {}
+                    stale_ids = set()
+                    absent_ids = set()
+                    for row in cur:
+                        video_id, platform, title, thumbnail_url, author_name, fetched_at, url, embed_code, is_stale, is_missing = row
+                        if is_missing:
+                            absent_ids.add(video_id)
+                            continue
+                        if is_stale:
+                            stale_ids.add(video_id)
+                        fetched[video_id] = {
                             'platform': platform,
                             'title': title,
                             'thumbnailUrl': thumbnail_url,
@@ -63,42 +146,45 @@ class MetadataUpdater:
                             'embedCode': embed_code
                         }
                     
-                    logging.info(f"Retrieved metadata for {len(metadata_dict)} videos from database")
-                    return metadata_dict
+                    with _ROW_CACHE_LOCK:
+                        for video_id, metadata in fetched.items():
+                            if video_id not in stale_ids:
+                                _ROW_CACHE[video_id] = dict(metadata)
+                    
+                    logging.info(f"Retrieved metadata for {len(fetched)} videos from database "
+                                 f"({len(metadata_dict)} from cache)")
+                    metadata_dict.update(fetched)
+                    return metadata_dict, stale_ids, absent_ids
                     
         except Exception as e:
             logging.error(f"Error retrieving metadata from database: {e}")
-            return {}
+            return metadata_dict, set(), set(missing_ids)
     
-    def identify_stale_metadata(self, video_metadata: Dict[str, dict]) -> Set[str]:
-        """古いメタデータを特定"""
-        stale_ids = set()
-        cutoff_date = datetime.now()
+    def construct_urls_from_ids(self, video_ids: Set[str],
+                                known_platforms: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        ビデオIDからURL構築（プラットフォーム情報が必要な場合）
         
-        for video_id, metadata in video_metadata.items():
-            fetched_at = metadata.get('metadata_fetched_at')
-            # タイムゾーン問題を回避するため、常に新しいものとして扱う
-            if not fetched_at:
-                stale_ids.add(video_id)
-        
-        logging.info(f"Identified {len(stale_ids)} stale metadata entries")
-        return stale_ids
-    
-    def construct_urls_from_ids(self, video_ids: Set[str]) -> List[str]:
-        """ビデオIDからURL構築（プラットフォーム情報が必要な場合）"""
-        urls = []
+        known_platforms（video_id -> platform）にあるIDはそのまま使い、DBにはそれ以外だけを問い合わせる。
+        """
+        known_platforms = known_platforms or {}
+        urls = [url for url in (self._construct_url(video_id, known_platforms[video_id])
+                                for video_id in video_ids if video_id in known_platforms) if url]
+        unknown_ids = [video_id for video_id in video_ids if video_id not in known_platforms]
+        if not unknown_ids:
+            logging.info(f"Constructed {len(urls)} URLs from video IDs")
+            return urls
         
         try:
             with self.get_db_connection() as conn:
                 with conn.cursor() as cur:
-                    placeholders = ','.join(['%s'] * len(video_ids))
-                    query = f"""
-                    SELECT unique_video_id, source as platform 
+                    query = """
+                    SELECT DISTINCT unique_video_id, source as platform 
                     FROM videos 
-                    WHERE unique_video_id IN ({placeholders})
+                    WHERE unique_video_id = ANY(%s)
                     """
                     
-                    cur.execute(query, list(video_ids))
+                    cur.execute(query, (unknown_ids,))
                     results = cur.fetchall()
                     
                     for video_id, platform in results:
@@ -111,48 +197,37 @@ class MetadataUpdater:
                     
         except Exception as e:
             logging.error(f"Error constructing URLs from IDs: {e}")
-            return []
+            return urls
     
     def _construct_url(self, video_id: str, platform: str) -> str:
         """プラットフォーム別URL構築"""
-        url_templates = {
-            'youtube': f'https://www.youtube.com/watch?v={video_id}',
-            'tiktok': f'https://www.tiktok.com/@user/video/{video_id}',
-            'instagram': f'https://www.instagram.com/p/{video_id}/'
-        }
-        
-        return url_templates.get(platform, '')
+        fmt = _URL_FMT.get(platform)
+        return fmt.format(video_id) if fmt else ''
     
     def fetch_fresh_metadata_batch(self, urls: List[str]) -> Dict[str, dict]:
         """バッチAPIで最新メタデータを取得"""
         if not urls:
             return {}
         
+        # 同じURLを二重に取得しない（順序は保つ）
+        original_count = len(urls)
+        urls = list(dict.fromkeys(urls))
+        if len(urls) != original_count:
+            logging.info(f"Deduped URLs: {original_count} -> {len(urls)}")
+        
         try:
-            # バッチサイズで分割（50件ずつ）
-            batch_size = 50
+            # バッチサイズで分割（50件ずつ）し、各バッチを並列に投げる
+            batches = [urls[i:i + self.BATCH_SIZE] for i in range(0, len(urls), self.BATCH_SIZE)]
             all_metadata = {}
             
-            for i in range(0, len(urls), batch_size):
-                batch_urls = urls[i:i + batch_size]
-                
-                payload = {"urls": batch_urls}
-                response = requests.post(
-                    self.batch_api_url,
-                    json=payload,
-                    timeout=120  # 2分タイムアウト
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    for result in data.get('results', []):
-                        if result.get('success'):
-                            video_data = result.get('data', {})
-                            video_id = video_data.get('unique_video_id')
-                            if video_id:
-                                all_metadata[video_id] = video_data
-                else:
-                    logging.warning(f"Batch API returned status {response.status_code}")
+            with ThreadPoolExecutor(max_workers=min(self.BATCH_WORKERS, len(batches))) as executor:
+                futures = [executor.submit(self._post_batch, batch_urls) for batch_urls in batches]
+                for future in as_completed(futures):
+                    try:
+                        all_metadata.update(future.result())
+                    except Exception as e:
+                        # 1バッチの失敗で他のバッチの結果を捨てない
+                        logging.error(f"Error fetching metadata batch: {e}")
             
             logging.info(f"Fetched fresh metadata for {len(all_metadata)} videos")
             return all_metadata
@@ -161,6 +236,29 @@ class MetadataUpdater:
             logging.error(f"Error fetching fresh metadata: {e}")
             return {}
     
+    def _post_batch(self, batch_urls: List[str]) -> Dict[str, dict]:
+        """1バッチ分をバッチAPIに投げ、成功したものをvideo_idごとに返す"""
+        payload = {"urls": batch_urls}
+        response = self.session.post(
+            self.batch_api_url,
+            json=payload,
+            timeout=120  # 2分タイムアウト
+        )
+        
+        metadata = {}
+        if response.status_code == 200:
+            data = response.json()
+            for result in data.get('results', []):
+                if result.get('success'):
+                    video_data = result.get('data', {})
+                    video_id = video_data.get('unique_video_id')
+                    # タイトルもサムネイルも無い結果（抽出のフォールバック失敗）で既存の値を空にしない
+                    if video_id and (video_data.get('title') or video_data.get('thumbnailUrl')):
+                        metadata[video_id] = video_data
+        else:
+            logging.warning(f"Batch API returned status {response.status_code}")
+        return metadata
+    
     def update_videos_cache(self, metadata_batch: Dict[str, dict]):
         """videosテーブルのメタデータキャッシュを更新"""
         if not metadata_batch:
@@ -169,26 +267,55 @@ class MetadataUpdater:
         try:
             with self.get_db_connection() as conn:
                 with conn.cursor() as cur:
-                    for video_id, metadata in metadata_batch.items():
-                        cur.execute("""
+                    rows = [
+                        (metadata.get('title'), metadata.get('authorName'), metadata.get('thumbnailUrl'), video_id)
+                        for video_id, metadata in metadata_batch.items()
+                    ]
+                    if len(rows) > COPY_THRESHOLD:
+                        self._update_videos_via_copy(cur, rows)
+                    else:
+                        # 1行ずつUPDATEせず、VALUESリストとJOINして1文（page_size件ごと）で更新する
+                        execute_values(cur, """
                             UPDATE videos SET
-                                video_title = %s,
-                                video_author_name = %s,
-                                video_author_icon_url = %s
-                            WHERE unique_video_id = %s
-                        """, (
-                            metadata.get('title'),
-                            metadata.get('authorName'),
-                            metadata.get('thumbnailUrl'),
-                            video_id
-                        ))
+                                video_title = tmp.title,
+                                video_author_name = tmp.author,
+                                video_author_icon_url = tmp.icon
+                            FROM (VALUES %s) AS tmp(title, author, icon, uid)
+                            WHERE videos.unique_video_id = tmp.uid
+                        """, rows, template="(%s, %s, %s, %s)", page_size=500)
                     
                     conn.commit()
                     logging.info(f"Updated metadata cache for {len(metadata_batch)} videos")
+            
+            # 書き換えた行はプロセス内キャッシュからも外し、次回はDBから読み直す
+            with _ROW_CACHE_LOCK:
+                for video_id in metadata_batch:
+                    _ROW_CACHE.pop(video_id, None)
                     
         except Exception as e:
             logging.error(f"Error updating videos cache: {e}")
     
+    def _update_videos_via_copy(self, cur, rows: List[tuple]):
+        """大量更新用: COPYで一時テーブルに流し込み、1回のUPDATE ... FROMで反映する"""
+        cur.execute("""
+            CREATE TEMP TABLE tmp_meta (title text, author text, icon text, uid text PRIMARY KEY)
+            ON COMMIT DROP
+        """)
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join(_copy_field(value) for value in row))
+            buf.write('\n')
+        buf.seek(0)
+        cur.copy_expert("COPY tmp_meta (title, author, icon, uid) FROM STDIN", buf)
+        cur.execute("""
+            UPDATE videos SET
+                video_title = t.title,
+                video_author_name = t.author,
+                video_author_icon_url = t.icon
+            FROM tmp_meta t
+            WHERE videos.unique_video_id = t.uid
+        """)
+    
     def get_complete_metadata_for_rankings(self, ranking_data: Dict[str, List]) -> Dict[str, dict]:
         """ランキング用の完全なメタデータを取得"""
         # 全期間のユニークビデオIDを収集
@@ -200,19 +327,22 @@ class MetadataUpdater:
         all_video_ids_list = list(all_video_ids)
         logging.info(f"Processing metadata for {len(all_video_ids_list)} unique videos")
         
-        # 既存メタデータを取得
-        existing_metadata = self.get_metadata_from_videos_table(all_video_ids_list)
+        # 既存メタデータ・古いID・存在しないIDを1クエリで取得（判定はSQL側）
+        existing_metadata, stale_ids, missing_ids = self._select_latest_metadata(all_video_ids_list)
         
         # 古いまたは不足しているメタデータを特定
-        missing_ids = all_video_ids - set(existing_metadata.keys())
-        stale_ids = self.identify_stale_metadata(existing_metadata)
+        logging.info(f"Identified {len(stale_ids)} stale metadata entries")
         refresh_needed = missing_ids | stale_ids
         
         logging.info(f"Missing: {len(missing_ids)}, Stale: {len(stale_ids)}, Total refresh needed: {len(refresh_needed)}")
         
         # 必要に応じて最新データを取得
         if refresh_needed:
-            urls = self.construct_urls_from_ids(refresh_needed)
+            # URL構築に必要なplatformは上のSELECTで取得済みなので、索引にして再問い合わせを省く。
+            # missing_idsはvideosテーブルに行がない＝platformも分からないため、URLを作れない
+            # （construct_urls_from_idsで引いても同じテーブルなので結果は空）
+            id_to_platform = {video_id: metadata['platform'] for video_id, metadata in existing_metadata.items()}
+            urls = self.construct_urls_from_ids(stale_ids, id_to_platform)
             fresh_metadata = self.fetch_fresh_metadata_batch(urls)
             
             # キャッシュを更新
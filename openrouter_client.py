@@ -13,21 +13,59 @@ Note: Video analysis uses Gemini API directly (gemini-2.5-flash-lite), not OpenR
 import os
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import base64
 import json
+import orjson
 import re
-import psycopg2
+import threading
+import hashlib
+from cachetools import TTLCache
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from db_pool import pooled_connection, BackgroundBatchWriter
+from init_log_db import is_partitioned, drop_expired_partitions
+from rate_limiter import get_circuit_breaker, parse_retry_after
+from typing import Dict, Any, List, Optional, Iterator
 
 
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# 複数キーをカンマ区切りで指定するとリクエストごとにローテーションする（未指定なら単一キー）
+OPENROUTER_API_KEYS = [k.strip() for k in os.getenv("OPENROUTER_API_KEYS", "").split(",") if k.strip()] \
+    or ([OPENROUTER_API_KEY] if OPENROUTER_API_KEY else [])
+# 429を受けたキーを休ませる秒数
+KEY_COOLDOWN_SECONDS = 60
+# フォールバックチェーンのn番目のモデルに与えるタイムアウト（秒）。足りない分は最後の値を使う
+# 先頭モデルが詰まっても早めに次へ切り替え、後ろのモデルほど長く待つ
+MODEL_TIMEOUTS = (30, 60, 120)
+# 数千トークンを生成する呼び出し（一括分類・翻訳・レシピ整形）用。MODEL_TIMEOUTSでは生成途中で切れ、
+# そのタイムアウトがブレーカーの失敗にも数えられてしまう
+LONG_MODEL_TIMEOUTS = (120, 180, 240)
+# 429を受けた後の待ち時間（1回のチェーン内で429を受けた回数に応じて倍々、上限あり）
+RATE_LIMIT_BACKOFF_BASE = 0.5
+RATE_LIMIT_BACKOFF_MAX = 8.0
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# 同一プロンプトの再送（同じレシピの再送信、同じ材料の再分類など）に使う応答キャッシュ
+# キー: メッセージ・モデル列・生成パラメータのハッシュ。成功した結果だけを載せる
+_RESPONSE_CACHE = TTLCache(maxsize=4096, ttl=3600)
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+class RateLimitError(RuntimeError):
+    """全モデルが失敗し、そのうち少なくとも1つが429だった（ストリーミング時）"""
+
+
+def _response_cache_key(messages, models, max_tokens, temperature) -> str:
+    digest = hashlib.blake2b(orjson.dumps(messages, option=orjson.OPT_SORT_KEYS), digest_size=16)
+    digest.update(orjson.dumps([list(models), max_tokens, temperature]))
+    return digest.hexdigest()
+
 # 使用するモデルリスト（ユーザー指定）
 TEXT_MODELS = [
     "google/gemma-3-27b-it:free",
@@ -57,9 +95,19 @@ class OpenRouterClient:
     """Client for OpenRouter API with automatic fallback on rate limits."""
     
     def __init__(self):
-        self.api_key = OPENROUTER_API_KEY
+        self.api_keys = deque(OPENROUTER_API_KEYS)
+        self.api_key = self.api_keys[0] if self.api_keys else None
+        self._key_cooldowns = {}  # key -> cooldown終了時刻 (monotonic)
+        self._key_lock = threading.Lock()
         self.gemini_key = os.getenv("GEMINI_API_KEY")
         self.log_db_url = os.getenv("LOG_DATABASE_URL")
+        # 利用ログはバックグラウンドでまとめてINSERTする（呼び出し側をDB往復で待たせない）
+        self._log_writer = BackgroundBatchWriter(
+            self.log_db_url,
+            "INSERT INTO ai_usage_logs (model_name, status, error_message, tokens_used, timestamp) VALUES %s",
+            max_batch=500,
+            flush_interval=2.0
+        ) if self.log_db_url else None
         self.base_url = OPENROUTER_API_URL
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -67,6 +115,16 @@ class OpenRouterClient:
             "HTTP-Referer": "https://replit.com",
             "X-Title": "Recipe Extractor"
         }
+        # フォールバックチェーン全体でTLS接続を使い回すための永続セッション
+        # （429はモデル切り替えで扱うのでアダプタ側では再試行しない）
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # 一括チェック・gunicornの並列スレッドが同時に使うため、接続プールは大きめに取る
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=Retry(total=0)))
+        # キーごとのAuthorizationヘッダーは使い回す
+        self._auth_headers = {key: {"Authorization": f"Bearer {key}"} for key in self.api_keys}
+        # 失敗が続いているモデルを送信前にスキップするためのブレーカー（プロセス内で共有）
+        self._breaker = get_circuit_breaker("openrouter")
         self._gemini_initialized = False
         
         # モデルごとのステータス管理
@@ -88,24 +146,43 @@ class OpenRouterClient:
             "last_error": None
         }
 
+    def _next_api_key(self) -> Optional[str]:
+        """ラウンドロビンで次のキーを返す（クールダウン中のキーは飛ばす）"""
+        with self._key_lock:
+            if not self.api_keys:
+                return None
+            now = time.monotonic()
+            for _ in range(len(self.api_keys)):
+                key = self.api_keys[0]
+                self.api_keys.rotate(-1)
+                if self._key_cooldowns.get(key, 0) <= now:
+                    return key
+            # 全キーがクールダウン中なら最も早く復帰するキーを使う
+            return min(self.api_keys, key=lambda k: self._key_cooldowns.get(k, 0))
+
+    def _mark_key_rate_limited(self, key: str):
+        """429を受けたキーを一定時間ローテーションから外す"""
+        with self._key_lock:
+            self._key_cooldowns[key] = time.monotonic() + KEY_COOLDOWN_SECONDS
+
+    def _post(self, payload: Dict[str, Any], timeout: int, stream: bool = False):
+        """キーをローテーションしてOpenRouterへPOST"""
+        key = self._next_api_key()
+        # 共通ヘッダー（Content-Type含む）はセッション側に載せてあるので、キーだけ差し替える
+        # 本文はorjsonで直列化して渡す（画像を含むvisionペイロードでは特に差が大きい）
+        response = self.session.post(self.base_url, headers=self._auth_headers.get(key),
+                                     data=orjson.dumps(payload), timeout=timeout, stream=stream)
+        if response.status_code == 429 and len(self.api_keys) > 1:
+            self._mark_key_rate_limited(key)
+        return response
+
     def _log_to_db(self, model: str, status: str, error_message: str = None, tokens: int = 0):
-        """データベースへログを保存"""
+        """データベースへログを保存（キューに積むだけで、書き込みはバックグラウンド）"""
         if not self.log_db_url:
             return
 
-        try:
-            conn = psycopg2.connect(self.log_db_url)
-            cur = conn.cursor()
-            query = """
-                INSERT INTO ai_usage_logs (model_name, status, error_message, tokens_used)
-                VALUES (%s, %s, %s, %s)
-            """
-            cur.execute(query, (model, status, error_message, tokens))
-            conn.commit()
-            cur.close()
-            conn.close()
-        except Exception as e:
-            logging.error(f"Failed to write log to DB: {e}")
+        # 時刻はキュー投入時点のものを使う（書き込みまでの遅延で順序や集計がずれないように）
+        self._log_writer.put((model, status, error_message, tokens, datetime.now(timezone.utc)))
 
     def _update_model_status(self, model: str, success: bool, error_msg: str = None, tokens: int = 0):
         """モデルの使用状況を更新（メモリ＆DB）"""
@@ -144,9 +221,6 @@ class OpenRouterClient:
             return self.model_stats
 
         try:
-            conn = psycopg2.connect(self.log_db_url)
-            cur = conn.cursor()
-            
             # 各モデルの最新状態と集計を取得
             # 注意: ここでは簡易的にメモリ上のstats構造に合わせてデータを構築する
             # 本来はGROUP BYで集計するが、現在のself.model_statsの構造を維持して返す
@@ -163,23 +237,44 @@ class OpenRouterClient:
                 }
             
             # 集計クエリ: モデルごとの成功数、失敗数、最終使用日時、最終エラー
+            # 最終エラー・現在の状態はグループごとの相関サブクエリにせず、DISTINCT ONで
+            # モデルごとの最新行を1パスで取る（idx_logs_model_ts (model_name, timestamp DESC) を使う）
             query = """
-                SELECT 
-                    model_name,
-                    COUNT(*) FILTER (WHERE status = 'success') as success_count,
-                    COUNT(*) FILTER (WHERE status = 'error') as error_count,
-                    MAX(timestamp) as last_used,
-                    (SELECT error_message FROM ai_usage_logs l2 
-                     WHERE l2.model_name = l1.model_name AND status = 'error' 
-                     ORDER BY timestamp DESC LIMIT 1) as last_error,
-                    (SELECT status FROM ai_usage_logs l3 
-                     WHERE l3.model_name = l1.model_name 
-                     ORDER BY timestamp DESC LIMIT 1) as current_status
-                FROM ai_usage_logs l1
-                GROUP BY model_name
+                WITH agg AS (
+                    SELECT
+                        model_name,
+                        COUNT(*) FILTER (WHERE status = 'success') as success_count,
+                        COUNT(*) FILTER (WHERE status = 'error') as error_count,
+                        MAX(timestamp) as last_used
+                    FROM ai_usage_logs
+                    GROUP BY model_name
+                ),
+                latest AS (
+                    SELECT DISTINCT ON (model_name) model_name, status
+                    FROM ai_usage_logs
+                    ORDER BY model_name, timestamp DESC
+                ),
+                latest_error AS (
+                    SELECT DISTINCT ON (model_name) model_name, error_message
+                    FROM ai_usage_logs
+                    WHERE status = 'error'
+                    ORDER BY model_name, timestamp DESC
+                )
+                SELECT
+                    agg.model_name,
+                    agg.success_count,
+                    agg.error_count,
+                    agg.last_used,
+                    latest_error.error_message as last_error,
+                    latest.status as current_status
+                FROM agg
+                LEFT JOIN latest USING (model_name)
+                LEFT JOIN latest_error USING (model_name)
             """
-            cur.execute(query)
-            rows = cur.fetchall()
+            with pooled_connection(self.log_db_url) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query)
+                    rows = cur.fetchall()
             
             for row in rows:
                 model_name = row[0]
@@ -201,8 +296,6 @@ class OpenRouterClient:
                     "status": row[5] if row[5] else "unused"
                 }
 
-            cur.close()
-            conn.close()
             return db_stats
             
         except Exception as e:
@@ -250,11 +343,12 @@ class OpenRouterClient:
                 self._update_model_status(model_name, False, str(e))
                 return False
 
-        # 並列実行
-        with ThreadPoolExecutor(max_workers=5) as executor:
+        # 並列実行（I/O待ちだけなので全モデルを同時に投げる。接続はself.sessionのプールを共有）
+        check_models = TEXT_MODELS + ["gemini-2.5-flash-lite (direct)"]
+        with ThreadPoolExecutor(max_workers=len(check_models)) as executor:
             future_to_model = {
                 executor.submit(check_single_model, m): m 
-                for m in TEXT_MODELS + ["gemini-2.5-flash-lite (direct)"]
+                for m in check_models
             }
             for future in as_completed(future_to_model):
                 model = future_to_model[future]
@@ -267,27 +361,29 @@ class OpenRouterClient:
         return results
 
     def cleanup_old_logs(self):
-        """1年以上前のログを削除"""
+        """1年以上前のログを削除（パーティション化済みなら月次パーティションごとDROP）"""
         if not self.log_db_url:
             return
             
         try:
-            conn = psycopg2.connect(self.log_db_url)
-            cur = conn.cursor()
-            # 1年以上前のデータを削除
-            query = "DELETE FROM ai_usage_logs WHERE timestamp < NOW() - INTERVAL '1 year'"
-            cur.execute(query)
-            deleted_count = cur.rowcount
-            conn.commit()
-            cur.close()
-            conn.close()
+            with pooled_connection(self.log_db_url) as conn:
+                with conn.cursor() as cur:
+                    if is_partitioned(cur):
+                        dropped = drop_expired_partitions(cur)
+                        conn.commit()
+                        if dropped:
+                            logging.info(f"Dropped {dropped} expired log partitions.")
+                        return
+                    # 旧来の通常テーブルの場合は1年以上前のデータを削除
+                    query = "DELETE FROM ai_usage_logs WHERE timestamp < NOW() - INTERVAL '1 year'"
+                    cur.execute(query)
+                    deleted_count = cur.rowcount
+                conn.commit()
             if deleted_count > 0:
                 logging.info(f"Cleaned up {deleted_count} old log entries.")
         except Exception as e:
             logging.error(f"Failed to cleanup old logs: {e}")
 
-
-
     def _ensure_gemini_initialized(self):
 
         """Gemini APIを初期化"""
@@ -298,7 +394,7 @@ class OpenRouterClient:
 
     
     def _call_api(self, model: str, messages: List[Dict[str, str]], 
-                  max_tokens: int = 4096, temperature: float = 0.7) -> Dict[str, Any]:
+                  max_tokens: int = 4096, temperature: float = 0.7, timeout: float = 120) -> Dict[str, Any]:
         """Make a single API call to OpenRouter."""
         payload = {
             "model": model,
@@ -307,19 +403,80 @@ class OpenRouterClient:
             "temperature": temperature,
         }
         
-        response = requests.post(
-            self.base_url,
-            headers=self.headers,
-            json=payload,
-            timeout=120
-        )
+        return self._post(payload, timeout=timeout)
+    
+    def _try_model(self, model: str, messages: List[Dict[str, str]],
+                   max_tokens: int, temperature: float, timeout: float = 120):
+        """
+        1モデルで1回試行する
         
-        return response
+        (成功時の結果dict, None, False) または (None, エラーメッセージ, 429だったか) を返す
+        """
+        try:
+            logging.info(f"Trying OpenRouter model: {model} (timeout {timeout}s)")
+            response = self._call_api(model, messages, max_tokens, temperature, timeout)
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+                usage = data.get("usage", {})
+                self._breaker.record_success(model)
+                self._update_model_status(model, True, tokens=usage.get("total_tokens", 0))
+                
+                return {
+                    "success": True,
+                    "content": content,
+                    "model_used": model,
+                    "tokens_used": usage.get("total_tokens", 0),
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                }, None, False
+            elif response.status_code == 429:
+                self._update_model_status(model, False, f"Rate limit (429)")
+                logging.warning(f"Rate limited on {model}, trying next model...")
+                self._breaker.record_failure(model, parse_retry_after(response.headers.get("Retry-After")))
+                return None, f"Rate limit exceeded for {model}", True
+            else:
+                try:
+                    error_data = response.json()
+                    error_msg = error_data.get("error", {}).get("message", response.text)
+                    logging.warning(f"Error from {model} (HTTP {response.status_code}): {error_msg}")
+                except Exception:
+                    error_msg = response.text
+                    logging.warning(f"Error from {model} (HTTP {response.status_code}): {error_msg}")
+                self._update_model_status(model, False, f"HTTP {response.status_code}: {error_msg}")
+                # 4xx（不正リクエスト・認証・残高不足等）はモデルの不調ではないのでブレーカーに数えない
+                if response.status_code >= 500:
+                    self._breaker.record_failure(model)
+                return None, error_msg, False
+                
+        except requests.exceptions.Timeout:
+            self._update_model_status(model, False, "Timeout")
+            logging.warning(f"Timeout on {model}, trying next model...")
+            self._breaker.record_failure(model)
+            return None, f"Timeout for {model}", False
+        except requests.exceptions.ConnectionError as e:
+            self._update_model_status(model, False, str(e))
+            logging.warning(f"Connection error with {model}: {e}")
+            self._breaker.record_failure(model)
+            return None, str(e), False
+        except Exception as e:
+            # レスポンスの解析失敗などローカル側のエラーはブレーカーに数えない
+            self._update_model_status(model, False, str(e))
+            logging.warning(f"Exception with {model}: {e}")
+            return None, str(e), False
+    
+    @staticmethod
+    def _model_timeout(attempt: int, model_timeouts: Optional[List[float]] = None) -> float:
+        """フォールバックのattempt番目（0始まり）に使うタイムアウト"""
+        timeouts = model_timeouts or MODEL_TIMEOUTS
+        return timeouts[min(attempt, len(timeouts) - 1)]
     
     def chat_completion(self, messages: List[Dict[str, str]], 
                         models: Optional[List[str]] = None,
                         max_tokens: int = 4096,
-                        temperature: float = 0.7) -> Dict[str, Any]:
+                        temperature: float = 0.7,
+                        model_timeouts: Optional[List[float]] = None) -> Dict[str, Any]:
         """
         Send a chat completion request with automatic fallback on 429 errors.
         
@@ -328,9 +485,12 @@ class OpenRouterClient:
             models: List of models to try in order. Defaults to TEXT_MODELS.
             max_tokens: Maximum tokens in response
             temperature: Sampling temperature
+            model_timeouts: Per-attempt timeouts in fallback order (last value repeats).
+                Defaults to MODEL_TIMEOUTS.
             
         Returns:
-            Dict with 'content', 'model_used', 'tokens_used', 'success'
+            Dict with 'content', 'model_used', 'tokens_used', 'success'.
+            On failure, also 'error' and 'rate_limited' (True if any model returned 429).
         """
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY not set")
@@ -338,54 +498,41 @@ class OpenRouterClient:
         if models is None:
             models = TEXT_MODELS
         
+        cache_key = _response_cache_key(messages, models, max_tokens, temperature)
+        with _RESPONSE_CACHE_LOCK:
+            cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            logging.info(f"Chat completion served from cache ({cached['model_used']})")
+            return dict(cached)
+        
+        result = self._chat_completion_uncached(messages, models, max_tokens, temperature, model_timeouts)
+        if result.get("success"):
+            with _RESPONSE_CACHE_LOCK:
+                _RESPONSE_CACHE[cache_key] = dict(result)
+        return result
+    
+    def _chat_completion_uncached(self, messages: List[Dict[str, str]], models: List[str],
+                                  max_tokens: int, temperature: float,
+                                  model_timeouts: Optional[List[float]]) -> Dict[str, Any]:
+        """chat_completionの本体（キャッシュなし）"""
         last_error = None
         
-        for model in models:
-            try:
-                logging.info(f"Trying OpenRouter model: {model}")
-                response = self._call_api(model, messages, max_tokens, temperature)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                    usage = data.get("usage", {})
-                    
-                    return {
-                        "success": True,
-                        "content": content,
-                        "model_used": model,
-                        "tokens_used": usage.get("total_tokens", 0),
-                        "prompt_tokens": usage.get("prompt_tokens", 0),
-                        "completion_tokens": usage.get("completion_tokens", 0),
-                    }
-                elif response.status_code == 429:
-                    self._update_model_status(model, False, f"Rate limit (429)")
-                    logging.warning(f"Rate limited on {model}, trying next model...")
-                    last_error = f"Rate limit exceeded for {model}"
-                    time.sleep(0.5)
-                    continue
-                else:
-                    try:
-                        error_data = response.json()
-                        error_msg = error_data.get("error", {}).get("message", response.text)
-                        logging.warning(f"Error from {model} (HTTP {response.status_code}): {error_msg}")
-                    except Exception:
-                        error_msg = response.text
-                        logging.warning(f"Error from {model} (HTTP {response.status_code}): {error_msg}")
-                    last_error = error_msg
-                    self._update_model_status(model, False, f"HTTP {response.status_code}: {error_msg}")
-                    continue
-                    
-            except requests.exceptions.Timeout:
-                self._update_model_status(model, False, "Timeout")
-                logging.warning(f"Timeout on {model}, trying next model...")
-                last_error = f"Timeout for {model}"
-                continue
-            except Exception as e:
-                self._update_model_status(model, False, str(e))
-                logging.warning(f"Exception with {model}: {e}")
-                last_error = str(e)
-                continue
+        # 休止中（バックオフ中・回路が開いている）のモデルは送る前に飛ばす
+        available_models = self._breaker.available(models)
+        if len(available_models) < len(models):
+            logging.info(f"Skipping cooling-down models: {[m for m in models if m not in available_models]}")
+        models = available_models
+        
+        rate_limited_count = 0
+        for i, model in enumerate(models):
+            result, last_error, rate_limited = self._try_model(
+                model, messages, max_tokens, temperature, self._model_timeout(i, model_timeouts))
+            if result is not None:
+                return result
+            # 429のときだけ回数に応じて待つ（5xxやタイムアウトは待たずに次へ）
+            if rate_limited:
+                time.sleep(min(RATE_LIMIT_BACKOFF_BASE * 2 ** rate_limited_count, RATE_LIMIT_BACKOFF_MAX))
+                rate_limited_count += 1
         
         # OpenRouterが全滅した場合、Gemini APIを直接試行
         if self._ensure_gemini_initialized():
@@ -415,9 +562,128 @@ class OpenRouterClient:
             "model_used": None,
             "error": last_error or "All models failed",
             "tokens_used": 0,
+            # 呼び出し側のリミッターが429を判定できるよう、途中で429を受けたかを返す
+            "rate_limited": rate_limited_count > 0,
         }
 
     
+    def chat_completion_stream(self, messages: List[Dict[str, str]],
+                               models: Optional[List[str]] = None,
+                               max_tokens: int = 4096,
+                               temperature: float = 0.7,
+                               model_timeouts: Optional[List[float]] = None) -> Iterator[str]:
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+
+        Falls back to the next model only if a model fails before producing
+        any output, with the same per-attempt timeouts and 429 backoff as
+        chat_completion. If all OpenRouter models fail, the direct Gemini
+        response is yielded as a single chunk. Closing the generator early
+        closes the underlying HTTP response, so callers can stop once they
+        have enough.
+
+        Raises:
+            RateLimitError: if every model failed and at least one returned 429
+            RuntimeError: if every model (including Gemini fallback) failed
+        """
+        if not self.api_key:
+            raise ValueError("OPENROUTER_API_KEY not set")
+
+        if models is None:
+            models = TEXT_MODELS
+
+        last_error = None
+        rate_limited_count = 0
+
+        # 休止中（バックオフ中・回路が開いている）のモデルは送る前に飛ばす
+        available_models = self._breaker.available(models)
+        if len(available_models) < len(models):
+            logging.info(f"Skipping cooling-down models: {[m for m in models if m not in available_models]}")
+        models = available_models
+
+        for i, model in enumerate(models):
+            payload = {
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "stream": True,
+            }
+            timeout = self._model_timeout(i, model_timeouts)
+            yielded = False
+            try:
+                logging.info(f"Trying OpenRouter model (stream): {model} (timeout {timeout}s)")
+                response = self._post(payload, timeout=timeout, stream=True)
+                try:
+                    if response.status_code != 200:
+                        error_msg = "Rate limit (429)" if response.status_code == 429 else f"HTTP {response.status_code}: {response.text[:200]}"
+                        self._update_model_status(model, False, error_msg)
+                        logging.warning(f"Error from {model} (stream): {error_msg}")
+                        last_error = error_msg
+                        if response.status_code == 429:
+                            self._breaker.record_failure(model, parse_retry_after(response.headers.get("Retry-After")))
+                            # 429のときだけ回数に応じて待つ（chat_completionと同じ）
+                            time.sleep(min(RATE_LIMIT_BACKOFF_BASE * 2 ** rate_limited_count, RATE_LIMIT_BACKOFF_MAX))
+                            rate_limited_count += 1
+                        elif response.status_code >= 500:
+                            self._breaker.record_failure(model)
+                        continue
+
+                    for line in response.iter_lines(decode_unicode=True):
+                        # SSE: "data: {...}" 以外（空行・": OPENROUTER PROCESSING" 等）は無視
+                        if not line or not line.startswith("data: "):
+                            continue
+                        data = line[6:]
+                        if data == "[DONE]":
+                            break
+                        chunk = orjson.loads(data)
+                        if "error" in chunk:
+                            raise RuntimeError(chunk["error"].get("message", "stream error"))
+                        delta = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
+                        if delta:
+                            if not yielded:
+                                # 最初の出力が届いた時点で成功として記録（呼び出し側が途中で閉じても残る）
+                                self._breaker.record_success(model)
+                                self._update_model_status(model, True)
+                            yielded = True
+                            yield delta
+                finally:
+                    response.close()
+
+                if yielded:
+                    return
+                last_error = f"Empty response from {model}"
+
+            except Exception as e:
+                if yielded:
+                    # 途中まで出力済みの場合はフォールバックすると内容が混ざるため中断
+                    raise
+                if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                    self._breaker.record_failure(model)
+                self._update_model_status(model, False, str(e))
+                logging.warning(f"Exception with {model} (stream): {e}")
+                last_error = str(e)
+
+        # OpenRouterが全滅した場合、Gemini APIを直接試行（ストリーミングせず一括）
+        if self._ensure_gemini_initialized():
+            logging.info("All OpenRouter models failed. Falling back to Gemini API directly.")
+            try:
+                model = genai.GenerativeModel("gemini-2.5-flash-lite")
+                prompt = "\n".join([m['content'] for m in messages if m['role'] == 'user'])
+                response = model.generate_content(prompt)
+                if response and response.text:
+                    self._update_model_status("gemini-2.5-flash-lite (direct)", True, tokens=0)
+                    yield response.text
+                    return
+            except Exception as e:
+                self._update_model_status("gemini-2.5-flash-lite (direct)", False, str(e))
+                logging.error(f"Direct Gemini API fallback also failed: {e}")
+                last_error = f"{last_error} | Gemini fallback error: {str(e)}"
+
+        if rate_limited_count:
+            raise RateLimitError(last_error or "All models failed")
+        raise RuntimeError(last_error or "All models failed")
+
     def chat_completion_with_vision(self, messages: List[Dict[str, Any]],
                                      models: Optional[List[str]] = None,
                                      max_tokens: int = 4096,
@@ -464,7 +730,8 @@ class OpenRouterClient:
         ]
         
         # 翻訳にはTEXT_MODELSを使用（gemma-3-27b-itが最優先）
-        return self.chat_completion(messages, TEXT_MODELS, max_tokens=4096, temperature=0.3)
+        return self.chat_completion(messages, TEXT_MODELS, max_tokens=4096, temperature=0.3,
+                                    model_timeouts=LONG_MODEL_TIMEOUTS)
     
     def refine_recipe(self, raw_text: str, model: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -516,7 +783,8 @@ amountには数値のみ、unitには単位のみを入れてください。「
         ]
         
         models = [model] if model else TEXT_MODELS
-        return self.chat_completion(messages, models, max_tokens=4096, temperature=0.3)
+        return self.chat_completion(messages, models, max_tokens=4096, temperature=0.3,
+                                    model_timeouts=LONG_MODEL_TIMEOUTS)
     
     def analyze_video_url(self, video_url: str, prompt: str, 
                           models: Optional[List[str]] = None,
@@ -564,7 +832,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
         
         last_error = None
         
-        for model in models:
+        for model in self._breaker.available(models):
             try:
                 logging.info(f"Trying video analysis with OpenRouter model: {model}")
                 
@@ -575,17 +843,13 @@ amountには数値のみ、unitには単位のみを入れてください。「
                     "temperature": temperature,
                 }
                 
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=180
-                )
+                response = self._post(payload, timeout=180)
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
                     usage = data.get("usage", {})
+                    self._breaker.record_success(model)
                     
                     return {
                         "success": True,
@@ -599,7 +863,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
                 elif response.status_code == 429:
                     logging.warning(f"Rate limited on {model} for video analysis, trying next model...")
                     last_error = f"Rate limit exceeded for {model}"
-                    time.sleep(0.5)
+                    self._breaker.record_failure(model, parse_retry_after(response.headers.get("Retry-After")))
                     continue
                 else:
                     try:
@@ -609,11 +873,19 @@ amountには数値のみ、unitには単位のみを入れてください。「
                         error_msg = response.text
                     logging.warning(f"Error from {model} for video: {error_msg}")
                     last_error = error_msg
+                    if response.status_code >= 500:
+                        self._breaker.record_failure(model)
                     continue
                     
             except requests.exceptions.Timeout:
                 logging.warning(f"Timeout on {model} for video analysis, trying next model...")
                 last_error = f"Timeout for {model}"
+                self._breaker.record_failure(model)
+                continue
+            except requests.exceptions.ConnectionError as e:
+                logging.warning(f"Connection error with {model} for video: {e}")
+                last_error = str(e)
+                self._breaker.record_failure(model)
                 continue
             except Exception as e:
                 logging.warning(f"Exception with {model} for video: {e}")
@@ -3,7 +3,9 @@ import logging
 import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from datetime import datetime
 from batch_processor import BatchProcessor
+from init_log_db import maintain_partitions
 
 class RankingScheduler:
     """ランキング更新の定時実行を管理するクラス"""
@@ -12,12 +14,6 @@ class RankingScheduler:
         self.scheduler = BackgroundScheduler()
         self.batch_processor = BatchProcessor()
         
-        # ログ設定
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
     def setup_daily_job(self, hour: int = 2, minute: int = 0):
         """毎日定時実行のジョブを設定"""
         try:
@@ -43,6 +39,27 @@ class RankingScheduler:
             logging.error(f"Failed to setup daily job: {e}")
             return False
     
+    def setup_log_partition_job(self):
+        """AI利用ログの月次パーティション保守ジョブを設定（起動直後に1回、以後毎月1日）"""
+        try:
+            self.scheduler.add_job(
+                func=maintain_partitions,
+                trigger=CronTrigger(day=1, hour=3, minute=0),
+                id='log_partition_job',
+                name='AI Usage Log Partition Maintenance',
+                replace_existing=True,
+                max_instances=1,
+                misfire_grace_time=86400,
+                next_run_time=datetime.now()  # 作成漏れがあれば起動時に補う
+            )
+            
+            logging.info("Scheduled monthly log partition maintenance")
+            return True
+            
+        except Exception as e:
+            logging.error(f"Failed to setup log partition job: {e}")
+            return False
+    
     def setup_test_job(self, interval_minutes: int = 5):
         """テスト用の定期実行ジョブを設定"""
         try:
@@ -0,0 +1,181 @@
+"""
+LLM呼び出し用のプロバイダ別レートリミッター
+
+RPM/TPMのスライディングウィンドウで送信前にスロットリングし、
+429を受けたら許容RPMを乗算的に下げ、応答が速いうち、または429から一定時間経てば加算的に戻す（AIMD）。
+モデル単位では、失敗が続くモデルを一定時間スキップするサーキットブレーカーを持つ。
+gunicornのスレッド間で共有するためスレッドセーフにしている。
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+
+class AIMDLimiter:
+    """スライディングウィンドウ（60秒）のRPM/TPM制限 + AIMDによる動的調整"""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, rpm: int, tpm: int, alpha: float = 1.0, beta: float = 0.5,
+                 target_latency_ms: float = 2000.0, min_rpm: float = 1.0,
+                 recovery_seconds: float = 30.0):
+        self.max_rpm = float(rpm)
+        self.tpm = tpm
+        self.alpha = alpha
+        self.beta = beta
+        self.target_latency_ms = target_latency_ms
+        self.min_rpm = min_rpm
+        self.recovery_seconds = recovery_seconds
+
+        self.current_rpm = float(rpm)
+        self.ewma_latency_ms: Optional[float] = None
+        self._last_rate_limited: Optional[float] = None
+        self._events = deque()  # (timestamp, tokens)
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._events and now - self._events[0][0] >= self.WINDOW_SECONDS:
+            self._events.popleft()
+
+    def acquire(self, estimated_tokens: int = 0):
+        """送信枠が空くまでブロックし、枠を確保する"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+
+                used_tokens = sum(t for _, t in self._events)
+                # 単発でTPMを超えるリクエストはウィンドウが空なら通す（永久待ちを防ぐ）
+                tokens_ok = not self._events or used_tokens + estimated_tokens <= self.tpm
+                if len(self._events) < int(self.current_rpm) and tokens_ok:
+                    self._events.append((now, estimated_tokens))
+                    return
+
+                wait = self.WINDOW_SECONDS - (now - self._events[0][0]) if self._events else 0.1
+
+            time.sleep(min(max(wait, 0.05), 1.0))
+
+    def record_success(self, latency_ms: float):
+        """
+        成功時: レイテンシのEWMAを更新し、許容RPMを加算的に増やす
+
+        増やすのはEWMAが目標以下のとき、または最後の429からrecovery_seconds以上経ったとき。
+        LLMは生成量次第で応答が遅いため、レイテンシだけを条件にすると一度下げたRPMが戻らない。
+        """
+        with self._lock:
+            if self.ewma_latency_ms is None:
+                self.ewma_latency_ms = latency_ms
+            else:
+                self.ewma_latency_ms = 0.8 * self.ewma_latency_ms + 0.2 * latency_ms
+
+            recovered = (self._last_rate_limited is None
+                         or time.monotonic() - self._last_rate_limited >= self.recovery_seconds)
+            if self.ewma_latency_ms < self.target_latency_ms or recovered:
+                self.current_rpm = min(self.max_rpm, self.current_rpm + self.alpha)
+
+    def record_rate_limited(self):
+        """429受信時: 許容RPMを乗算的に減らす"""
+        with self._lock:
+            self.current_rpm = max(self.min_rpm, self.current_rpm * self.beta)
+            self._last_rate_limited = time.monotonic()
+            logging.warning(f"Rate limited: reducing allowed RPM to {self.current_rpm:.1f}")
+
+
+class ModelCircuitBreaker:
+    """
+    モデルごとのバックオフ + サーキットブレーカー
+
+    失敗（429・5xx・タイムアウト等）のたびに、指数バックオフ（ジッター付き）またはRetry-Afterの
+    長い方だけそのモデルを休ませる。failure_threshold回連続で失敗したら回路を開き、open_seconds
+    休ませる。休止明けの最初のリクエストが試行（ハーフオープン）となり、成功すれば閉じ、
+    失敗すれば再び開く。
+    """
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 30.0,
+                 failure_threshold: int = 3, open_seconds: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+
+        self._next_ok: Dict[str, float] = {}  # model -> 次に試してよい時刻 (monotonic)
+        self._fails: Dict[str, int] = {}      # model -> 連続失敗回数
+        self._lock = threading.Lock()
+
+    def allow(self, model: str) -> bool:
+        """今このモデルに送ってよいか"""
+        with self._lock:
+            return self._next_ok.get(model, 0.0) <= time.monotonic()
+
+    def available(self, models: Iterable[str]) -> list:
+        """
+        送ってよいモデルを順序を保って返す
+
+        全モデルが休止中の場合は、ローカル判断だけで全滅させないよう最も早く復帰するモデルを返す。
+        """
+        models = list(models)
+        with self._lock:
+            now = time.monotonic()
+            allowed = [m for m in models if self._next_ok.get(m, 0.0) <= now]
+            if allowed or not models:
+                return allowed
+            return [min(models, key=lambda m: self._next_ok.get(m, 0.0))]
+
+    def record_success(self, model: str):
+        """成功時: 連続失敗をリセットして回路を閉じる"""
+        with self._lock:
+            self._fails.pop(model, None)
+            self._next_ok.pop(model, None)
+
+    def record_failure(self, model: str, retry_after: Optional[float] = None):
+        """失敗時: バックオフ（Retry-Afterがあればそれ以上）を設定し、閾値を超えたら回路を開く"""
+        with self._lock:
+            fails = self._fails.get(model, 0) + 1
+            self._fails[model] = fails
+
+            delay = min(self.base_delay * 2 ** (fails - 1) + random.random() * self.base_delay, self.max_delay)
+            if retry_after:
+                delay = max(delay, retry_after)
+            if fails >= self.failure_threshold:
+                delay = max(delay, self.open_seconds)
+                logging.warning(f"Circuit open for {model}: {fails} consecutive failures, pausing {delay:.1f}s")
+
+            self._next_ok[model] = time.monotonic() + delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数形式のみ）を秒に変換。解釈できなければNone"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+# プロバイダごとのリミッター（プロセス内で共有）
+# 目標レイテンシは数千トークンの生成を含む実測に合わせる（短すぎるとRPMが戻らない）
+_LIMITERS: Dict[str, AIMDLimiter] = {
+    "gemini": AIMDLimiter(rpm=60, tpm=100_000, target_latency_ms=15_000),
+    "openrouter": AIMDLimiter(rpm=20, tpm=100_000, target_latency_ms=30_000),
+}
+
+
+def get_limiter(provider: str) -> AIMDLimiter:
+    """プロバイダ名からリミッターを取得"""
+    return _LIMITERS[provider]
+
+
+# プロバイダごとのモデル別サーキットブレーカー（プロセス内で共有）
+_BREAKERS: Dict[str, ModelCircuitBreaker] = {
+    "openrouter": ModelCircuitBreaker(),
+}
+
+
+def get_circuit_breaker(provider: str) -> ModelCircuitBreaker:
+    """プロバイダ名からモデル別サーキットブレーカーを取得"""
+    return _BREAKERS[provider]
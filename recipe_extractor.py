@@ -3,13 +3,42 @@ import logging
 import re
 import time
 import json
+import orjson
 import requests
 from typing import Optional, Dict, Any, List
 import google.generativeai as genai
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import pathlib
 import yt_dlp
 from openrouter_client import openrouter_client, TEXT_MODELS, VIDEO_CAPABLE_MODELS
+from metadata_extractor import HTML_PARSER
+from http_session import make_session
+
+# 正規表現はインポート時に一度だけコンパイルする
+_YT_ID_RES = [re.compile(p) for p in (
+    r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+    r'youtu\.be\/([0-9A-Za-z_-]{11}).*',
+)]
+_TT_ID_RES = [re.compile(p) for p in (
+    r'/video/(\d+)', r'/v/(\d+)',
+    r'vt\.tiktok\.com/([A-Za-z0-9]+)',  # 短縮URL形式 (vt.tiktok.com/XXXXXX)
+    r'vm\.tiktok\.com/([A-Za-z0-9]+)',  # vm.tiktok.com形式
+)]
+_IG_ID_RES = [re.compile(p) for p in (
+    r'/reel/([A-Za-z0-9_-]+)', r'/p/([A-Za-z0-9_-]+)',
+    r'/tv/([A-Za-z0-9_-]+)',
+)]
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_RECIPE_START_RES = [re.compile(p, re.IGNORECASE) for p in (
+    r'【?材料.*?】?', r'【?レシピ.*?】?', r'【?作り方.*?】?', r'Ingredients:?',
+    r'Recipe:?',
+)]
+_UNWANTED_PREFIX_RES = [re.compile(p, re.IGNORECASE) for p in (
+    r'^はい、.*?。\s*', r'^はい。\s*', r'^動画を拝見しました。?\s*', r'^以下に.*?します。?\s*',
+    r'^レシピをテキスト化します。?\s*', r'^こちらがレシピです。?\s*',
+)]
+_JSON_FENCE_RE = re.compile(r'^```json\s*|\s*```$', re.MULTILINE)
+_JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
 
 
 class RecipeExtractor:
@@ -21,8 +50,8 @@ class RecipeExtractor:
         self.apify_api_token = os.getenv("APIFY_API_TOKEN")
         self._gemini_initialized = False
 
-        self.session = requests.Session()
-        self.session.headers.update({
+        # 同一ホストへの並列リクエストで接続を使い回し、一時的な失敗はGET/HEADのみ短く再試行
+        self.session = make_session({
             'User-Agent':
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
@@ -163,13 +192,8 @@ class RecipeExtractor:
 
     def _extract_youtube_id(self, url: str) -> str:
         """YouTube動画IDを抽出"""
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'youtu\.be\/([0-9A-Za-z_-]{11}).*'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _YT_ID_RES:
+            match = pattern.search(url)
             if match: return match.group(1)
         return ""
 
@@ -224,7 +248,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
             
             recipe_text = None
             try:
-                json_text = re.sub(r'^```json\s*|\s*```$', '', raw_text, flags=re.MULTILINE).strip()
+                json_text = _JSON_FENCE_RE.sub('', raw_text).strip()
                 recipe_json = json.loads(json_text)
                 if recipe_json.get('error'):
                     raise ValueError("No recipe found in video")
@@ -259,34 +283,16 @@ amountには数値のみ、unitには単位のみを入れてください。「
 
     def _extract_tiktok_id(self, url: str) -> str:
         """TikTok動画IDを抽出"""
-        # 通常のURL形式
-        patterns = [r'/video/(\d+)', r'/v/(\d+)']
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        # 通常のURL形式 → 短縮URL形式の順に試す
+        for pattern in _TT_ID_RES:
+            match = pattern.search(url)
             if match: return match.group(1)
-
-        # 短縮URL形式 (vt.tiktok.com/XXXXXX)
-        short_url_pattern = r'vt\.tiktok\.com/([A-Za-z0-9]+)'
-        match = re.search(short_url_pattern, url)
-        if match:
-            return match.group(1)
-
-        # vm.tiktok.com形式も対応
-        vm_pattern = r'vm\.tiktok\.com/([A-Za-z0-9]+)'
-        match = re.search(vm_pattern, url)
-        if match:
-            return match.group(1)
-
         return ""
 
     def _extract_instagram_id(self, url: str) -> str:
         """Instagram動画IDを抽出"""
-        patterns = [
-            r'/reel/([A-Za-z0-9_-]+)', r'/p/([A-Za-z0-9_-]+)',
-            r'/tv/([A-Za-z0-9_-]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _IG_ID_RES:
+            match = pattern.search(url)
             if match: return match.group(1)
         return ""
 
@@ -314,7 +320,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
             }
             response = self.session.get(api_url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
 
             if not data.get('items'): return None
             description = data['items'][0]['snippet'].get('description', '')
@@ -360,7 +366,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
             }
             response = self.session.get(api_url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
 
             if not data.get('items'): return None
             channel_id = data['items'][0]['snippet'].get('channelId')
@@ -377,7 +383,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
                                         params=params,
                                         timeout=10)
             response.raise_for_status()
-            comments_data = response.json()
+            comments_data = orjson.loads(response.content)
 
             for item in comments_data.get('items', []):
                 comment = item['snippet']['topLevelComment']['snippet']
@@ -414,14 +420,10 @@ amountには数値のみ、unitには単位のみを入れてください。「
 
     def _extract_recipe_text(self, text: str) -> Optional[str]:
         """テキストからレシピ部分を抽出して整形"""
-        text = re.sub(r'<[^>]+>', '', text)
-        recipe_start_patterns = [
-            r'【?材料.*?】?', r'【?レシピ.*?】?', r'【?作り方.*?】?', r'Ingredients:?',
-            r'Recipe:?'
-        ]
+        text = _HTML_TAG_RE.sub('', text)
         start_pos = -1
-        for pattern in recipe_start_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _RECIPE_START_RES:
+            match = pattern.search(text)
             if match:
                 start_pos = match.start()
                 break
@@ -433,13 +435,9 @@ amountには数値のみ、unitには単位のみを入れてください。「
 
     def _clean_recipe_text(self, text: str) -> str:
         """AIからの応答をクリーニングして不要な前置きを削除"""
-        unwanted_prefixes = [
-            r'^はい、.*?。\s*', r'^はい。\s*', r'^動画を拝見しました。?\s*', r'^以下に.*?します。?\s*',
-            r'^レシピをテキスト化します。?\s*', r'^こちらがレシピです。?\s*'
-        ]
         cleaned = text
-        for pattern in unwanted_prefixes:
-            cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+        for pattern in _UNWANTED_PREFIX_RES:
+            cleaned = pattern.sub('', cleaned)
         return cleaned.strip()
 
     def _convert_json_to_text(self, recipe_json: Dict[str, Any]) -> str:
@@ -836,8 +834,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
                 
                 # JSONレスポンスの解析
                 try:
-                    import re
-                    json_text = re.sub(r'^```json\s*|\s*```$', '', content.strip(), flags=re.MULTILINE).strip()
+                    json_text = _JSON_FENCE_RE.sub('', content.strip()).strip()
                     recipe_json = json.loads(json_text)
                     
                     if recipe_json.get('no_recipe'):
@@ -953,7 +950,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
             response = requests.post(api_url, headers=headers, json=payload, timeout=120)
             response.raise_for_status()
 
-            data = response.json()
+            data = orjson.loads(response.content)
             logging.debug(f"Apify response data: {data}")
 
             # レスポンスから動画URLを抽出
@@ -1162,11 +1159,11 @@ amountには数値のみ、unitには単位のみを入れてください。「
         try:
             response = self.session.get(video_url, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=SoupStrainer('meta'))
 
             description = None
             meta_description = soup.find('meta', property='og:description')
-            if meta_description and hasattr(meta_description, 'get'):
+            if meta_description:
                 description = meta_description.get('content', '')
 
             if description and isinstance(description, str) and self._contains_recipe(description):
@@ -1252,7 +1249,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
                 
                 recipe_text = None
                 try:
-                    json_text = re.sub(r'^```json\s*|\s*```$', '', content, flags=re.MULTILINE).strip()
+                    json_text = _JSON_FENCE_RE.sub('', content).strip()
                     recipe_json = json.loads(json_text)
                     
                     if recipe_json.get('no_recipe') or recipe_json.get('error'):
@@ -1404,7 +1401,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
 
             recipe_text = None
             try:
-                json_text = re.sub(r'^```json\s*|\s*```$', '', raw_text, flags=re.MULTILINE).strip()
+                json_text = _JSON_FENCE_RE.sub('', raw_text).strip()
                 recipe_json = json.loads(json_text)
                 if recipe_json.get('error'):
                     raise ValueError("No recipe found in video")
@@ -1524,10 +1521,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
 
             recipe_text = None
             try:
-                json_text = re.sub(r'^```json\s*|\s*```$',
-                                   '',
-                                   raw_text,
-                                   flags=re.MULTILINE).strip()
+                json_text = _JSON_FENCE_RE.sub('', raw_text).strip()
                 recipe_json = json.loads(json_text)
                 if recipe_json.get('error'):
                     raise ValueError("No recipe found in video")
@@ -1588,11 +1582,11 @@ amountには数値のみ、unitには単位のみを入れてください。「
         try:
             response = self.session.get(video_url, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=SoupStrainer('meta'))
 
             description = None
             meta_description = soup.find('meta', property='og:description')
-            if meta_description and hasattr(meta_description, 'get'):
+            if meta_description:
                 description = meta_description.get('content', '')
 
             if description and isinstance(
@@ -1782,7 +1776,7 @@ amountには数値のみ、unitには単位のみを入れてください。「
             
             tokens_info = self._estimate_tokens(response)
             
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
+            json_match = _JSON_OBJECT_RE.search(response_text)
             if json_match:
                 try:
                     result = json.loads(json_match.group())
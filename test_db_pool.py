@@ -0,0 +1,70 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import db_pool
+from db_pool import BackgroundBatchWriter
+
+INSERT_SQL = "INSERT INTO t (a) VALUES %s"
+
+
+class RecordingWriter(BackgroundBatchWriter):
+    """_writeに渡されたバッチを記録するだけのライター（DBに接続しない）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def _write(self, rows):
+        if rows:
+            self.batches.append(rows)
+
+
+class TestBackgroundBatchWriter(unittest.TestCase):
+    def test_flush_writes_everything_in_max_batch_chunks(self):
+        writer = RecordingWriter("dsn", INSERT_SQL, max_batch=3)
+        # ワーカースレッドを起動せずにキューだけ積む
+        for i in range(7):
+            writer._queue.put_nowait((i,))
+        writer.flush()
+        self.assertEqual([len(b) for b in writer.batches], [3, 3, 1])
+        self.assertEqual([row for b in writer.batches for row in b], [(i,) for i in range(7)])
+
+    def test_put_drops_rows_when_queue_is_full(self):
+        writer = RecordingWriter("dsn", INSERT_SQL, max_queue=2)
+        with patch.object(writer, "_ensure_started"):
+            self.assertTrue(writer.put((1,)))
+            self.assertTrue(writer.put((2,)))
+            with self.assertLogs(level="WARNING"):
+                self.assertFalse(writer.put((3,)))
+
+    def test_worker_writes_rows_in_background(self):
+        writer = RecordingWriter("dsn", INSERT_SQL, max_batch=10, flush_interval=0.01)
+        with patch.object(db_pool.atexit, "register"):
+            for i in range(5):
+                writer.put((i,))
+        deadline = time.monotonic() + 2.0
+        while sum(len(b) for b in writer.batches) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sorted(row for b in writer.batches for row in b), [(i,) for i in range(5)])
+
+    def test_write_failure_is_logged_not_raised(self):
+        writer = BackgroundBatchWriter("dsn", INSERT_SQL)
+        with patch.object(db_pool, "pooled_connection", side_effect=RuntimeError("db down")):
+            with self.assertLogs(level="ERROR") as logs:
+                writer._write([(1,)])
+        self.assertIn("db down", logs.output[0])
+
+    def test_write_uses_execute_values_and_commits(self):
+        writer = BackgroundBatchWriter("dsn", INSERT_SQL, max_batch=50)
+        with patch.object(db_pool, "pooled_connection") as pooled, \
+             patch.object(db_pool, "execute_values") as execute_values:
+            conn = pooled.return_value.__enter__.return_value
+            writer._write([(1,), (2,)])
+        cur = conn.cursor.return_value.__enter__.return_value
+        execute_values.assert_called_once_with(cur, INSERT_SQL, [(1,), (2,)], page_size=50)
+        conn.commit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
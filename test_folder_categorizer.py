@@ -0,0 +1,110 @@
+import unittest
+
+from folder_categorizer import _AdaptiveBatchSizer, _read_until_json_closed
+
+
+def _stream(*chunks):
+    """チャンクを順に返し、読み切った後にさらに読まれたら失敗させるストリーム"""
+    yield from chunks
+    raise AssertionError("stream read past the closing brace")
+
+
+class TestReadUntilJsonClosed(unittest.TestCase):
+    def test_stops_at_closing_brace(self):
+        result = _read_until_json_closed(_stream('{"suggested_folder_id": "f1"}'))
+        self.assertEqual(result, '{"suggested_folder_id": "f1"}')
+
+    def test_trailing_text_in_same_chunk_is_dropped(self):
+        result = _read_until_json_closed(_stream('{"a": 1}\n```', ' and more'))
+        self.assertEqual(result, '{"a": 1}')
+
+    def test_braces_and_escaped_quotes_inside_strings(self):
+        body = '{"reason": "uses {braces} and \\"quoted }\\" text", "id": null}'
+        self.assertEqual(_read_until_json_closed(_stream(body, 'extra')), body)
+
+    def test_escaped_backslash_before_quote_ends_string(self):
+        body = '{"path": "C:\\\\", "id": "x"}'
+        self.assertEqual(_read_until_json_closed(_stream(body)), body)
+
+    def test_nested_objects(self):
+        body = '{"a": {"b": {"c": 1}}, "d": 2}'
+        self.assertEqual(_read_until_json_closed(_stream(body)), body)
+
+    def test_closing_brace_split_across_chunks(self):
+        chunks = ['{"suggested_', 'folder_id": "f', '1", "reason": "ok"', '}', 'ignored']
+        self.assertEqual(_read_until_json_closed(_stream(*chunks)),
+                         '{"suggested_folder_id": "f1", "reason": "ok"}')
+
+    def test_escape_split_across_chunks(self):
+        # バックスラッシュでチャンクが切れても、次のチャンク先頭の引用符は文字列の一部
+        chunks = ['{"reason": "a \\', '"} b"', '}']
+        self.assertEqual(_read_until_json_closed(_stream(*chunks)), '{"reason": "a \\"} b"}')
+
+    def test_leading_code_fence_is_kept_for_slicing(self):
+        result = _read_until_json_closed(_stream('```json\n', '{"id": "f1"}', '\n```'))
+        self.assertEqual(result, '```json\n{"id": "f1"}')
+
+    def test_stray_closing_brace_before_object_is_ignored(self):
+        result = _read_until_json_closed(_stream('} ', '{"id": "f1"}'))
+        self.assertEqual(result, '} {"id": "f1"}')
+
+    def test_unclosed_object_returns_everything(self):
+        result = _read_until_json_closed(iter(['{"id": "f1"', ', "reason": "cut off']))
+        self.assertEqual(result, '{"id": "f1", "reason": "cut off')
+
+    def test_empty_stream(self):
+        self.assertEqual(_read_until_json_closed(iter([])), '')
+
+
+class TestAdaptiveBatchSizer(unittest.TestCase):
+    def test_size_follows_token_budget(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        per_video = sizer.TOKEN_BUDGET_PER_REQUEST // 12
+        sizer.record(batch_len=20, valid_count=20, tokens_used=20 * per_video)
+        self.assertEqual(sizer.current_size(), 12)
+
+    def test_converges_to_token_budget(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        sizer.record(batch_len=20, valid_count=20, tokens_used=20 * 150)
+        for _ in range(100):
+            sizer.record(batch_len=10, valid_count=10, tokens_used=10 * 200)
+        self.assertEqual(sizer.current_size(), sizer.TOKEN_BUDGET_PER_REQUEST // 200)
+
+    def test_shrinks_by_quarter_when_success_rate_drops(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        # EWMA: 0.8 * 1.0 + 0.2 * 0.5 = 0.9 はまだ閾値以上
+        sizer.record(batch_len=10, valid_count=5)
+        self.assertEqual(sizer.current_size(), 20)
+        # 0.8 * 0.9 + 0.2 * 0.0 = 0.72 < 0.9 で25%縮小
+        sizer.record(batch_len=10, valid_count=0)
+        self.assertEqual(sizer.current_size(), 15)
+        sizer.record(batch_len=10, valid_count=0)
+        self.assertEqual(sizer.current_size(), 11)
+
+    def test_shrink_applies_to_budget_size(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        # 予算からは30だが、有効率が低いので現在のサイズ20の75%になる
+        sizer.record(batch_len=10, valid_count=0, tokens_used=10 * 200)
+        self.assertEqual(sizer.current_size(), 15)
+
+    def test_clamped_to_min_size(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        sizer.record(batch_len=10, valid_count=10, tokens_used=10 * 100_000)
+        self.assertEqual(sizer.current_size(), sizer.MIN_SIZE)
+        for _ in range(20):
+            sizer.record(batch_len=10, valid_count=0)
+        self.assertEqual(sizer.current_size(), sizer.MIN_SIZE)
+
+    def test_clamped_to_max_size(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        sizer.record(batch_len=10, valid_count=10, tokens_used=10)
+        self.assertEqual(sizer.current_size(), sizer.MAX_SIZE)
+
+    def test_empty_batch_is_ignored(self):
+        sizer = _AdaptiveBatchSizer(initial_size=20)
+        sizer.record(batch_len=0, valid_count=0, tokens_used=100)
+        self.assertEqual(sizer.current_size(), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
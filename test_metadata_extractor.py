@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+
+import metadata_extractor
+from metadata_extractor import MetadataExtractor, _canonicalize_url, _scan_meta
+
+
+class TestCanonicalizeUrl(unittest.TestCase):
+    def test_youtube_variants_share_one_key(self):
+        key = _canonicalize_url("https://www.youtube.com/watch?v=abc")
+        for url in (
+            "https://youtu.be/abc?si=share",
+            "https://www.youtube.com/watch?v=abc&feature=share",
+            "https://M.YouTube.com/watch?v=abc&t=10",
+            "https://youtube.com/watch/?v=abc#comments",
+            "  http://www.youtube.com/watch?utm_source=x&v=abc  ",
+        ):
+            self.assertEqual(_canonicalize_url(url), key, url)
+
+    def test_tracking_params_and_fragment_are_dropped(self):
+        self.assertEqual(
+            _canonicalize_url("https://www.tiktok.com/@u/video/1?is_from_webapp=1&utm_anything=x#top"),
+            "https://www.tiktok.com/@u/video/1",
+        )
+        self.assertEqual(
+            _canonicalize_url("https://www.instagram.com/reel/XYZ/?igsh=abc"),
+            "https://www.instagram.com/reel/XYZ",
+        )
+
+    def test_distinct_videos_do_not_collide(self):
+        self.assertNotEqual(
+            _canonicalize_url("https://www.youtube.com/watch?v=abc"),
+            _canonicalize_url("https://www.youtube.com/watch?v=abd"),
+        )
+        # 意味のあるパラメータ（プレイリスト）は残す
+        self.assertNotEqual(
+            _canonicalize_url("https://www.youtube.com/watch?v=abc"),
+            _canonicalize_url("https://www.youtube.com/watch?v=abc&list=PL1"),
+        )
+        # パスの大文字小文字はIDの一部なので区別する
+        self.assertNotEqual(
+            _canonicalize_url("https://www.instagram.com/reel/AbC"),
+            _canonicalize_url("https://www.instagram.com/reel/abc"),
+        )
+
+    def test_query_order_does_not_matter(self):
+        self.assertEqual(
+            _canonicalize_url("https://www.youtube.com/watch?list=PL1&v=abc"),
+            _canonicalize_url("https://www.youtube.com/watch?v=abc&list=PL1"),
+        )
+
+
+class TestScanMeta(unittest.TestCase):
+    def test_gt_inside_quoted_value_does_not_end_tag(self):
+        html = b'<meta property="og:title" content="1 > 0 &amp; more"><meta name="author" content="chef">'
+        self.assertEqual(_scan_meta(html), {"og:title": "1 > 0 & more", "author": "chef"})
+
+    def test_single_quoted_and_bare_values(self):
+        html = (b"<meta property='og:image' content='https://x/a.jpg?w=1&amp;h=2'>"
+                b"<META NAME=description CONTENT=plain>")
+        self.assertEqual(_scan_meta(html), {
+            "og:image": "https://x/a.jpg?w=1&h=2",
+            "description": "plain",
+        })
+
+    def test_quote_of_other_kind_inside_value(self):
+        html = b'<meta property="og:title" content="It\'s > good"><meta name=\'x\' content=\'say "hi" >\'>'
+        self.assertEqual(_scan_meta(html), {"og:title": "It's > good", "x": 'say "hi" >'})
+
+    def test_entities_and_utf8_are_decoded(self):
+        html = '<meta property="og:title" content="&lt;豚汁&gt; &#x1F35C; &quot;easy&quot;">'.encode("utf-8")
+        self.assertEqual(_scan_meta(html)["og:title"], '<豚汁> \U0001F35C "easy"')
+
+    def test_first_occurrence_wins(self):
+        html = b'<meta property="og:title" content="first"><meta property="og:title" content="second">'
+        self.assertEqual(_scan_meta(html)["og:title"], "first")
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        for cache in (metadata_extractor._METADATA_CACHE, metadata_extractor._DEGRADED_METADATA_CACHE):
+            cache.clear()
+        self.extractor = MetadataExtractor.__new__(MetadataExtractor)
+
+    def test_good_result_goes_to_long_lived_cache(self):
+        metadata = {"platform": "tiktok", "title": "Recipe", "thumbnailUrl": None}
+        with patch.object(MetadataExtractor, "_extract_metadata_uncached", return_value=metadata) as uncached:
+            self.extractor.extract_metadata("https://www.tiktok.com/@u/video/1")
+            self.extractor.extract_metadata("https://www.tiktok.com/@u/video/1?is_from_webapp=1")
+        self.assertEqual(uncached.call_count, 1)
+        self.assertIn("https://www.tiktok.com/@u/video/1", metadata_extractor._METADATA_CACHE)
+
+    def test_degraded_result_is_kept_out_of_long_lived_cache(self):
+        metadata = {"platform": "tiktok", "title": None, "thumbnailUrl": None}
+        with patch.object(MetadataExtractor, "_extract_metadata_uncached", return_value=metadata):
+            self.extractor.extract_metadata("https://www.tiktok.com/@u/video/2")
+        self.assertNotIn("https://www.tiktok.com/@u/video/2", metadata_extractor._METADATA_CACHE)
+        self.assertIn("https://www.tiktok.com/@u/video/2", metadata_extractor._DEGRADED_METADATA_CACHE)
+
+
+if __name__ == "__main__":
+    unittest.main()
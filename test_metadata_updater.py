@@ -0,0 +1,31 @@
+import unittest
+
+from metadata_updater import _copy_field
+
+
+class TestCopyField(unittest.TestCase):
+    def test_none_is_null_marker(self):
+        self.assertEqual(_copy_field(None), '\\N')
+
+    def test_plain_text_is_unchanged(self):
+        self.assertEqual(_copy_field('豚汁の作り方'), '豚汁の作り方')
+
+    def test_control_characters_are_escaped(self):
+        self.assertEqual(_copy_field('a\tb'), 'a\\tb')
+        self.assertEqual(_copy_field('line1\nline2\r\n'), 'line1\\nline2\\r\\n')
+
+    def test_backslash_is_escaped_before_others(self):
+        # 元のバックスラッシュがエスケープ列と混ざらないこと
+        self.assertEqual(_copy_field('C:\\new'), 'C:\\\\new')
+        self.assertEqual(_copy_field('\\N'), '\\\\N')
+        self.assertEqual(_copy_field('\\\t'), '\\\\\\t')
+
+    def test_empty_string_is_not_null(self):
+        self.assertEqual(_copy_field(''), '')
+
+    def test_non_string_values_are_stringified(self):
+        self.assertEqual(_copy_field(42), '42')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch
+
+import rate_limiter
+from rate_limiter import AIMDLimiter, ModelCircuitBreaker, parse_retry_after
+
+
+class TestAIMDLimiter(unittest.TestCase):
+    def test_prune_drops_events_older_than_window(self):
+        limiter = AIMDLimiter(rpm=2, tpm=1000)
+        with patch.object(rate_limiter.time, "monotonic", return_value=100.0):
+            limiter.acquire(10)
+            limiter.acquire(10)
+        # ウィンドウ（60秒）を過ぎた送信は数えないので、待たずに枠が取れる
+        with patch.object(rate_limiter.time, "monotonic", return_value=160.0), \
+             patch.object(rate_limiter.time, "sleep", side_effect=AssertionError("should not wait")):
+            limiter.acquire(10)
+        self.assertEqual(len(limiter._events), 1)
+
+    def test_single_request_over_tpm_passes_when_window_empty(self):
+        limiter = AIMDLimiter(rpm=10, tpm=100)
+        with patch.object(rate_limiter.time, "sleep", side_effect=AssertionError("should not wait")):
+            limiter.acquire(estimated_tokens=500)
+        self.assertEqual(len(limiter._events), 1)
+
+    def test_request_over_tpm_waits_when_window_not_empty(self):
+        limiter = AIMDLimiter(rpm=10, tpm=100)
+        limiter.acquire(estimated_tokens=50)
+        with patch.object(rate_limiter.time, "sleep", side_effect=RuntimeError("waited")):
+            with self.assertRaises(RuntimeError):
+                limiter.acquire(estimated_tokens=60)
+
+    def test_rate_limited_halves_rpm_down_to_min(self):
+        limiter = AIMDLimiter(rpm=8, tpm=1000, min_rpm=3)
+        limiter.record_rate_limited()
+        self.assertEqual(limiter.current_rpm, 4)
+        limiter.record_rate_limited()
+        self.assertEqual(limiter.current_rpm, 3)
+
+    def test_slow_success_recovers_after_recovery_seconds(self):
+        limiter = AIMDLimiter(rpm=8, tpm=1000, target_latency_ms=2000, recovery_seconds=30)
+        with patch.object(rate_limiter.time, "monotonic", return_value=100.0):
+            limiter.record_rate_limited()
+        # 429直後はレイテンシが目標を超えていれば戻さない
+        with patch.object(rate_limiter.time, "monotonic", return_value=110.0):
+            limiter.record_success(20_000)
+        self.assertEqual(limiter.current_rpm, 4)
+        # 一定時間経てば遅い応答でも加算的に戻す
+        with patch.object(rate_limiter.time, "monotonic", return_value=131.0):
+            limiter.record_success(20_000)
+        self.assertEqual(limiter.current_rpm, 5)
+
+    def test_recovery_is_capped_at_max_rpm(self):
+        limiter = AIMDLimiter(rpm=4, tpm=1000)
+        limiter.record_success(100)
+        self.assertEqual(limiter.current_rpm, 4)
+
+
+class TestModelCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch.object(rate_limiter.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # ジッターを0にして待ち時間を決定的にする
+        jitter = patch.object(rate_limiter.random, "random", return_value=0.0)
+        jitter.start()
+        self.addCleanup(jitter.stop)
+        self.breaker = ModelCircuitBreaker(base_delay=1, max_delay=30, failure_threshold=3, open_seconds=60)
+
+    def test_backoff_grows_until_threshold_opens_circuit(self):
+        self.breaker.record_failure("m")
+        self.assertFalse(self.breaker.allow("m"))
+        self.now += 1
+        self.assertTrue(self.breaker.allow("m"))
+
+        self.breaker.record_failure("m")
+        self.now += 1.5
+        self.assertFalse(self.breaker.allow("m"))
+        self.now += 0.5
+        self.assertTrue(self.breaker.allow("m"))
+
+        # 3回連続で回路が開き、open_seconds休む
+        self.breaker.record_failure("m")
+        self.now += 59
+        self.assertFalse(self.breaker.allow("m"))
+        self.now += 1
+        self.assertTrue(self.breaker.allow("m"))
+
+    def test_retry_after_extends_delay(self):
+        self.breaker.record_failure("m", retry_after=10)
+        self.now += 9
+        self.assertFalse(self.breaker.allow("m"))
+        self.now += 1
+        self.assertTrue(self.breaker.allow("m"))
+
+    def test_half_open_success_closes_circuit(self):
+        for _ in range(3):
+            self.breaker.record_failure("m")
+        self.now += 60
+        self.breaker.record_success("m")
+        # 閉じた後の失敗は1回目として短いバックオフから数え直す
+        self.breaker.record_failure("m")
+        self.now += 1
+        self.assertTrue(self.breaker.allow("m"))
+
+    def test_half_open_failure_reopens_circuit(self):
+        for _ in range(3):
+            self.breaker.record_failure("m")
+        self.now += 60
+        self.breaker.record_failure("m")
+        self.now += 59
+        self.assertFalse(self.breaker.allow("m"))
+
+    def test_available_skips_cooling_models_in_order(self):
+        self.breaker.record_failure("b")
+        self.assertEqual(self.breaker.available(["a", "b", "c"]), ["a", "c"])
+
+    def test_available_falls_back_to_soonest_when_all_cooling(self):
+        self.breaker.record_failure("a", retry_after=20)
+        self.breaker.record_failure("b", retry_after=5)
+        self.assertEqual(self.breaker.available(["a", "b"]), ["b"])
+        self.assertEqual(self.breaker.available([]), [])
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("12"), 12.0)
+        self.assertEqual(parse_retry_after("1.5"), 1.5)
+
+    def test_negative_is_clamped(self):
+        self.assertEqual(parse_retry_after("-3"), 0.0)
+
+    def test_missing_or_http_date(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(""))
+        self.assertIsNone(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -105,7 +105,7 @@ class TikTokCollectionExtractor:
                     href = el.get_attribute('href')
                     if href:
                         # Extract the clean URL, stripping any query parameters
-                        clean_url = href.split('?')[0]
+                        clean_url = href.partition('?')[0]
                         # Ensure it's absolute
                         if clean_url.startswith('/'):
                             clean_url = 'https://www.tiktok.com' + clean_url
@@ -5,10 +5,18 @@ videosテーブルから最新の埋め込みコード情報を取得してranki
 import os
 import logging
 import psycopg2
+from psycopg2.extras import execute_batch
 from metadata_extractor import MetadataExtractor
 
 logging.basicConfig(level=logging.INFO)
 
+UPDATE_RANKING_SQL = """
+    UPDATE rankings
+    SET url = %s, embed_code = %s
+    WHERE unique_video_id = %s
+"""
+COMMIT_EVERY = 10
+
 def update_rankings_with_embed_codes():
     """rankingsテーブルのデータにurl/embed_codeを追加"""
     database_url = os.getenv("DATABASE_URL")
@@ -36,6 +44,7 @@ def update_rankings_with_embed_codes():
                     return True
                 
                 updated_count = 0
+                pending = []  # まとめてexecute_batchで流すUPDATEパラメータ
                 for video_id, platform in videos_to_update:
                     # URLを構築
                     url = construct_url(video_id, platform)
@@ -47,15 +56,13 @@ def update_rankings_with_embed_codes():
                     try:
                         metadata = extractor.extract_metadata(url)
                         if metadata and metadata.get('embedCode'):
-                            # rankingsテーブルを更新
-                            cur.execute("""
-                                UPDATE rankings
-                                SET url = %s, embed_code = %s
-                                WHERE unique_video_id = %s
-                            """, (url, metadata['embedCode'], video_id))
+                            # rankingsテーブルの更新はCOMMIT_EVERY件ずつまとめて送る
+                            pending.append((url, metadata['embedCode'], video_id))
                             
                             updated_count += 1
-                            if updated_count % 10 == 0:
+                            if len(pending) >= COMMIT_EVERY:
+                                execute_batch(cur, UPDATE_RANKING_SQL, pending, page_size=100)
+                                pending.clear()
                                 conn.commit()
                                 logging.info(f"Updated {updated_count} videos so far...")
                         else:
@@ -64,6 +71,8 @@ def update_rankings_with_embed_codes():
                         logging.error(f"Error processing {url}: {e}")
                         continue
                 
+                if pending:
+                    execute_batch(cur, UPDATE_RANKING_SQL, pending, page_size=100)
                 conn.commit()
                 logging.info(f"Successfully updated {updated_count} videos with embed codes")
                 return True